@@ -1,19 +1,44 @@
 import os
+import queue
+import time
 import json as _json
-from flask import Flask, render_template, request, redirect, session, jsonify, flash, url_for, send_from_directory
+import click
+from flask import Flask, Response, render_template, request, redirect, session, jsonify, flash, url_for, send_from_directory
 from flask_cors import CORS
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
 from werkzeug.security import check_password_hash
 from flask_pymongo import PyMongo
+from flask.cli import AppGroup
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from bson.objectid import ObjectId
-from datetime import datetime
-from copy import deepcopy
-from modals import User, create_guardian, create_patient, create_notification, create_unity_user, create_appointment
-from twilio.rest import Client
-
-user_games = {}
+from datetime import datetime, timedelta
+from modals import User, ref_id, create_report, create_guardian, create_patient, create_notification, create_unity_user, create_appointment
+from dashboard_queries import fetch_dashboard
+from indexes import ensure_indexes, check_query_shapes
+from migrate_ids import migrate_all
+from migrate_uploads import migrate_uploads
+from cache import LRUTTLCache
+from emergency_events import EmergencyBroker, EmergencyFeed
+from sms_outbox import SmsDispatcher, transport_from_env
+from stream_slots import StreamSlots
+from voice_gateway import LLMGateway, LLMUnavailable, ReplyStreamParser
+from voice_intents import match_intent
+from voice_cache import VoiceResponseCache
+from game_store import SudokuGame, game_store_from_env
+from sudoku_engine import analyse
+from puzzle_bank import DIFFICULTIES, PuzzleBank, fill_bank
+from blob_store import INLINE_TYPES, BlobStore, blob_mimetype, blob_url, link_blob
+from file_serving import FileServer
+from report_derivatives import ReportDerivativePipeline, queue_missing
+from report_search import search_reports
+from pagination import keyset_page, page_limit
+from vitals_trend import DEFAULT_POINTS, MAX_POINTS, parse_time, trend
+from vitals_ingest import MAX_BATCH_READINGS, IngestBusy, VitalsIngestor, parse_readings
+from vitals_store import ROLLUP_PERIODS, VitalsRollup, migrate_values, migrate_vitals, rebuild_latest, rollup_series
+from upload_sessions import (
+    UPLOAD_CHUNK_SIZE, OffsetMismatch, create_session, finalize_session, get_session, sweep_sessions, write_chunk
+)
 
 load_dotenv()
 app = Flask(__name__)
@@ -22,6 +47,8 @@ CORS(app)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY') or "a_very_secret_key"
 app.config['MONGO_URI'] = os.getenv('MONGO_URI') or "mongodb://localhost:27017/seniorcare"
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
+# Uploaded files are stored once per content hash, outside the public static folder
+app.config['BLOB_ROOT'] = os.getenv('BLOB_ROOT') or os.path.join(app.instance_path, 'blobs')
 app.config['SESSION_COOKIE_SECURE'] = False  # Set True in production with HTTPS
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
@@ -41,6 +68,20 @@ try:
 except Exception as e:
     print(f"[Voice Assistant] Gemini not available: {e}")
 
+# Gemini calls run on a bounded pool with a deadline and circuit breaker (see voice_gateway.py)
+voice_gateway = LLMGateway(
+    _voice_model,
+    max_concurrency=int(os.getenv('VOICE_LLM_CONCURRENCY', 4)),
+    timeout=float(os.getenv('VOICE_LLM_TIMEOUT', 8)),
+    slow_threshold=float(os.getenv('VOICE_LLM_SLOW_SECONDS', 5))
+)
+
+# Repeated commands ("go home", "दवाई") are answered from cache instead of another Gemini round trip
+voice_cache = VoiceResponseCache(
+    maxsize=int(os.getenv('VOICE_CACHE_SIZE', 2048)),
+    ttl=float(os.getenv('VOICE_CACHE_TTL', 3600))
+)
+
 # Initialize MongoDB
 mongo = PyMongo(app)
 
@@ -50,23 +91,222 @@ login_manager.init_app(app)
 login_manager.login_view = 'login'
 
 # User Loader
+# Flask-Login resolves the session on every request (including polls and static game files),
+# so loaded users are cached by their "role:id" session id.
+user_cache = LRUTTLCache(
+    maxsize=int(os.getenv('USER_CACHE_SIZE', 2048)),
+    ttl=float(os.getenv('USER_CACHE_TTL', 60))
+)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.get_user_by_id(mongo, user_id)
+    user = user_cache.get(user_id)
+    if user is None:
+        user = User.get_user_by_id(mongo, user_id)
+        if user is not None:
+            user_cache.set(user_id, user)
+    return user
+
+def invalidate_user(role, db_id):
+    """Drop a cached account after its document changes."""
+    user_cache.invalidate(f"{role}:{db_id}")
+
+# Index management: `flask indexes create` at deploy time, `flask indexes check` to verify query plans
+indexes_cli = AppGroup('indexes', help='Create and verify MongoDB indexes.')
+
+@indexes_cli.command('create')
+def indexes_create():
+    failed = False
+    for collection, name, error in ensure_indexes(mongo.db):
+        if error:
+            failed = True
+            click.echo(f"❌ {collection}.{name}: {error}")
+        else:
+            click.echo(f"✓ {collection}.{name}")
+    if failed:
+        raise SystemExit(1)
+
+@indexes_cli.command('check')
+def indexes_check():
+    failures = check_query_shapes(mongo.db)
+    for collection, query, sort, stages in failures:
+        click.echo(f"❌ COLLSCAN on {collection} for filter={query} sort={sort} ({' > '.join(filter(None, stages))})")
+    if failures:
+        raise SystemExit(1)
+    click.echo("✓ Every query shape is served by an index")
+
+app.cli.add_command(indexes_cli)
+
+# Data migrations: `flask migrate <name>`; each one is resumable and safe to re-run
+migrate_cli = AppGroup('migrate', help='Run resumable data migrations.')
+
+@migrate_cli.command('ids')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--restart', is_flag=True, help='Ignore saved checkpoints and rescan from the beginning.')
+def migrate_ids_command(batch_size, restart):
+    def report(collection, field, converted):
+        click.echo(f"✓ {collection}.{field}: {converted} converted")
+    migrate_all(mongo.db, batch_size=batch_size, resume=not restart, on_progress=report)
+
+@migrate_cli.command('uploads')
+@click.option('--remove-originals', is_flag=True, help='Delete the flat files once their content is in the blob store.')
+def migrate_uploads_command(remove_originals):
+    summary = migrate_uploads(
+        mongo.db, blob_store, app.config['UPLOAD_FOLDER'],
+        remove_originals=remove_originals
+    )
+    click.echo("✓ " + ", ".join(f"{key}: {value}" for key, value in summary.items()))
+
+@migrate_cli.command('vitals-buckets')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--restart', is_flag=True, help='Ignore the saved checkpoint and rescan from the beginning; copied readings are skipped.')
+def migrate_vitals_command(batch_size, restart):
+    """Copy per-reading `vitals` documents into hourly `vitals_buckets`."""
+    copied = migrate_vitals(mongo.db, batch_size=batch_size, resume=not restart)
+    click.echo(f"✓ {copied} reading(s) bucketed; run `flask vitals rebuild-latest` and `flask vitals rollup` next")
+
+@migrate_cli.command('vitals-values')
+@click.option('--batch-size', default=500, show_default=True)
+def migrate_vitals_values_command(batch_size):
+    """Convert stored vitals to typed values (blood pressure as systolic/diastolic, canonical units)."""
+    summary = migrate_values(mongo.db, batch_size=batch_size)
+    click.echo("✓ " + ", ".join(f"{key}: {value}" for key, value in summary.items()))
+
+app.cli.add_command(migrate_cli)
+
+# SOS alerts are pushed to guardians over /stream/emergencies; the feed relays alerts written by other workers
+emergency_broker = EmergencyBroker()
+emergency_feed = EmergencyFeed(mongo.db.sos_alerts, emergency_broker)
+
+# Each open SSE response (guardian tab, voice reply) holds a worker thread; keep some free for other requests
+stream_slots = StreamSlots(int(os.getenv('SSE_MAX_STREAMS', 16)))
+
+def streams_full():
+    response = jsonify({"error": "Too many open streams, retry shortly"})
+    response.headers['Retry-After'] = '30'
+    return response, 503
+
+# SOS text messages are written to the sms_outbox collection and sent in the background
+_sms_transport = transport_from_env()
+sms_dispatcher = SmsDispatcher(mongo.db, _sms_transport) if _sms_transport else None
+
+# Sudoku boards live in a shared store so any worker can serve /sudoku/check
+sudoku_games = game_store_from_env(mongo)
+# New boards are drawn from a bank of pre-generated, graded puzzles
+puzzle_bank = PuzzleBank(mongo.db.sudoku_puzzles)
+
+sudoku_cli = AppGroup('sudoku', help='Manage the Sudoku puzzle bank.')
+
+@sudoku_cli.command('fill-bank')
+@click.option('--size', default=9, show_default=True)
+@click.option('--count', default=500, show_default=True)
+@click.option('--workers', default=None, type=int, help='Generator processes (default: one per CPU).')
+def fill_bank_command(size, count, workers):
+    def report(done):
+        click.echo(f"… {done}/{count}")
+    tally = fill_bank(mongo.db.sudoku_puzzles, size, count, workers=workers, on_progress=report)
+    click.echo("✓ " + ", ".join(f"{difficulty}: {n}" for difficulty, n in tally.items()))
+
+app.cli.add_command(sudoku_cli)
 
 # Create upload folder if missing
 if not os.path.exists(app.config['UPLOAD_FOLDER']):
     os.makedirs(app.config['UPLOAD_FOLDER'])
 
+blob_store = BlobStore(app.config['BLOB_ROOT'])
+MAX_REPORT_BYTES = int(os.getenv('MAX_REPORT_BYTES', 100 * 1024 * 1024))
+
+uploads_cli = AppGroup('uploads', help='Maintain resumable report uploads.')
+
+@uploads_cli.command('sweep')
+@click.option('--max-age-hours', default=24, show_default=True)
+def sweep_uploads_command(max_age_hours):
+    removed = sweep_sessions(mongo.db, blob_store, max_age=timedelta(hours=max_age_hours))
+    click.echo(f"✓ Removed {removed} abandoned upload(s)")
+
+app.cli.add_command(uploads_cli)
+
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'doc'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Files are sent with content-hash ETags; FILE_OFFLOAD=x-accel|x-sendfile hands the bytes to the proxy
+file_server = FileServer(
+    offload=os.getenv('FILE_OFFLOAD') or None,
+    accel_prefix=os.getenv('FILE_OFFLOAD_PREFIX', '/_files')
+)
+file_server.add_root('assets', os.path.join(app.root_path, 'assets'))
+file_server.add_root('blobs', blob_store.root)
+
+# Thumbnails, previews, page counts and text for uploaded reports are built off the request path
+report_derivatives = ReportDerivativePipeline(
+    mongo.db, blob_store, workers=int(os.getenv('REPORT_DERIVATIVE_WORKERS', 2))
+)
+
+reports_cli = AppGroup('reports', help='Maintain uploaded medical reports.')
+
+@reports_cli.command('derive')
+@click.option('--retry', is_flag=True, help="Also queue reports left 'unsupported' or 'failed' by earlier runs.")
+def derive_reports_command(retry):
+    """Queue reports uploaded before derivatives existed and build them now."""
+    queued = queue_missing(mongo.db, retry=retry)
+    click.echo(f"… {queued} report(s) queued")
+    report_derivatives.start()
+    while True:
+        left = mongo.db.reports.count_documents({'derivatives.status': {'$in': ['pending', 'processing']}})
+        if not left:
+            break
+        click.echo(f"… {left} left")
+        time.sleep(2)
+    click.echo("✓ " + ", ".join(f"{key}: {value}" for key, value in report_derivatives.stats().items()))
+
+app.cli.add_command(reports_cli)
+
+# Vitals live in hourly buckets; hourly/daily min/max/mean are kept in vitals_rollups by a background pass
+vitals_rollup = VitalsRollup(mongo.db, interval=float(os.getenv('VITALS_ROLLUP_INTERVAL', 300)))
+
+# Device uploads (/api/vitals/batch): a few concurrent batches per worker, written in bounded bulk writes
+vitals_ingestor = VitalsIngestor(
+    mongo.db,
+    max_concurrent=int(os.getenv('VITALS_INGEST_CONCURRENCY', 2)),
+    batch_size=int(os.getenv('VITALS_WRITE_BATCH', 500))
+)
+
+vitals_cli = AppGroup('vitals', help='Maintain vitals buckets and rollups.')
+
+@vitals_cli.command('rollup')
+def rollup_vitals_command():
+    """Run one rollup pass now."""
+    result = vitals_rollup.run_once()
+    if result is None:
+        click.echo("… another worker is rolling up; try again shortly")
+    else:
+        click.echo(f"✓ {result[0]} hourly and {result[1]} daily rollup(s) rewritten")
+
+@vitals_cli.command('rebuild-latest')
+@click.option('--batch-size', default=1000, show_default=True)
+def rebuild_latest_command(batch_size):
+    """Recompute each patient's newest reading per vital type from the buckets."""
+    written = rebuild_latest(mongo.db, batch_size=batch_size)
+    click.echo(f"✓ {written} latest vital(s) written")
+
+app.cli.add_command(vitals_cli)
+
+@app.template_global()
+def asset_url(filename):
+    """/assets URL with a content fingerprint (?v=), which lets browsers cache it for good."""
+    version = file_server.fingerprint('assets', filename)
+    return f"/assets/{filename}?v={version}" if version else f"/assets/{filename}"
+
 # Serve assets
 @app.route('/assets/<path:filename>')
 def serve_assets(filename):
-    return send_from_directory('assets', filename)
+    path = file_server.resolve('assets', filename)
+    if not path:
+        return "Not found", 404
+    etag = file_server.etag(path)
+    return file_server.send('assets', path, etag=etag, immutable=request.args.get('v') == etag[:12])
 
 # --- ROUTES START HERE ---
 
@@ -220,25 +460,19 @@ def dashboard():
         if role != 'guardian':
             return redirect(url_for('login_redirect'))
             
-        # Fetch patients linked to this guardian (support both ObjectId and string guardian_id)
-        try:
-            guardian_oid = ObjectId(current_user.id)
-            patients = list(mongo.db.patients.find({'guardian_id': guardian_oid}))
-        except Exception:
-            patients = list(mongo.db.patients.find({'guardian_id': current_user.id}))
+        # Fetch patients linked to this guardian
+        patients = list(mongo.db.patients.find({'guardian_id': current_user.id}))
 
         # If no patients linked, link the demo patient "Grandpa" to this guardian so medical reports work
         if not patients:
             grandpa = mongo.db.patients.find_one({'email': 'grandpa@patient.com'})
             if grandpa:
-                try:
-                    mongo.db.patients.update_one(
-                        {'_id': grandpa['_id']},
-                        {'$set': {'guardian_id': ObjectId(current_user.id)}}
-                    )
-                    patients = list(mongo.db.patients.find({'guardian_id': ObjectId(current_user.id)}))
-                except Exception:
-                    patients = list(mongo.db.patients.find({'guardian_id': current_user.id}))
+                mongo.db.patients.update_one(
+                    {'_id': grandpa['_id']},
+                    {'$set': {'guardian_id': ref_id(current_user.id)}}
+                )
+                invalidate_user('patient', grandpa['_id'])
+                patients = list(mongo.db.patients.find({'guardian_id': current_user.id}))
 
         for p in patients:
             p['id_str'] = str(p['_id'])  # same format as patient dashboard /api/reports
@@ -268,9 +502,14 @@ def patient_dashboard():
 @login_required
 def notifications():
     try:
-        # Fetch notifications for current user
-        feed = list(mongo.db.notifications.find({'user_id': current_user.id}).sort('timestamp', -1))
-        return render_template('notifications.html', feed=feed)
+        # Fetch notifications for current user, one page at a time (?cursor=&limit=)
+        feed, next_cursor = keyset_page(
+            mongo.db.notifications, {'user_id': current_user.id}, 'timestamp',
+            cursor=request.args.get('cursor'), limit=page_limit(request.args.get('limit', type=int))
+        )
+        return render_template('notifications.html', feed=feed, next_cursor=next_cursor)
+    except ValueError as e:
+        return f"Notification error: {str(e)}", 400
     except Exception as e:
         return f"Notification error: {str(e)}", 500
 
@@ -302,7 +541,18 @@ def trigger_sos(patient_id):
         # Update emergency status
         mongo.db.patients.update_one({'_id': ObjectId(patient_id)}, {'$set': {'is_emergency': True}})
         
-        guardian_id = patient.get('guardian_id')
+        guardian_id = ref_id(patient.get('guardian_id'))
+        sos_alert = {
+            'patient_id': ref_id(patient_id),
+            'patient_name': patient.get('name', 'Unknown Patient'),
+            'guardian_id': guardian_id,
+            'timestamp': datetime.utcnow(),
+            'status': 'active',
+            'message': f"Emergency SOS alert from {patient.get('name', 'Patient')}"
+        }
+        mongo.db.sos_alerts.insert_one(sos_alert)
+        emergency_broker.publish(sos_alert)
+        
         if guardian_id:
             create_notification(mongo, guardian_id, f"🚨 EMERGENCY: {patient.get('name')} needs help!")
         
@@ -327,6 +577,54 @@ def check_emergency():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/stream/emergencies')
+@login_required
+def stream_emergencies():
+    """Server-Sent Events: pushes SOS alerts for this guardian's patients as they are written"""
+    if current_user.role != 'guardian':
+        return jsonify({"error": "Unauthorized"}), 403
+
+    guardian_id = current_user.id
+    emergency_feed.start()
+    subscription = emergency_broker.subscribe(guardian_id)
+
+    # Alerts raised while no tab was open are still flagged on the patient
+    pending = [
+        {"emergency_detected": True, "patient_name": p.get('name'), "patient_id": str(p['_id'])}
+        for p in mongo.db.patients.find({'guardian_id': guardian_id, 'is_emergency': True}, {'name': 1})
+    ]
+    if not stream_slots.try_acquire():
+        # The page polls /check-emergency until a slot frees up
+        emergency_broker.unsubscribe(guardian_id, subscription)
+        return streams_full()
+
+    def events():
+        try:
+            yield "retry: 3000\n\n"
+            for event in pending:
+                yield f"event: emergency\ndata: {_json.dumps(event)}\n\n"
+            while True:
+                try:
+                    event = subscription.get(timeout=15)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: emergency\ndata: {_json.dumps(event)}\n\n"
+        finally:
+            emergency_broker.unsubscribe(guardian_id, subscription)
+
+    response = Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs when the server closes the response, even if the generator never started
+    @response.call_on_close
+    def close():
+        emergency_broker.unsubscribe(guardian_id, subscription)
+        stream_slots.release()
+    return response
+
 @app.route('/api/clear-emergency/<patient_id>', methods=['POST'])
 @login_required
 def clear_emergency(patient_id):
@@ -347,10 +645,11 @@ def upload_record(patient_id):
         file = request.files.get('file')
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            save_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(save_path)
-            
-            mongo.db.patients.update_one({'_id': ObjectId(patient_id)}, {'$set': {'medical_records': filename}})
+            sha256, size, _ = blob_store.put_stream(file.stream)
+            # Counted like a report's blob, so the file is kept while the patient points at it
+            link_blob(mongo.db, sha256, size)
+
+            mongo.db.patients.update_one({'_id': ObjectId(patient_id)}, {'$set': {'medical_records': blob_url(sha256, filename)}})
             return redirect('/guardian-dashboard')
         return "Invalid file", 400
     except Exception as e:
@@ -396,25 +695,17 @@ def get_patient_dashboard_data():
     
     patient_id = current_user.id
     
-    # Fetch all related data
-    patient = mongo.db.patients.find_one({'_id': ObjectId(patient_id)})
-    vitals = list(mongo.db.vitals.find({'patient_id': patient_id}).sort('timestamp', -1).limit(4))
-    tasks = list(mongo.db.tasks.find({'patient_id': patient_id, 'date': datetime.utcnow().strftime('%Y-%m-%d')}))
-    medications = list(mongo.db.medications.find({'patient_id': patient_id}))
-    appointments = list(mongo.db.appointments.find({'patient_id': patient_id, 'status': 'scheduled'}).sort('date', 1))
-
-    # Convert ObjectIds to strings for JSON
-    for item in vitals + tasks + medications + appointments:
-        item['_id'] = str(item['_id'])
-        
-    medical_records = patient.get('medical_records') if patient else None
+    # Fetch all related data in a single aggregate round trip
+    data = fetch_dashboard(mongo, patient_id, vitals_limit=4, appointment_status='scheduled')
+    if not data:
+        data = {'vitals': [], 'tasks': [], 'medications': [], 'appointments': []}
 
     return jsonify({
-        "vitals": vitals,
-        "tasks": tasks,
-        "medications": medications,
-        "appointments": appointments,
-        "medical_records": medical_records
+        "vitals": data['vitals'],
+        "tasks": data['tasks'],
+        "medications": data['medications'],
+        "appointments": data['appointments'],
+        "medical_records": data.get('medical_records')
     })
 
 @app.route('/api/guardian/dashboard-data/<patient_id>')
@@ -424,27 +715,116 @@ def get_guardian_patient_data(patient_id):
         return jsonify({"error": "Unauthorized"}), 403
 
     # Fetch data for specific patient
-    patient = mongo.db.patients.find_one({'_id': ObjectId(patient_id)})
-    if not patient:
+    data = fetch_dashboard(mongo, patient_id, vitals_limit=5)
+    if not data:
          return jsonify({"error": "Patient not found"}), 404
 
-    vitals = list(mongo.db.vitals.find({'patient_id': patient_id}).sort('timestamp', -1).limit(5))
-    tasks = list(mongo.db.tasks.find({'patient_id': patient_id, 'date': datetime.utcnow().strftime('%Y-%m-%d')}))
-    medications = list(mongo.db.medications.find({'patient_id': patient_id}))
-    appointments = list(mongo.db.appointments.find({'patient_id': patient_id}).sort('date', 1))
+    return jsonify({
+        "vitals": data['vitals'],
+        "tasks": data['tasks'],
+        "medications": data['medications'],
+        "appointments": data['appointments'],
+        "medical_records": data.get('medical_records')
+    })
 
-    for item in vitals + tasks + medications + appointments:
-        item['_id'] = str(item['_id'])
+def linked_patient_id(patient_id):
+    """patient_id if it names a patient linked to the logged-in guardian, else None."""
+    if not isinstance(patient_id, str) or not ObjectId.is_valid(patient_id) or not mongo.db.patients.find_one(
+            {'_id': ObjectId(patient_id), 'guardian_id': current_user.id}, {'_id': 1}):
+        return None
+    return patient_id
+
+def vitals_patient_id():
+    """The patient whose vitals are being read: yourself, or ?patient_id= for a linked guardian. None if not allowed."""
+    if current_user.role == 'patient':
+        return current_user.id
+    if current_user.role != 'guardian':
+        return None
+    return linked_patient_id(request.args.get('patient_id'))
 
-    medical_records = patient.get('medical_records')
+@app.route('/api/vitals/trend')
+@login_required
+def vitals_trend():
+    """Readings of one type for charts (?type=&from=&to=&points=), downsampled with LTTB, as columns.
 
-    return jsonify({
-        "vitals": vitals,
-        "tasks": tasks,
-        "medications": medications,
-        "appointments": appointments,
-        "medical_records": medical_records
+    from/to are ISO 8601 (default: the last 7 days); t is epoch milliseconds.
+    """
+    patient_id = vitals_patient_id()
+    if patient_id is None:
+        return jsonify({"error": "Unauthorized"}), 403
+    vital_type = request.args.get('type')
+    if not vital_type:
+        return jsonify({"error": "Missing type"}), 400
+    try:
+        end = parse_time(request.args['to']) if request.args.get('to') else datetime.utcnow()
+        start = parse_time(request.args['from']) if request.args.get('from') else end - timedelta(days=7)
+    except ValueError:
+        return jsonify({"error": "from and to must be ISO 8601 dates"}), 400
+    if not start < end <= start + timedelta(days=400):
+        return jsonify({"error": "from must be before to, at most 400 days apart"}), 400
+    points = max(3, min(request.args.get('points', DEFAULT_POINTS, type=int), MAX_POINTS))
+
+    started = time.monotonic()
+    result = trend(mongo.db, patient_id, vital_type, start, end, points)
+    result.update({
+        'type': vital_type,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'took_ms': round((time.monotonic() - started) * 1000, 2)
     })
+    return jsonify(result)
+
+@app.route('/api/vitals/summary')
+@login_required
+def vitals_summary():
+    """Hourly or daily min/max/mean of one vital type (?type=&period=day&days=30)."""
+    patient_id = vitals_patient_id()
+    if patient_id is None:
+        return jsonify({"error": "Unauthorized"}), 403
+    vital_type = request.args.get('type')
+    period = request.args.get('period', 'day')
+    if not vital_type or period not in ROLLUP_PERIODS:
+        return jsonify({"error": "type and period (hour or day) are required"}), 400
+    days = max(1, min(request.args.get('days', 30, type=int), 366))
+
+    end = datetime.utcnow()
+    rollups = rollup_series(mongo.db, patient_id, vital_type, period, end - timedelta(days=days), end)
+    for rollup in rollups:
+        rollup['start'] = rollup['start'].isoformat()
+    return jsonify({"type": vital_type, "period": period, "rollups": rollups})
+
+@app.route('/api/vitals/batch', methods=['POST'])
+@login_required
+def ingest_vitals_batch():
+    """Many readings in one request: a JSON array, {"readings": [...]}, or NDJSON (application/x-ndjson).
+
+    Each reading is {type, value, unit, timestamp, patient_id}; patients may leave out
+    patient_id, guardians may send ?patient_id= for the whole batch.
+    """
+    if current_user.role not in ['patient', 'guardian']:
+        return jsonify({"error": "Unauthorized"}), 403
+    if current_user.role == 'patient':
+        allowed, default_patient = {current_user.id}, current_user.id
+    else:
+        allowed = {str(p['_id']) for p in mongo.db.patients.find({'guardian_id': current_user.id}, {'_id': 1})}
+        default_patient = request.args.get('patient_id')
+
+    try:
+        readings = parse_readings(request.get_data(cache=False), request.mimetype)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"error": str(e)}), 400
+    if len(readings) > MAX_BATCH_READINGS:
+        return jsonify({"error": f"At most {MAX_BATCH_READINGS} readings per request"}), 413
+
+    try:
+        result = vitals_ingestor.ingest(readings, allowed, default_patient)
+    except IngestBusy:
+        response = jsonify({"error": "Busy, retry shortly"})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    # 207 when only part of the batch was stored; the response lists what was not
+    status = 207 if result['rejected_count'] or result['failed_count'] else 200
+    return jsonify(result), status
 
 @app.route('/api/task/toggle/<task_id>', methods=['POST'])
 @login_required
@@ -569,41 +949,21 @@ def api_patient_dashboard():
             return jsonify({"error": "Unauthorized"}), 403
         
         patient_id = current_user.id
-        patient = mongo.db.patients.find_one({'_id': ObjectId(patient_id)})
+        data = fetch_dashboard(mongo, patient_id, vitals_limit=10, appointment_sort=-1, appointment_limit=5)
         
-        if not patient:
+        if not data:
             return jsonify({"error": "Patient not found"}), 404
         
-        # Fetch vitals
-        vitals = list(mongo.db.vitals.find({'patient_id': patient_id}).sort('timestamp', -1).limit(10))
-        for vital in vitals:
-            vital['_id'] = str(vital.get('_id'))
+        for vital in data['vitals']:
             vital['timestamp'] = str(vital.get('timestamp'))
         
-        # Fetch tasks
-        from datetime import datetime as dt
-        today = dt.utcnow().strftime('%Y-%m-%d')
-        tasks = list(mongo.db.tasks.find({'patient_id': patient_id, 'date': today}))
-        for task in tasks:
-            task['_id'] = str(task.get('_id'))
-        
-        # Fetch medications
-        medications = list(mongo.db.medications.find({'patient_id': patient_id}))
-        for med in medications:
-            med['_id'] = str(med.get('_id'))
-        
-        # Fetch appointments
-        appointments = list(mongo.db.appointments.find({'patient_id': patient_id}).sort('date', -1).limit(5))
-        for appt in appointments:
-            appt['_id'] = str(appt.get('_id'))
-        
         return jsonify({
-            "vitals": vitals,
-            "tasks": tasks,
-            "medications": medications,
-            "appointments": appointments,
-            "patient_name": patient.get('name'),
-            "patient_phone": patient.get('phone')
+            "vitals": data['vitals'],
+            "tasks": data['tasks'],
+            "medications": data['medications'],
+            "appointments": data['appointments'],
+            "patient_name": data.get('name'),
+            "patient_phone": data.get('phone')
         })
     except Exception as e:
         print(f"Error fetching dashboard data: {e}")
@@ -728,7 +1088,7 @@ def sos_trigger():
             print(f"❌ SOS TRIGGER: Patient not found with ID {patient_id}")
             return jsonify({"error": "Patient not found"}), 404
         
-        guardian_id = patient.get('guardian_id')
+        guardian_id = ref_id(patient.get('guardian_id'))
         print(f"✓ SOS TRIGGER: Patient found - {patient.get('name')} with guardian_id {guardian_id}")
         
         # Create SOS alert record
@@ -748,6 +1108,7 @@ def sos_trigger():
         try:
             result = mongo.db.sos_alerts.insert_one(sos_alert)
             print(f"✓ SOS TRIGGER: SOS alert created with ID {result.inserted_id}")
+            emergency_broker.publish(sos_alert)
         except Exception as e:
             print(f"❌ SOS TRIGGER: Failed to insert SOS alert: {e}")
             return jsonify({"error": f"Failed to create alert: {str(e)}"}), 500
@@ -780,13 +1141,9 @@ def sos_trigger():
         
         print(f"🚨 SOS ALERT TRIGGERED: Patient {patient.get('name')} (ID: {patient_id})")
         
-        # --- SEND TWILIO SMS ---
+        # --- QUEUE SMS ---
+        # The alert is already durable; texts go out from the background dispatcher
         try:
-            twilio_account_sid = os.getenv('TWILIO_ACCOUNT_SID')
-            twilio_auth_token = os.getenv('TWILIO_AUTH_TOKEN')
-            twilio_phone_number = os.getenv('TWILIO_PHONE_NUMBER')
-            twilio_messaging_service_sid = os.getenv('TWILIO_MESSAGING_SERVICE_SID')
-            
             emergency_contact = os.getenv('EMERGENCY_CONTACT_NUMBER')
             hospital_contact = os.getenv('HOSPITAL_CONTACT_NUMBER')
             
@@ -802,33 +1159,13 @@ def sos_trigger():
             
             print(f"📱 SOS TRIGGER: Emergency contacts to notify: {contacts_to_notify}")
             
-            if twilio_account_sid and twilio_auth_token and contacts_to_notify and (twilio_phone_number or twilio_messaging_service_sid):
-                try:
-                    client = Client(twilio_account_sid, twilio_auth_token)
-                    
-                    msg_kwargs_base = {
-                        "body": f"🚨 GOLDENSAGE EMERGENCY 🚨\nAlert from: {patient.get('name')}\nLogin to Guardian Dashboard immediately for more details."
-                    }
-                    
-                    if twilio_messaging_service_sid:
-                        msg_kwargs_base["messaging_service_sid"] = twilio_messaging_service_sid
-                    else:
-                        msg_kwargs_base["from_"] = twilio_phone_number
-
-                    for contact in set(contacts_to_notify):
-                        try:
-                            kwargs = msg_kwargs_base.copy()
-                            kwargs["to"] = contact
-                            sms_message = client.messages.create(**kwargs)
-                            print(f"✓ SMS sent to {contact}! SID: {sms_message.sid}")
-                        except Exception as e:
-                            print(f"❌ Failed to send SMS to {contact}: {e}")
-                except Exception as twilio_error:
-                    print(f"❌ Failed to initialize Twilio client: {twilio_error}")
+            if sms_dispatcher and contacts_to_notify:
+                body = f"🚨 GOLDENSAGE EMERGENCY 🚨\nAlert from: {patient.get('name')}\nLogin to Guardian Dashboard immediately for more details."
+                sms_dispatcher.enqueue(str(result.inserted_id), contacts_to_notify, body)
             else:
                 print("⚠️ Twilio credentials or contact numbers missing. SMS not sent.")
         except Exception as sms_error:
-            print(f"⚠️ Twilio SMS sending failed: {sms_error}")
+            print(f"⚠️ Failed to queue SOS SMS: {sms_error}")
         
         print(f"✅ SOS trigger endpoint finished successfully")
         return jsonify({
@@ -882,6 +1219,7 @@ def sos_debug():
             "emergency_contact": bool(os.getenv('EMERGENCY_CONTACT_NUMBER')),
             "hospital_contact": bool(os.getenv('HOSPITAL_CONTACT_NUMBER'))
         }
+        debug_info["sms_outbox"] = sms_dispatcher.stats() if sms_dispatcher else None
         
         # Check MongoDB connectivity
         try:
@@ -903,23 +1241,65 @@ def sos_dashboard():
         
         patient_id = current_user.id
         
-        # Fetch active SOS alerts
-        sos_alerts = list(mongo.db.sos_alerts.find({'patient_id': patient_id}).sort('timestamp', -1))
+        # Fetch SOS history a page at a time (?cursor=&limit=); the active count covers every alert
+        sos_alerts, next_cursor = keyset_page(
+            mongo.db.sos_alerts, {'patient_id': patient_id}, 'timestamp',
+            cursor=request.args.get('cursor'), limit=page_limit(request.args.get('limit', type=int))
+        )
         
         for alert in sos_alerts:
             alert['_id'] = str(alert['_id'])
-            alert['timestamp'] = str(alert['timestamp'])
+            alert['timestamp'] = str(alert['timestamp']) if alert.get('timestamp') else None
         
         return jsonify({
             "alerts": sos_alerts,
-            "active_count": sum(1 for alert in sos_alerts if alert['status'] == 'active')
+            "next_cursor": next_cursor,
+            "active_count": mongo.db.sos_alerts.count_documents({'patient_id': patient_id, 'status': 'active'})
         })
         
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+# --- METRICS ---
+@app.route('/api/metrics')
+@login_required
+def metrics():
+    """In-process counters for this worker"""
+    return jsonify({
+        "user_cache": user_cache.stats(),
+        "emergency_stream": {
+            "subscribers": emergency_broker.subscriber_count(),
+            "feed_mode": emergency_feed.mode
+        },
+        "stream_slots": stream_slots.stats(),
+        "sms_outbox": sms_dispatcher.stats() if sms_dispatcher else None,
+        "voice_llm": voice_gateway.snapshot(),
+        "voice_cache": voice_cache.stats(),
+        "sudoku_games": sudoku_games.stats(),
+        "sudoku_puzzles": puzzle_bank.stats(),
+        "report_derivatives": report_derivatives.stats(),
+        "vitals_rollup": vitals_rollup.stats(),
+        "vitals_ingest": vitals_ingestor.stats()
+    })
+
+
 # --- MEDICAL REPORTS API ---
+def report_json(report):
+    report['_id'] = str(report['_id'])
+    # convert datetime for json
+    if isinstance(report.get('upload_date'), datetime):
+        report['upload_date'] = report['upload_date'].isoformat()
+    derivatives = report.pop('derivatives', None) or {}
+    report['preview_status'] = derivatives.get('status')
+    if derivatives.get('status') == 'ready':
+        report['page_count'] = derivatives.get('page_count')
+        report['thumbnail_url'] = blob_url(derivatives['thumbnail'], 'thumbnail.jpg')
+        report['preview_url'] = blob_url(derivatives['preview'], 'preview.jpg')
+    return report
+
 @app.route('/api/reports/upload', methods=['POST'])
 @login_required
 def upload_report():
@@ -931,6 +1311,8 @@ def upload_report():
         patient_id = request.form.get('patient_id')
         if not patient_id:
             return jsonify({'error': 'Missing patient_id'}), 400
+        if linked_patient_id(patient_id) is None:
+            return jsonify({'error': 'Unauthorized'}), 403
 
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
@@ -941,29 +1323,97 @@ def upload_report():
         
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        # Add timestamp to make filename unique
-        time_str = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        unique_filename = f"{time_str}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        file.save(filepath)
-        
-        report_data = {
-            'patient_id': patient_id,
-            'filename': filename,
-            'filepath': f"/{app.config['UPLOAD_FOLDER']}/{unique_filename}",
-            'upload_date': datetime.utcnow(),
-            'file_size': os.path.getsize(filepath)
-        }
-        
-        result = mongo.db.reports.insert_one(report_data)
-        report_data['_id'] = str(result.inserted_id)
-        # convert datetime for json
-        report_data['upload_date'] = report_data['upload_date'].isoformat()
-        
-        return jsonify({'status': 'success', 'report': report_data})
+        sha256, size, _ = blob_store.put_stream(file.stream)
+        report_data = create_report(mongo, patient_id, filename, sha256, size)
+        report_derivatives.notify()
+        return jsonify({'status': 'success', 'report': report_json(report_data)})
         
     return jsonify({'error': 'File type not allowed'}), 400
 
+# Resumable uploads: create a session, PATCH chunks at Upload-Offset, then finalize.
+# Progress is kept in upload_sessions, so a dropped connection resumes on any worker.
+@app.route('/api/reports/uploads', methods=['POST'])
+@login_required
+def create_report_upload():
+    if current_user.role not in ['patient', 'guardian']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    data = request.get_json(silent=True) or {}
+
+    patient_id = current_user.id
+    if current_user.role == 'guardian':
+        patient_id = data.get('patient_id')
+        if not patient_id:
+            return jsonify({'error': 'Missing patient_id'}), 400
+        if linked_patient_id(patient_id) is None:
+            return jsonify({'error': 'Unauthorized'}), 403
+
+    filename = secure_filename(data.get('filename') or '')
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    size = data.get('size')
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({'error': 'Missing size'}), 400
+    if size > MAX_REPORT_BYTES:
+        return jsonify({'error': 'File too large'}), 413
+
+    upload = create_session(mongo.db, blob_store, current_user.get_id(), ref_id(patient_id), filename, size)
+    return jsonify({
+        'upload_id': str(upload['_id']),
+        'offset': 0,
+        'size': size,
+        'chunk_size': UPLOAD_CHUNK_SIZE
+    }), 201
+
+@app.route('/api/reports/uploads/<upload_id>', methods=['GET'])
+@login_required
+def report_upload_status(upload_id):
+    upload = get_session(mongo.db, upload_id, current_user.get_id())
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify({'upload_id': upload_id, 'offset': upload['offset'], 'size': upload['size'], 'status': upload['status']})
+
+@app.route('/api/reports/uploads/<upload_id>', methods=['PATCH'])
+@login_required
+def upload_report_chunk(upload_id):
+    upload = get_session(mongo.db, upload_id, current_user.get_id())
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'Missing Upload-Offset header'}), 400
+    try:
+        new_offset = write_chunk(mongo.db, blob_store, upload, offset, request.stream)
+    except OffsetMismatch as e:
+        return jsonify({'error': 'Offset mismatch', 'offset': e.offset}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 413
+    except Exception as e:
+        print(f"⚠️ Upload {upload_id} chunk interrupted: {e}")
+        return jsonify({'error': 'Chunk interrupted'}), 400
+    return jsonify({'offset': new_offset, 'size': upload['size']})
+
+@app.route('/api/reports/uploads/<upload_id>/finalize', methods=['POST'])
+@login_required
+def finalize_report_upload(upload_id):
+    upload = get_session(mongo.db, upload_id, current_user.get_id())
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    if upload['status'] == 'complete':
+        # Retried finalize whose first response was lost
+        report = mongo.db.reports.find_one({'_id': upload['report_id']}, {'derivatives.text': 0})
+        if not report:
+            return jsonify({'error': 'Report not found'}), 404
+        return jsonify({'status': 'success', 'report': report_json(report)})
+    try:
+        report = finalize_session(
+            mongo.db, blob_store, upload,
+            lambda sha256, size: create_report(mongo, upload['patient_id'], upload['filename'], sha256, size)
+        )
+    except OffsetMismatch as e:
+        return jsonify({'error': 'Upload incomplete', 'offset': e.offset}), 409
+    report_derivatives.notify()
+    return jsonify({'status': 'success', 'report': report_json(report)})
+
 @app.route('/api/reports', methods=['GET'])
 @login_required
 def get_reports():
@@ -976,17 +1426,69 @@ def get_reports():
         if not patient_id:
             return jsonify({'error': 'Missing patient_id'}), 400
 
-    # Query by patient_id (same list for guardian and patient); support both string and ObjectId in DB
+    # Query by patient_id (same list for guardian and patient)
+    q = {'patient_id': ref_id(patient_id)}
     try:
-        q = {'$or': [{'patient_id': patient_id}, {'patient_id': ObjectId(patient_id)}]}
-    except Exception:
-        q = {'patient_id': patient_id}
-    reports = list(mongo.db.reports.find(q).sort('upload_date', -1))
-    for r in reports:
-        r['_id'] = str(r['_id'])
-        r['upload_date'] = r['upload_date'].isoformat() if isinstance(r['upload_date'], datetime) else r['upload_date']
-        
-    return jsonify({'reports': reports})
+        # Extracted text can be large and is only needed by search
+        reports, next_cursor = keyset_page(
+            mongo.db.reports, q, 'upload_date',
+            cursor=request.args.get('cursor'), limit=page_limit(request.args.get('limit', type=int)),
+            projection={'derivatives.text': 0}
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'reports': [report_json(r) for r in reports], 'next_cursor': next_cursor})
+
+@app.route('/api/reports/search', methods=['GET'])
+@login_required
+def search_reports_api():
+    """Ranked full-text search over report text and filenames, with snippets."""
+    if current_user.role not in ['patient', 'guardian']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({'error': 'Missing q'}), 400
+    limit = request.args.get('limit', 20, type=int)
+
+    names = {}
+    if current_user.role == 'patient':
+        patient_ids = [current_user.id]
+    else:
+        # Guardians search all their patients unless one is picked
+        names = {str(p['_id']): p.get('name') for p in mongo.db.patients.find({'guardian_id': current_user.id}, {'name': 1})}
+        patient_ids = list(names)
+        patient_id = request.args.get('patient_id')
+        if patient_id:
+            if patient_id not in names:
+                return jsonify({'error': 'Unauthorized'}), 403
+            patient_ids = [patient_id]
+
+    started = time.monotonic()
+    results = search_reports(mongo.db, patient_ids, query, limit=max(limit, 1))
+    for r in results:
+        report_json(r)
+        if names:
+            r['patient_name'] = names.get(r['patient_id'])
+    return jsonify({
+        'query': query,
+        'results': results,
+        'took_ms': round((time.monotonic() - started) * 1000, 2)
+    })
+
+@app.route('/blobs/<sha256>/<filename>')
+@login_required
+def serve_blob(sha256, filename):
+    if not blob_store.is_hash(sha256) or not blob_store.exists(sha256):
+        return "Not found", 404
+    # The type comes from the stored content, not the filename in the URL; anything a
+    # browser could run as a page on this origin (HTML, SVG, ...) is only ever a download
+    mimetype = blob_mimetype(mongo.db, blob_store, sha256)
+    # The URL names the content hash, so the file behind it never changes
+    return file_server.send(
+        'blobs', blob_store.path(sha256), etag=sha256, immutable=True, private=True,
+        download_name=secure_filename(filename) or sha256, mimetype=mimetype,
+        as_attachment=mimetype not in INLINE_TYPES
+    )
 
 # --- GAMES API ---
 @app.route('/games/<path:path>')
@@ -999,67 +1501,25 @@ def send_games(path):
 
 # --- SUDOKU GAME LOGIC ---
 
-def generate_4x4():
-    return [
-        [1, 0, 0, 4],
-        [0, 4, 1, 0],
-        [0, 1, 3, 0],
-        [4, 0, 0, 2]
-    ]
-
-def generate_9x9():
-    return [
-        [5,3,0,0,7,0,0,0,0],
-        [6,0,0,1,9,5,0,0,0],
-        [0,9,8,0,0,0,0,6,0],
-        [8,0,0,0,6,0,0,0,3],
-        [4,0,0,8,0,3,0,0,1],
-        [7,0,0,0,2,0,0,0,6],
-        [0,6,0,0,0,0,2,8,0],
-        [0,0,0,4,1,9,0,0,5],
-        [0,0,0,0,8,0,0,7,9]
-    ]
-
-def generate_grid(size):
-    if size == 9:
-        return deepcopy(generate_9x9())
-    return deepcopy(generate_4x4())
-
-def can_place(grid, row, col, num, size):
-    # Row check
-    if num in grid[row]:
-        return False
-    # Column check
-    for i in range(size):
-        if grid[i][col] == num:
-            return False
-    # Box check
-    box_size = int(size ** 0.5)
-    start_row = (row // box_size) * box_size
-    start_col = (col // box_size) * box_size
-    for i in range(box_size):
-        for j in range(box_size):
-            if grid[start_row + i][start_col + j] == num:
-                return False
-    return True
-
 @app.route("/sudoku")
 @login_required
 def sudoku():
     size = request.args.get("size", 4, type=int)
+    if size not in (4, 9):
+        size = 4
+    difficulty = request.args.get("difficulty", "easy")
+    if difficulty not in DIFFICULTIES:
+        difficulty = "easy"
     user_id = current_user.id
-    if user_id not in user_games or user_games[user_id]["size"] != size:
-        grid = generate_grid(size)
-        user_games[user_id] = {
-            "size": size,
-            "grid": grid,
-            "original": deepcopy(grid)
-        }
-    game = user_games[user_id]
+    game = sudoku_games.get(user_id)
+    if game is None or game.size != size or request.args.get("new"):
+        game = SudokuGame(size, puzzle_bank.draw(size, difficulty))
+        sudoku_games.save(user_id, game)
     return render_template(
         "suduko.html",
-        grid=game["grid"],
-        size=size
+        grid=game.rows(),
+        size=game.size,
+        difficulty=difficulty
     )
 
 @app.route("/sudoku/check", methods=["POST"])
@@ -1070,20 +1530,32 @@ def check_sudoku():
     row = data["row"]
     col = data["col"]
     num = data["num"]
-    game = user_games.get(user_id)
+    game = sudoku_games.get(user_id)
     if not game:
         return jsonify({"status": "error"})
-    grid = game["grid"]
-    original = game["original"]
-    size = game["size"]
-    if original[row][col] != 0:
+    size = game.size
+    if not (0 <= row < size and 0 <= col < size):
+        return jsonify({"status": "error"})
+    if game.is_given(row, col):
         return jsonify({"status": "blocked"})
-    if can_place(grid, row, col, num, size):
-        grid[row][col] = num
+    if not 1 <= num <= size:
+        return jsonify({"status": "wrong"})
+    if game.place(row, col, num):
+        sudoku_games.save(user_id, game)
         return jsonify({"status": "correct"})
     else:
         return jsonify({"status": "wrong"})
 
+@app.route("/sudoku/hint")
+@login_required
+def sudoku_hint():
+    """Next logical move plus the cells currently in conflict, read from the live board."""
+    game = sudoku_games.get(current_user.id)
+    if not game:
+        return jsonify({"status": "error"})
+    result = analyse(game.size, game.grid, game.masks)
+    return jsonify(dict(result, status="ok"))
+
 
 # ═══ Voice Assistant (GoldenSage) ═══
 @app.route('/voice-assistant')
@@ -1096,20 +1568,8 @@ def voice_assistant_page():
     )
 
 
-@app.route('/api/voice/chat', methods=['POST'])
-@login_required
-def voice_chat():
-    """Main Gemini conversation endpoint for voice assistant."""
-    data = request.json or {}
-    user_text = data.get('text', '').strip()
-    lang_name = data.get('lang_name', 'English')
-    role = current_user.role
-
-    if not user_text:
-        return jsonify({'error': 'No input'}), 400
-
-    ACTIONS_BY_ROLE = {
-        'patient': """
+VOICE_ACTIONS_BY_ROLE = {
+    'patient': """
 NAVIGATE_HOME           → My Day / Home dashboard tab (p-home)
 NAVIGATE_MEDICINE       → Digital Pharmacy / Medicine tab (p-medicine)
 NAVIGATE_PROFILE        → My Profile tab (p-profile)
@@ -1118,7 +1578,7 @@ NAVIGATE_NOTIFICATIONS  → /notifications page
 TRIGGER_SOS             → Send emergency SOS alert to guardian immediately
 LOGOUT                  → Sign the user out
 """,
-        'guardian': """
+    'guardian': """
 NAVIGATE_GUARDIAN_HOME   → Guardian home tab (home-view)
 NAVIGATE_DAILY_UPDATES   → Daily Updates / vitals tab (daily-updates-view)
 NAVIGATE_PATIENT_PROFILE → Patient Profile / Identity & Health tab (patient-profile)
@@ -1129,15 +1589,15 @@ PRINT_REPORT             → Print patient medical report (triggers browser prin
 OPEN_SETTINGS            → Open the Settings modal
 LOGOUT                   → Sign the user out
 """,
-        'unity': """
+    'unity': """
 NAVIGATE_CONNECTIONS    → /connection page (Unity Hub feed)
 NAVIGATE_NOTIFICATIONS  → /notifications page
 LOGOUT                  → Sign the user out
 """
-    }
+}
 
-    KNOWLEDGE = {
-        'patient': """
+VOICE_KNOWLEDGE = {
+    'patient': """
 APP SECTIONS:
 - My Day (home): Daily tasks with check buttons, vitals (heart rate/BP/blood sugar), upcoming appointments, care team doctors.
 - Medicine (Digital Pharmacy): Medicine list with dosage/timing, intake timeline (morning/noon/night), refill buttons, stock levels.
@@ -1152,7 +1612,7 @@ ACTIONS AVAILABLE:
 - View vitals: shown automatically on My Day dashboard.
 - Check appointments: visible in the My Day home section.
 """,
-        'guardian': """
+    'guardian': """
 APP SECTIONS:
 - Home: Overview with upcoming sessions, session history, quick navigation cards.
 - Daily Updates: Live patient vitals (heart rate, BP, blood sugar), daily lifestyle adherence, medication compliance, routine tasks.
@@ -1165,9 +1625,9 @@ APP SECTIONS:
 ACTIONS AVAILABLE:
 - Check vitals: Daily Updates tab shows real-time patient vitals.
 - Print medical report: triggers a formatted print window with patient details, allergies, medications, emergency contact.
-- Check SOS: SOS alerts appear in Notifications — also auto-checked every 10 seconds by the dashboard.
+- Check SOS: SOS alerts appear in Notifications — also pushed instantly to the open dashboard.
 """,
-        'unity': """
+    'unity': """
 APP SECTIONS:
 - Unity Hub Feed: Social feed with posts from students, NGOs, mentors, elderly patients.
 - Tabs: All Feed, Students & Elderly, NGO Aid, Patient Circle.
@@ -1175,24 +1635,55 @@ APP SECTIONS:
 - Messages: Direct messaging via paper-plane icon.
 - Notifications: Likes and activity notifications via heart icon.
 """
-    }
+}
+
+VOICE_ACTION_ROUTES = {
+    'NAVIGATE_HOME': ('/patient-dashboard', 'p-home'),
+    'NAVIGATE_MEDICINE': ('/patient-dashboard', 'p-medicine'),
+    'NAVIGATE_PROFILE': ('/patient-dashboard', 'p-profile'),
+    'NAVIGATE_GUARDIAN_HOME': ('/guardian-dashboard', 'home-view'),
+    'NAVIGATE_DAILY_UPDATES': ('/guardian-dashboard', 'daily-updates-view'),
+    'NAVIGATE_PATIENT_PROFILE': ('/guardian-dashboard', 'patient-profile'),
+    'NAVIGATE_PREFERENCES': ('/guardian-dashboard', 'preferences-view'),
+    'NAVIGATE_CONNECTIONS': ('/connection', None),
+    'NAVIGATE_NOTIFICATIONS': ('/notifications', None),
+    'NAVIGATE_MAIN': ('/main', None),
+    'TRIGGER_SOS': ('/feature/sos/trigger', None),
+    'PRINT_REPORT': (None, None),
+    'OPEN_SETTINGS': (None, None),
+    'LOGOUT': ('/signout', None),
+}
+
+VOICE_JSON_FORMAT = """=== RESPONSE FORMAT ===
+Respond with VALID JSON ONLY. No markdown. No code fences.
+{
+  "reply": "<warm reply in {lang_name}, max 3 sentences>",
+  "action": "<action name from the list above, or null if just answering a question>",
+  "confidence": <0.0-1.0>
+}
+"""
 
-    # Intercept ADD_REMINDER before hitting Gemini if fallback detected it
-    fallback_result = _voice_fallback(user_text, role, lang_name)
-    if fallback_result.get('action') == 'ADD_REMINDER':
-        result = fallback_result
-    else:
-        prompt = f"""
+# Streamed answers put the action on the first line so it can be acted on before the reply finishes
+VOICE_STREAM_FORMAT = """=== RESPONSE FORMAT ===
+Plain text only. No JSON. No markdown. No code fences.
+Line 1: ACTION: <action name from the list above, or null if just answering a question>
+Line 2 onwards: your warm reply in {lang_name}, max 3 sentences.
+"""
+
+
+def _voice_prompt(user_text, role, lang_name, response_format=VOICE_JSON_FORMAT):
+    response_format = response_format.replace('{lang_name}', lang_name)
+    return f"""
 You are GoldenSage Voice Assistant — embedded inside the GoldenSage senior health web app in India.
 You are speaking directly to a {role.upper()} user.
 You must respond ONLY in {lang_name}. Be warm, gentle, patient — this is likely an elderly user or their caregiver.
 Keep your reply SHORT (max 2–3 sentences) — it will be spoken aloud by the app.
 
 === APP KNOWLEDGE ===
-{KNOWLEDGE.get(role, KNOWLEDGE['patient'])}
+{VOICE_KNOWLEDGE.get(role, VOICE_KNOWLEDGE['patient'])}
 
 === NAVIGATION ACTIONS YOU CAN TRIGGER ===
-{ACTIONS_BY_ROLE.get(role, ACTIONS_BY_ROLE['patient'])}
+{VOICE_ACTIONS_BY_ROLE.get(role, VOICE_ACTIONS_BY_ROLE['patient'])}
 
 === RULES ===
 1. Respond ONLY in {lang_name}. Use warm, simple language.
@@ -1203,56 +1694,63 @@ Keep your reply SHORT (max 2–3 sentences) — it will be spoken aloud by the a
 6. Keep reply to 1–3 short sentences (spoken aloud).
 7. For SOS and Logout — always confirm verbally in the reply.
 
-=== RESPONSE FORMAT ===
-Respond with VALID JSON ONLY. No markdown. No code fences.
-{{
-  "reply": "<warm reply in {lang_name}, max 3 sentences>",
-  "action": "<action name from the list above, or null if just answering a question>",
-  "confidence": <0.0-1.0>
-}}
-
+{response_format}
 User ({role}) said: "{user_text}"
 """
 
+
+def _save_voice_reminder(patient_id, user_text):
+    mongo.db.tasks.insert_one({
+        'patient_id': patient_id,
+        'title': 'Voice Reminder',
+        'description': user_text,
+        'date': datetime.utcnow().strftime('%Y-%m-%d'),
+        'is_completed': False
+    })
+
+
+@app.route('/api/voice/chat', methods=['POST'])
+@login_required
+def voice_chat():
+    """Main Gemini conversation endpoint for voice assistant."""
+    data = request.json or {}
+    user_text = data.get('text', '').strip()
+    lang_name = data.get('lang_name', 'English')
+    role = current_user.role
+
+    if not user_text:
+        return jsonify({'error': 'No input'}), 400
+
+    # Intercept ADD_REMINDER before hitting Gemini if fallback detected it
+    fallback_result = _voice_fallback(user_text, role, lang_name)
+    if fallback_result.get('action') == 'ADD_REMINDER':
+        result = fallback_result
+    else:
+        prompt = _voice_prompt(user_text, role, lang_name)
+
     try:
         # If fallback already handled it (e.g. ADD_REMINDER), skip Gemini text generation
         if not locals().get('result'):
-            if _voice_model:
-                raw = _voice_model.generate_content(prompt).text.strip()
-                raw = raw.replace('```json', '').replace('```', '').strip()
-                result = _json.loads(raw)
-            else:
-                result = fallback_result
+            def ask_gemini():
+                try:
+                    raw = voice_gateway.generate(prompt).strip()
+                    raw = raw.replace('```json', '').replace('```', '').strip()
+                    return _json.loads(raw), True
+                except LLMUnavailable as e:
+                    if voice_gateway.available:
+                        print(f'[VoiceChat] Gemini unavailable, using fallback: {e}')
+                    # Fallback answers are cheap and should not outlive a Gemini outage
+                    return fallback_result, False
+
+            result = voice_cache.get_or_compute(voice_cache.key(user_text, role, lang_name), ask_gemini)
 
         action = result.get('action') or 'null'
         
         # Save reminder to database
         if action == 'ADD_REMINDER':
-            mongo.db.tasks.insert_one({
-                'patient_id': current_user.id,
-                'title': 'Voice Reminder',
-                'description': user_text,
-                'date': datetime.utcnow().strftime('%Y-%m-%d'),
-                'is_completed': False
-            })
-
-        ACTION_ROUTES = {
-            'NAVIGATE_HOME': ('/patient-dashboard', 'p-home'),
-            'NAVIGATE_MEDICINE': ('/patient-dashboard', 'p-medicine'),
-            'NAVIGATE_PROFILE': ('/patient-dashboard', 'p-profile'),
-            'NAVIGATE_GUARDIAN_HOME': ('/guardian-dashboard', 'home-view'),
-            'NAVIGATE_DAILY_UPDATES': ('/guardian-dashboard', 'daily-updates-view'),
-            'NAVIGATE_PATIENT_PROFILE': ('/guardian-dashboard', 'patient-profile'),
-            'NAVIGATE_PREFERENCES': ('/guardian-dashboard', 'preferences-view'),
-            'NAVIGATE_CONNECTIONS': ('/connection', None),
-            'NAVIGATE_NOTIFICATIONS': ('/notifications', None),
-            'NAVIGATE_MAIN': ('/main', None),
-            'TRIGGER_SOS': ('/feature/sos/trigger', None),
-            'PRINT_REPORT': (None, None),
-            'OPEN_SETTINGS': (None, None),
-            'LOGOUT': ('/signout', None),
-        }
-        url, tab = ACTION_ROUTES.get(action, (None, None))
+            _save_voice_reminder(current_user.id, user_text)
+
+        url, tab = VOICE_ACTION_ROUTES.get(action, (None, None))
 
         return jsonify({
             'reply': result.get('reply', 'I am here to help you.'),
@@ -1266,136 +1764,113 @@ User ({role}) said: "{user_text}"
         return jsonify({'reply': 'I had a small problem. Please try again.', 'action': None, 'url': None, 'tab': None})
 
 
+@app.route('/api/voice/chat/stream', methods=['POST'])
+@login_required
+def voice_chat_stream():
+    """Streaming variant of /api/voice/chat (Server-Sent Events).
+
+    Emits `action` as soon as it is known, then the reply one sentence at a time as `reply`
+    events, and finally `done` with the full reply, so the browser can start speaking early.
+    """
+    data = request.json or {}
+    user_text = data.get('text', '').strip()
+    lang_name = data.get('lang_name', 'English')
+    role = current_user.role
+    user_id = current_user.id
+
+    if not user_text:
+        return jsonify({'error': 'No input'}), 400
+
+    fallback_result = _voice_fallback(user_text, role, lang_name)
+    cache_key = voice_cache.key(user_text, role, lang_name)
+
+    def sse(event, payload):
+        return f"event: {event}\ndata: {_json.dumps(payload)}\n\n"
+
+    def action_event(action):
+        action = action or 'null'
+        if action == 'ADD_REMINDER':
+            _save_voice_reminder(user_id, user_text)
+        url, tab = VOICE_ACTION_ROUTES.get(action, (None, None))
+        return sse('action', {'action': action, 'url': url, 'tab': tab})
+
+    def whole(result):
+        reply = result.get('reply', 'I am here to help you.')
+        yield action_event(result.get('action'))
+        yield sse('reply', {'text': reply})
+        yield sse('done', {'reply': reply, 'action': result.get('action') or 'null'})
+
+    def events():
+        if fallback_result.get('action') == 'ADD_REMINDER':
+            yield from whole(fallback_result)
+            return
+        cached = voice_cache.get(cache_key)
+        if cached is not None:
+            yield from whole(cached)
+            return
+
+        parser = ReplyStreamParser()
+        started = time.monotonic()
+        sent_action = False
+        try:
+            for chunk in voice_gateway.stream(_voice_prompt(user_text, role, lang_name, VOICE_STREAM_FORMAT)):
+                for kind, value in parser.feed(chunk):
+                    if kind == 'action':
+                        sent_action = True
+                        yield action_event(value)
+                    else:
+                        yield sse('reply', {'text': value})
+            for kind, value in parser.finish():
+                if kind == 'action':
+                    sent_action = True
+                    yield action_event(value)
+                else:
+                    yield sse('reply', {'text': value})
+        except LLMUnavailable as e:
+            if voice_gateway.available:
+                print(f'[VoiceChat] Gemini stream unavailable: {e}')
+            if not sent_action:
+                yield from whole(fallback_result)
+                return
+            # Part of the reply is already out; finish with what we have
+            yield sse('done', {'reply': parser.reply, 'action': parser.action or 'null'})
+            return
+
+        if parser.reply:
+            voice_cache.put(cache_key, {'reply': parser.reply, 'action': parser.action}, time.monotonic() - started)
+        else:
+            parser.reply = 'I am here to help you.'
+            yield sse('reply', {'text': parser.reply})
+        yield sse('done', {'reply': parser.reply, 'action': parser.action or 'null'})
+
+    if not stream_slots.try_acquire():
+        # The page falls back to /api/voice/chat
+        return streams_full()
+    response = Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    response.call_on_close(stream_slots.release)
+    return response
+
+
 def _voice_fallback(text, role, lang_name='English'):
     """Keyword fallback when no Gemini API key is configured."""
-    t = text.lower()
-    
-    translations = {
-        'TRIGGER_SOS': {
-            'English': 'Sending SOS to your guardian now!',
-            'Hindi': 'आपके अभिभावक को आपातकालीन संदेश भेजा जा रहा है!',
-            'Marathi': 'तुमच्या पालकांना आणीबाणीचा संदेश पाठवला जात आहे!'
-        },
-        'LOGOUT': {
-            'English': 'Logging you out.',
-            'Hindi': 'आपको लॉग आउट किया जा रहा है।',
-            'Marathi': 'तुम्हाला लॉग आउट केले जात आहे.'
-        },
-        'NAVIGATE_NOTIFICATIONS': {
-            'English': 'Opening Notifications.',
-            'Hindi': 'सूचनाएं खोली जा रही हैं।',
-            'Marathi': 'सूचना उघडत आहे.'
-        },
-        'NAVIGATE_CONNECTIONS': {
-            'English': 'Going to Connections.',
-            'Hindi': 'कनेक्शन पर जाया जा रहा है।',
-            'Marathi': 'कनेक्शनवर जात आहे.'
-        },
-        'PRINT_REPORT': {
-            'English': 'Printing the medical report now.',
-            'Hindi': 'मेडिकल रिपोर्ट प्रिंट की जा रही है।',
-            'Marathi': 'वैद्यकीय अहवाल मुद्रित करत आहे.'
-        },
-        'OPEN_SETTINGS': {
-            'English': 'Opening settings.',
-            'Hindi': 'सेटिंग्स खोली जा रही हैं।',
-            'Marathi': 'सेटिंग्ज उघडत आहे.'
-        },
-        'NAVIGATE_DAILY_UPDATES': {
-            'English': 'Opening Daily Updates.',
-            'Hindi': 'दैनिक अपडेट खोले जा रहे हैं।',
-            'Marathi': 'दैनिक अद्यतने उघडत आहे.'
-        },
-        'NAVIGATE_PATIENT_PROFILE': {
-            'English': 'Opening Patient Profile.',
-            'Hindi': 'रोगी प्रोफ़ाइल खोली जा रही है।',
-            'Marathi': 'रुग्ण प्रोफाइल उघडत आहे.'
-        },
-        'NAVIGATE_PREFERENCES': {
-            'English': 'Opening Preferences.',
-            'Hindi': 'प्राथमिकताएं खोली जा रही हैं।',
-            'Marathi': 'प्राधान्ये उघडत आहे.'
-        },
-        'NAVIGATE_GUARDIAN_HOME': {
-            'English': 'Taking you to the Guardian Dashboard.',
-            'Hindi': 'आपको अभिभावक डैशबोर्ड पर ले जाया जा रहा है।',
-            'Marathi': 'तुम्हाला पालक डॅशबोर्डवर नेत आहे.'
-        },
-        'NAVIGATE_MEDICINE': {
-            'English': 'Opening your medicines.',
-            'Hindi': 'आपकी दवाइयां खोली जा रही हैं।',
-            'Marathi': 'तुमची औषधे उघडत आहे.'
-        },
-        'NAVIGATE_PROFILE': {
-            'English': 'Opening your profile.',
-            'Hindi': 'आपकी प्रोफ़ाइल खोली जा रही है।',
-            'Marathi': 'तुमचे प्रोफाइल उघडत आहे.'
-        },
-        'NAVIGATE_HOME': {
-            'English': 'Taking you home.',
-            'Hindi': 'आपको घर ले जाया जा रहा है।',
-            'Marathi': 'तुम्हाला घरी नेत आहे.'
-        },
-        'DEFAULT': {
-            'English': "I'm here! Try: go home, medicines, my profile, or notifications.",
-            'Hindi': "मैं यहाँ हूँ! प्रयास करें: घर जाएं, दवाइयां, मेरी प्रोफ़ाइल, या सूचनाएं।",
-            'Marathi': "मी इथे आहे! प्रयत्न करा: घरी जा, औषधे, माझे प्रोफाइल, किंवा सूचना."
-        },
-        'ADD_REMINDER': {
-            'English': "I've added the reminder to your daily tasks!",
-            'Hindi': "मैंने आपके दैनिक कार्यों में रिमाइंडर जोड़ दिया है!",
-            'Marathi': "मी तुमच्या दैनंदिन कामांमध्ये रिमाइंडर जोडले आहे!"
-        }
-    }
+    return match_intent(text, role, lang_name)
 
-    def get_msg(action_key, default_lang='English'):
-        if lang_name not in translations.get(action_key, {}):
-            return translations[action_key].get(default_lang)
-        return translations[action_key].get(lang_name)
 
-    import re
-    # Match SOS and other emergency words as whole words to prevent false positives from greetings
-    # Ensure it's not matching the greeting "आणि आपत्कालीन SOS मध्ये मदत करू शकतो"
-    sos_pattern = r'\b(sos|emergency|help|danger|alarm|bachao|madad|sahayta|बचाओ|मदद|वाचवा|संकट|एसओएस|એસઓએસ|બચાવો|મદદ|સંકટ|বাঁচাও|সাহায্য|உதவி|காப்பாற்றுங்கள்|సహాయం|కాపాడండి|ಸಹಾಯ|ಕಾಪಾಡಿ|സഹായിക്കൂ|രക്ഷിക്കൂ)\b'
-    
-    # Do not trigger SOS if it is specifically the Marathi Welcome Greeting being sent back to the server.
-    is_marathi_greeting = "मी तुम्हाला ॲप नेव्हिगेट करण्यात, औषधे पाहण्यात आणि आपत्कालीन sos मध्ये मदत करू शकतो" in t
-    
-    if (re.search(sos_pattern, t) or 'এস ও এস' in t or 'एस ओ एस' in t) and not is_marathi_greeting:
-        return {'reply': get_msg('TRIGGER_SOS'), 'action': 'TRIGGER_SOS', 'confidence': .95}
-        
-    if any(w in t for w in ['logout', 'log out', 'sign out', 'bahar', 'niklo', 'लॉग आउट', 'लॉगआउट', 'बाहेर']):
-        return {'reply': get_msg('LOGOUT'), 'action': 'LOGOUT', 'confidence': .9}
-    if any(w in t for w in ['notif', 'alert', 'reminder', 'suchna', 'suchnaye', 'सूचना', 'अलर्ट']):
-        return {'reply': get_msg('NAVIGATE_NOTIFICATIONS'), 'action': 'NAVIGATE_NOTIFICATIONS', 'confidence': .9}
-    if any(w in t for w in ['connect', 'volunteer', 'unity', 'ngo', 'community', 'jodo', 'sampark', 'क्नेक्ट', 'स्वयंसेवक', 'जोड़ो', 'जोडा']):
-        return {'reply': get_msg('NAVIGATE_CONNECTIONS'), 'action': 'NAVIGATE_CONNECTIONS', 'confidence': .9}
-    
-    if role == 'guardian':
-        if any(w in t for w in ['print', 'report', 'medical', 'chhapo', 'report dekhao', 'प्रिंट', 'रिपोर्ट', 'छापा']):
-            return {'reply': get_msg('PRINT_REPORT'), 'action': 'PRINT_REPORT', 'confidence': .9}
-        if any(w in t for w in ['setting', 'dark', 'mode', 'preference', 'vyavastha', 'सेटिंग', 'व्यवस्था']):
-            return {'reply': get_msg('OPEN_SETTINGS'), 'action': 'OPEN_SETTINGS', 'confidence': .9}
-        if any(w in t for w in ['vital', 'update', 'daily', 'blood', 'heart', 'pressure', 'sugar', 'dhadkan', 'khoon', 'विटल्स', 'रक्तचाप', 'अद्यतन', 'अद्यतने']):
-            return {'reply': get_msg('NAVIGATE_DAILY_UPDATES'), 'action': 'NAVIGATE_DAILY_UPDATES', 'confidence': .9}
-        if any(w in t for w in ['patient profile', 'identity', 'record', 'allergy', 'mareez', 'rogi', 'रोगी', 'मरीज', 'रुग्ण']):
-            return {'reply': get_msg('NAVIGATE_PATIENT_PROFILE'), 'action': 'NAVIGATE_PATIENT_PROFILE', 'confidence': .9}
-        if any(w in t for w in ['preference', 'prefer', 'pasand', 'पसंद', 'प्राधान्य']):
-            return {'reply': get_msg('NAVIGATE_PREFERENCES'), 'action': 'NAVIGATE_PREFERENCES', 'confidence': .9}
-        return {'reply': get_msg('NAVIGATE_GUARDIAN_HOME'), 'action': 'NAVIGATE_GUARDIAN_HOME', 'confidence': .7}
-    
-    if any(w in t for w in ['medicine', 'medic', 'dawa', 'dawai', 'pill', 'tablet', 'pharmacy', 'dava', 'refill', 'ilaj', 'दवा', 'दवाई', 'औषध', 'गोळ्या']):
-        return {'reply': get_msg('NAVIGATE_MEDICINE'), 'action': 'NAVIGATE_MEDICINE', 'confidence': .9}
-    if any(w in t for w in ['profile', 'account', 'personal', 'mera', 'details', 'khata', 'प्रोफ़ाइल', 'खाता', 'प्रोफाइल', 'माहिती']):
-        return {'reply': get_msg('NAVIGATE_PROFILE'), 'action': 'NAVIGATE_PROFILE', 'confidence': .9}
-    if any(w in t for w in ['home', 'dashboard', 'ghar', 'my day', 'aaj', 'today', 'main', 'घर', 'डैशबोर्ड', 'डॅशबोर्ड']):
-        return {'reply': get_msg('NAVIGATE_HOME'), 'action': 'NAVIGATE_HOME', 'confidence': .9}
-        
-    if any(w in t for w in ['remind me', 'remind', 'reminder', 'alert', 'set an alert', 'याद दिलाना', 'रिमाइंडर', 'आठवण', 'अलर्ट']):
-        return {'reply': get_msg('ADD_REMINDER'), 'action': 'ADD_REMINDER', 'confidence': .85, 'text': text}
-    
-    return {'reply': get_msg('DEFAULT'), 'action': None, 'confidence': .2}
+def start_background_workers():
+    """Start this process's background workers.
+
+    Called by gunicorn in each worker once the app is loaded (gunicorn.conf.py) and by
+    `python app.py`; threads started before a fork would not survive it.
+    """
+    if sms_dispatcher:
+        sms_dispatcher.start()
+    report_derivatives.start()
+    vitals_rollup.start()
 
 
 if __name__ == "__main__":
+    start_background_workers()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""Micro-benchmark for Sudoku move validation.
+
+Run: python bench_sudoku.py
+Compares the row/column/box scan (sudoku_engine.can_place) with the incremental
+bitmasks (ConstraintMasks.can_place) on half-filled 4x4, 9x9, 16x16 and 25x25 boards,
+then times one /sudoku/hint analysis per board.
+"""
+import random
+import timeit
+
+from sudoku_engine import ConstraintMasks, analyse, box_shape, can_place
+
+SIZES = [4, 9, 16, 25]
+PROBES = 2000
+NUMBER = 20
+
+
+def solved_board(size):
+    """A valid full board from the standard shifted-pattern construction."""
+    box_rows, box_cols = box_shape(size)
+    return [
+        [(box_cols * (r % box_rows) + r // box_rows + c) % size + 1 for c in range(size)]
+        for r in range(size)
+    ]
+
+
+def half_filled(size, rng):
+    rows = solved_board(size)
+    for r in range(size):
+        for c in range(size):
+            if rng.random() < 0.5:
+                rows[r][c] = 0
+    return rows
+
+
+def main():
+    rng = random.Random(7)
+    print(f"{'size':<8}{'scan µs':>12}{'masks µs':>12}{'speed-up':>12}")
+    for size in SIZES:
+        rows = half_filled(size, rng)
+        masks = ConstraintMasks.from_grid(size, [v for row in rows for v in row])
+        probes = [(rng.randrange(size), rng.randrange(size), rng.randint(1, size)) for _ in range(PROBES)]
+
+        assert all(can_place(rows, r, c, n, size) == masks.can_place(r, c, n) for r, c, n in probes)
+
+        scan = timeit.timeit(lambda: [can_place(rows, r, c, n, size) for r, c, n in probes], number=NUMBER)
+        bits = timeit.timeit(lambda: [masks.can_place(r, c, n) for r, c, n in probes], number=NUMBER)
+        calls = PROBES * NUMBER
+        label = f"{size}x{size}"
+        print(f"{label:<8}{scan / calls * 1e6:>12.3f}{bits / calls * 1e6:>12.3f}{scan / bits:>11.1f}x")
+
+    print(f"\n{'size':<8}{'hint µs':>12}")
+    for size in SIZES:
+        grid = [v for row in half_filled(size, rng) for v in row]
+        masks = ConstraintMasks.from_grid(size, grid)
+        total = timeit.timeit(lambda: analyse(size, grid, masks), number=NUMBER * 10)
+        label = f"{size}x{size}"
+        print(f"{label:<8}{total / (NUMBER * 10) * 1e6:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Micro-benchmark for the voice keyword matcher.
+
+Run: python bench_voice_intents.py
+Prints the average cost of one match_intent() call per language and role.
+"""
+import timeit
+
+from voice_intents import match_intent
+
+UTTERANCES = {
+    'English': [
+        'go home', 'show my medicines', 'open my profile', 'any notifications?',
+        'remind me to drink water at 5', 'I need help', 'print the report', 'what is the weather like today',
+    ],
+    'Hindi': [
+        'घर ले चलो', 'मेरी दवाई दिखाओ', 'मेरा प्रोफ़ाइल खोलो', 'सूचना दिखाओ',
+        'मुझे पानी पीने की याद दिलाना', 'मदद करो', 'रिपोर्ट प्रिंट करो', 'आज मौसम कैसा है',
+    ],
+    'Marathi': [
+        'घरी चला', 'माझ्या गोळ्या दाखवा', 'माझी माहिती दाखवा', 'सूचना दाखवा',
+        'मला पाणी पिण्याची आठवण करा', 'वाचवा', 'अहवाल छापा', 'आज हवामान कसे आहे',
+    ],
+}
+
+ROLES = ['patient', 'guardian', 'unity']
+NUMBER = 20000
+
+
+def main():
+    print(f"{'language':<10}{'role':<10}{'µs / utterance':>16}")
+    for lang, utterances in UTTERANCES.items():
+        for role in ROLES:
+            total = timeit.timeit(
+                lambda: [match_intent(u, role, lang) for u in utterances],
+                number=NUMBER // len(utterances)
+            )
+            per_call = total / ((NUMBER // len(utterances)) * len(utterances))
+            print(f"{lang:<10}{role:<10}{per_call * 1e6:>16.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import re
+import tempfile
+from datetime import datetime
+
+CHUNK_SIZE = 1024 * 1024
+
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+# Leading bytes of the file types reports are uploaded as
+_SIGNATURES = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/msword'),
+]
+# Types a browser may render on the app's origin; everything else is sent as a download
+INLINE_TYPES = {'application/pdf', 'image/png', 'image/jpeg', 'image/gif', 'image/webp'}
+
+
+class BlobStore:
+    """Content-addressed files: each distinct upload is stored once, at root/ab/cd/<sha256>.
+
+    The two-level shard keeps every directory small however many files are stored.
+    Writes go to root/tmp first and are renamed into place, so a half-written
+    upload is never visible under its hash.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    @staticmethod
+    def is_hash(value):
+        return bool(value) and _SHA256.match(value) is not None
+
+    def path(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def exists(self, sha256):
+        return os.path.exists(self.path(sha256))
+
+    def temp_file(self):
+        """(fd, path) of a fresh file in the store's temp directory, on the same filesystem as the blobs."""
+        return tempfile.mkstemp(dir=self.tmp_dir)
+
+    def put_stream(self, stream, chunk_size=CHUNK_SIZE):
+        """Copy a file-like object into the store in chunks, hashing as it goes.
+
+        Returns (sha256, size, created); created is False when the content was already stored.
+        """
+        fd, tmp_path = self.temp_file()
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        sha256 = digest.hexdigest()
+        return sha256, size, self.adopt(tmp_path, sha256)
+
+    def put_path(self, path):
+        with open(path, 'rb') as f:
+            return self.put_stream(f)
+
+    def adopt(self, tmp_path, sha256):
+        """Move a fully written temp file into place under its hash, or drop it as a duplicate."""
+        final_path = self.path(sha256)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+            return False
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(tmp_path, final_path)
+        return True
+
+
+def sniff_mimetype(path):
+    """MIME type of a file from its leading bytes, or 'application/octet-stream' if it is not a known type."""
+    with open(path, 'rb') as f:
+        head = f.read(16)
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, mimetype in _SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    return 'application/octet-stream'
+
+
+def blob_mimetype(db, store, sha256):
+    """MIME type of a stored blob, kept on its `blobs` record.
+
+    It comes from the content, never the filename in the URL. Blobs stored
+    before types were recorded are sniffed once and the record updated.
+    """
+    record = db.blobs.find_one({'_id': sha256}, {'mimetype': 1})
+    if record and record.get('mimetype'):
+        return record['mimetype']
+    mimetype = sniff_mimetype(store.path(sha256))
+    if record:
+        db.blobs.update_one({'_id': sha256}, {'$set': {'mimetype': mimetype}})
+    return mimetype
+
+
+def blob_url(sha256, filename):
+    """Download URL for a stored file; the name only sets the download name."""
+    return f"/blobs/{sha256}/{filename}"
+
+
+def link_blob(db, sha256, size):
+    """Count one more document referencing a blob in the `blobs` collection."""
+    db.blobs.update_one(
+        {'_id': sha256},
+        {'$setOnInsert': {'size': size, 'created_at': datetime.utcnow()}, '$inc': {'refs': 1}},
+        upsert=True
+    )
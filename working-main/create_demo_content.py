@@ -25,7 +25,8 @@ def create_demo_data():
         print(f"Creating data for patient: {patient['name']} ({patient_id})")
 
         # 2. Clear existing demo data for this patient (optional, but good for idempotency)
-        mongo.db.vitals.delete_many({'patient_id': patient_id})
+        mongo.db.vitals_buckets.delete_many({'patient_id': patient_id})
+        mongo.db.patient_vitals_latest.delete_many({'patient_id': patient_id})
         mongo.db.medications.delete_many({'patient_id': patient_id})
         mongo.db.appointments.delete_many({'patient_id': patient_id})
         mongo.db.tasks.delete_many({'patient_id': patient_id})
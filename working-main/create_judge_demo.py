@@ -10,6 +10,8 @@ from werkzeug.security import generate_password_hash
 from datetime import datetime, timedelta
 from bson.objectid import ObjectId
 
+from vitals_store import record_vital
+
 # Load environment variables
 load_dotenv()
 
@@ -137,16 +139,11 @@ def create_demo_accounts():
     ]
     
     # Clear existing vitals for this patient
-    db.vitals.delete_many({'patient_id': str(patient_id)})
+    db.vitals_buckets.delete_many({'patient_id': str(patient_id)})
+    db.patient_vitals_latest.delete_many({'patient_id': str(patient_id)})
     
     for vital in demo_vitals:
-        db.vitals.insert_one({
-            'patient_id': str(patient_id),
-            'type': vital['type'],
-            'value': vital['value'],
-            'unit': vital['unit'],
-            'timestamp': now - timedelta(hours=2)
-        })
+        record_vital(db, str(patient_id), vital['type'], vital['value'], vital['unit'], now - timedelta(hours=2))
         print(f"  ✓ {vital['type']}: {vital['value']} {vital['unit']}")
     
     # Add demo appointments
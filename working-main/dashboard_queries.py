@@ -0,0 +1,64 @@
+from datetime import datetime
+from modals import ref_id, to_object_id
+from vitals_schema import format_value
+
+
+def _lookup(collection, match, sort=None, limit=None, as_field=None):
+    # Uncorrelated $lookup: the patient_id is already known, so each sub-pipeline
+    # runs against its own (patient_id, ...) index inside the same aggregate call
+    pipeline = [{'$match': match}]
+    if sort:
+        pipeline.append({'$sort': sort})
+    if limit:
+        pipeline.append({'$limit': limit})
+    return {'$lookup': {'from': collection, 'pipeline': pipeline, 'as': as_field or collection}}
+
+
+def dashboard_pipeline(patient_id, vitals_limit=4, appointment_status=None,
+                       appointment_sort=1, appointment_limit=None, today=None):
+    patient_id = ref_id(patient_id)
+    today = today or datetime.utcnow().strftime('%Y-%m-%d')
+
+    appointment_match = {'patient_id': patient_id}
+    if appointment_status:
+        appointment_match['status'] = appointment_status
+
+    return [
+        {'$match': {'_id': to_object_id(patient_id)}},
+        {'$limit': 1},
+        # Newest reading of each vital type, kept current on every write (see vitals_store.py)
+        _lookup('patient_vitals_latest', {'patient_id': patient_id}, sort={'timestamp': -1}, limit=vitals_limit,
+                as_field='vitals'),
+        _lookup('tasks', {'patient_id': patient_id, 'date': today}),
+        _lookup('medications', {'patient_id': patient_id}),
+        _lookup('appointments', appointment_match, sort={'date': appointment_sort}, limit=appointment_limit),
+        {'$project': {
+            'name': 1,
+            'phone': 1,
+            'medical_records': 1,
+            'vitals': 1,
+            'tasks': 1,
+            'medications': 1,
+            'appointments': 1,
+        }},
+    ]
+
+
+def fetch_dashboard(mongo, patient_id, **options):
+    """Load a patient and their vitals, tasks, medications and appointments in one round trip.
+
+    Returns None if the patient does not exist.
+    """
+    docs = list(mongo.db.patients.aggregate(dashboard_pipeline(patient_id, **options)))
+    if not docs:
+        return None
+
+    dashboard = docs[0]
+    dashboard['_id'] = str(dashboard['_id'])
+    for key in ('vitals', 'tasks', 'medications', 'appointments'):
+        for item in dashboard[key]:
+            item['_id'] = str(item['_id'])
+    for vital in dashboard['vitals']:
+        # Blood pressure is stored as {'systolic', 'diastolic'}; screens show "120/80"
+        vital['display'] = format_value(vital.get('value'))
+    return dashboard
@@ -0,0 +1,160 @@
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+# Server codes meaning change streams are not available at all (standalone mongod)
+_NO_CHANGE_STREAMS = {40573, 40324}
+# The resume token can no longer be used (it fell off the oplog)
+_RESUME_LOST = {260, 280, 286}
+
+
+def alert_event(alert):
+    """Payload pushed to guardians; same fields the old /check-emergency poll returned."""
+    return {
+        'emergency_detected': True,
+        'alert_id': str(alert['_id']),
+        'patient_id': str(alert.get('patient_id')),
+        'patient_name': alert.get('patient_name'),
+        'timestamp': alert['timestamp'].isoformat() if isinstance(alert.get('timestamp'), datetime) else alert.get('timestamp'),
+    }
+
+
+class EmergencyBroker:
+    """In-process pub/sub of SOS alerts, fanned out to subscriber queues per guardian_id."""
+
+    def __init__(self, queue_size=100, remember=1000):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._queue_size = queue_size
+        # Alerts reach a worker twice (local publish + cross-worker feed); remember recent ids to dedupe
+        self._seen = OrderedDict()
+        self._remember = remember
+
+    def subscribe(self, guardian_id):
+        q = queue.Queue(maxsize=self._queue_size)
+        with self._lock:
+            self._subscribers[guardian_id].add(q)
+        return q
+
+    def unsubscribe(self, guardian_id, q):
+        with self._lock:
+            subscribers = self._subscribers.get(guardian_id)
+            if subscribers is not None:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[guardian_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+    def publish(self, alert):
+        alert_id = str(alert['_id'])
+        guardian_id = alert.get('guardian_id')
+        with self._lock:
+            if alert_id in self._seen:
+                return False
+            self._seen[alert_id] = True
+            while len(self._seen) > self._remember:
+                self._seen.popitem(last=False)
+            subscribers = list(self._subscribers.get(guardian_id, ()))
+        event = alert_event(alert)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # A stalled tab must not hold up everyone else's alerts
+                pass
+        return True
+
+
+class EmergencyFeed:
+    """Relays sos_alerts inserted by any worker into the local broker.
+
+    Uses a MongoDB change stream when the deployment supports one (replica set),
+    otherwise tails the collection by timestamp once per `poll_interval`.
+    One feed thread per process replaces one poll per open guardian tab.
+    A dropped change stream is reopened from its resume token, so alerts
+    written while it was down are still delivered.
+    """
+
+    def __init__(self, collection, broker, poll_interval=1.0, overlap=5.0, retry_interval=2.0):
+        self.collection = collection
+        self.broker = broker
+        self.poll_interval = poll_interval
+        self.overlap = timedelta(seconds=overlap)
+        self.retry_interval = retry_interval
+        self.mode = None
+        self._resume_token = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='emergency-feed', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        self._since = datetime.utcnow()
+        catch_up = False
+        while True:
+            try:
+                if catch_up:
+                    self._catch_up()
+                    catch_up = False
+                self._watch()
+                # The stream was closed server side (e.g. the collection was dropped)
+                time.sleep(self.retry_interval)
+            except OperationFailure as e:
+                if e.code in _NO_CHANGE_STREAMS:
+                    # Standalone servers reject $changeStream; fall back to tailing
+                    print(f"[EmergencyFeed] change stream unavailable, tailing instead: {e}")
+                    self.mode = 'tail'
+                    self._tail()
+                    return
+                if e.code in _RESUME_LOST:
+                    self._resume_token = None
+                print(f"[EmergencyFeed] change stream failed, resuming: {e}")
+                # Without a token, the gap is re-read by timestamp before watching afresh
+                catch_up = self._resume_token is None
+                time.sleep(self.retry_interval)
+            except PyMongoError as e:
+                print(f"[EmergencyFeed] change stream failed, resuming: {e}")
+                catch_up = self._resume_token is None
+                time.sleep(self.retry_interval)
+
+    def _watch(self):
+        pipeline = [{'$match': {'operationType': 'insert'}}]
+        with self.collection.watch(pipeline, resume_after=self._resume_token) as stream:
+            self.mode = 'change_stream'
+            while stream.alive:
+                change = stream.try_next()
+                # Kept current on idle batches too, so a reconnect never resumes from a stale point
+                self._resume_token = stream.resume_token
+                if change is not None:
+                    self._publish(change['fullDocument'])
+
+    def _publish(self, alert):
+        self.broker.publish(alert)
+        if isinstance(alert.get('timestamp'), datetime) and alert['timestamp'] > self._since:
+            self._since = alert['timestamp']
+
+    def _catch_up(self):
+        # Re-read a small overlap window: clocks on different workers are not in lockstep,
+        # and the broker drops the alerts it has already published
+        cursor = self.collection.find({'timestamp': {'$gt': self._since - self.overlap}}).sort('timestamp', 1)
+        for alert in cursor:
+            self._publish(alert)
+
+    def _tail(self):
+        while True:
+            try:
+                self._catch_up()
+            except PyMongoError as e:
+                print(f"[EmergencyFeed] tail failed: {e}")
+            time.sleep(self.poll_interval)
@@ -0,0 +1,92 @@
+import hashlib
+import mimetypes
+import os
+
+from flask import Response, request, send_file
+from werkzeug.security import safe_join
+
+from cache import LRUTTLCache
+
+ONE_YEAR = 365 * 24 * 60 * 60
+
+OFFLOAD_MODES = ('x-accel', 'x-sendfile')
+
+
+class FileServer:
+    """Sends files from named roots with strong ETags, cache headers and byte ranges.
+
+    Files whose URL carries their content hash (blobs, fingerprinted assets) are
+    marked immutable; everything else is revalidated against its ETag. With
+    offload='x-accel' (nginx) or 'x-sendfile' (Apache/lighttpd) the response only
+    carries headers and the proxy streams the bytes, including ranges.
+    For x-accel each root needs an internal location, e.g.
+    `location /_files/assets/ { internal; alias /srv/app/assets/; }`.
+    """
+
+    def __init__(self, offload=None, accel_prefix='/_files'):
+        if offload and offload not in OFFLOAD_MODES:
+            raise ValueError(f"unknown offload mode {offload!r}")
+        self.offload = offload
+        self.accel_prefix = accel_prefix.rstrip('/')
+        self.roots = {}
+        # Content hashes keyed by (path, mtime, size), so an edited file gets a new ETag
+        self._etags = LRUTTLCache(maxsize=4096, ttl=24 * 60 * 60)
+
+    def add_root(self, name, directory):
+        self.roots[name] = os.path.abspath(directory)
+
+    def resolve(self, name, filename):
+        """Absolute path of filename inside a root, or None if it escapes the root or is missing."""
+        path = safe_join(self.roots[name], filename)
+        return path if path and os.path.isfile(path) else None
+
+    def etag(self, path):
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        etag = self._etags.get(key)
+        if etag is None:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            etag = digest.hexdigest()
+            self._etags.set(key, etag)
+        return etag
+
+    def fingerprint(self, name, filename):
+        """Short content hash for cache-busting URLs, or None if the file does not exist."""
+        path = self.resolve(name, filename)
+        return self.etag(path)[:12] if path else None
+
+    def send(self, name, path, etag=None, immutable=False, private=False, download_name=None,
+             mimetype=None, as_attachment=False):
+        """Response for a resolved path. Pass etag when the content hash is already known.
+
+        Pass mimetype for files whose type must not be guessed from a name (uploads).
+        """
+        etag = etag or self.etag(path)
+        scope = 'private' if private else 'public'
+        cache_control = f"{scope}, max-age={ONE_YEAR}, immutable" if immutable else f"{scope}, no-cache"
+
+        if self.offload:
+            if request.if_none_match.contains(etag):
+                rv = Response(status=304)
+            else:
+                mimetype = mimetype or mimetypes.guess_type(download_name or path)[0] or 'application/octet-stream'
+                rv = Response(mimetype=mimetype)
+                if as_attachment:
+                    rv.headers.set('Content-Disposition', 'attachment', filename=download_name or os.path.basename(path))
+                if self.offload == 'x-accel':
+                    relative = os.path.relpath(path, self.roots[name]).replace(os.sep, '/')
+                    rv.headers['X-Accel-Redirect'] = f"{self.accel_prefix}/{name}/{relative}"
+                else:
+                    rv.headers['X-Sendfile'] = path
+            rv.set_etag(etag)
+        else:
+            # conditional=True answers If-None-Match with 304 and Range/If-Range with 206
+            rv = send_file(path, mimetype=mimetype, as_attachment=as_attachment, download_name=download_name,
+                           etag=etag, conditional=True)
+        rv.headers['Cache-Control'] = cache_control
+        # Browsers must use the Content-Type sent, not guess one from the bytes
+        rv.headers['X-Content-Type-Options'] = 'nosniff'
+        return rv
@@ -0,0 +1,131 @@
+import os
+from datetime import datetime
+
+from bson.binary import Binary
+
+from cache import LRUTTLCache
+from sudoku_engine import ConstraintMasks
+
+# Idle games are dropped after this long (memory TTL and the Mongo TTL index)
+GAME_TTL_SECONDS = 7 * 24 * 60 * 60
+
+
+class SudokuGame:
+    """One user's board. Cells live in flat bytearrays (size*size bytes), 0 means empty.
+
+    `masks` tracks which digits each row, column and box already holds and is kept in step
+    with every move, so validating a move never rescans the board.
+    """
+
+    __slots__ = ('size', 'grid', 'original', 'masks')
+
+    def __init__(self, size, grid, original=None, masks=None):
+        self.size = size
+        self.grid = bytearray(grid)
+        self.original = bytearray(original if original is not None else grid)
+        self.masks = masks or ConstraintMasks.from_grid(size, self.grid)
+
+    @classmethod
+    def from_rows(cls, rows):
+        return cls(len(rows), bytes(v for row in rows for v in row))
+
+    def rows(self):
+        n = self.size
+        return [list(self.grid[r * n:(r + 1) * n]) for r in range(n)]
+
+    def get(self, row, col):
+        return self.grid[row * self.size + col]
+
+    def set(self, row, col, num):
+        """Write a cell (0 clears it) without checking constraints."""
+        index = row * self.size + col
+        if self.grid[index]:
+            self.masks.remove(row, col, self.grid[index])
+        if num:
+            self.masks.place(row, col, num)
+        self.grid[index] = num
+
+    def place(self, row, col, num):
+        """Write num into a cell if its row, column and box allow it. Returns True when placed."""
+        current = self.get(row, col)
+        if current == num:
+            return True
+        if current:
+            self.masks.remove(row, col, current)
+        if not self.masks.can_place(row, col, num):
+            if current:
+                self.masks.place(row, col, current)
+            return False
+        self.masks.place(row, col, num)
+        self.grid[row * self.size + col] = num
+        return True
+
+    def is_given(self, row, col):
+        return self.original[row * self.size + col] != 0
+
+    def to_doc(self):
+        return {
+            'size': self.size,
+            'grid': Binary(bytes(self.grid)),
+            'original': Binary(bytes(self.original)),
+            'masks': self.masks.to_doc()
+        }
+
+    @classmethod
+    def from_doc(cls, doc):
+        # Games saved before masks existed are rebuilt from the grid
+        masks = ConstraintMasks.from_doc(doc['size'], doc['masks']) if doc.get('masks') else None
+        return cls(doc['size'], doc['grid'], doc['original'], masks)
+
+
+class MemoryGameStore:
+    """Per-process store, bounded by LRU size and idle TTL. Fine for a single worker."""
+
+    def __init__(self, maxsize=10000, ttl=GAME_TTL_SECONDS):
+        self._games = LRUTTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, user_id):
+        return self._games.get(user_id)
+
+    def save(self, user_id, game):
+        self._games.set(user_id, game)
+
+    def delete(self, user_id):
+        self._games.invalidate(user_id)
+
+    def stats(self):
+        return dict(self._games.stats(), backend='memory')
+
+
+class MongoGameStore:
+    """Games in the `sudoku_games` collection, shared by every worker.
+
+    Each save refreshes `updated_at`; a TTL index on it (see indexes.py) expires idle games.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get(self, user_id):
+        doc = self.collection.find_one({'_id': user_id})
+        return SudokuGame.from_doc(doc) if doc else None
+
+    def save(self, user_id, game):
+        self.collection.replace_one(
+            {'_id': user_id},
+            dict(game.to_doc(), updated_at=datetime.utcnow()),
+            upsert=True
+        )
+
+    def delete(self, user_id):
+        self.collection.delete_one({'_id': user_id})
+
+    def stats(self):
+        return {'backend': 'mongo'}
+
+
+def game_store_from_env(mongo):
+    """SUDOKU_STORE=memory keeps games in-process; the default shares them through MongoDB."""
+    if os.getenv('SUDOKU_STORE', 'mongo').lower() == 'memory':
+        return MemoryGameStore()
+    return MongoGameStore(mongo.db.sudoku_games)
@@ -0,0 +1,7 @@
+# Loaded by gunicorn from the working directory (see Procfile)
+
+
+def post_worker_init(worker):
+    # Background threads must start in each worker, after the fork
+    from app import start_background_workers
+    start_background_workers()
@@ -0,0 +1,189 @@
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+
+from dashboard_queries import dashboard_pipeline
+from game_store import GAME_TTL_SECONDS
+
+# (collection, keys, options) for every index the routes rely on
+INDEX_MANIFEST = [
+    ('guardians', [('email', ASCENDING)], {'unique': True}),
+    ('patients', [('email', ASCENDING)], {'unique': True}),
+    ('unity_users', [('email', ASCENDING)], {'unique': True}),
+    ('patients', [('guardian_id', ASCENDING), ('is_emergency', ASCENDING)], {}),
+    ('vitals_buckets', [('patient_id', ASCENDING), ('type', ASCENDING), ('hour', ASCENDING)], {}),
+    ('vitals_buckets', [('patient_id', ASCENDING), ('last_t', DESCENDING)], {}),
+    ('vitals_buckets', [('updated_at', ASCENDING), ('_id', ASCENDING)], {}),
+    # migrate vitals-buckets: source _ids of copied readings; live readings have none
+    ('vitals_buckets', [('readings.src', ASCENDING)], {'partialFilterExpression': {'readings.src': {'$exists': True}}}),
+    ('patient_vitals_latest', [('patient_id', ASCENDING), ('type', ASCENDING)], {'unique': True}),
+    ('vitals_rollups', [('patient_id', ASCENDING), ('type', ASCENDING), ('period', ASCENDING), ('start', ASCENDING)], {'unique': True}),
+    ('tasks', [('patient_id', ASCENDING), ('date', ASCENDING)], {}),
+    ('medications', [('patient_id', ASCENDING)], {}),
+    ('appointments', [('patient_id', ASCENDING), ('status', ASCENDING), ('date', ASCENDING)], {}),
+    ('notifications', [('user_id', ASCENDING), ('timestamp', DESCENDING), ('_id', DESCENDING)], {}),
+    ('reports', [('patient_id', ASCENDING), ('upload_date', DESCENDING), ('_id', DESCENDING)], {}),
+    ('reports', [('derivatives.status', ASCENDING), ('derivatives.claimed_at', ASCENDING)], {}),
+    ('reports', [('blob', ASCENDING), ('derivatives.status', ASCENDING)], {}),
+    # /api/reports/search: text index with a patient_id equality prefix, one per collection
+    ('reports', [('patient_id', ASCENDING), ('filename', TEXT), ('derivatives.text', TEXT)], {
+        'name': 'reports_text',
+        'weights': {'filename': 5, 'derivatives.text': 1},
+        'default_language': 'english'
+    }),
+    ('sos_alerts', [('patient_id', ASCENDING), ('status', ASCENDING)], {}),
+    ('sos_alerts', [('patient_id', ASCENDING), ('timestamp', DESCENDING), ('_id', DESCENDING)], {}),
+    ('sos_alerts', [('timestamp', ASCENDING)], {}),
+    ('sms_outbox', [('status', ASCENDING), ('next_attempt_at', ASCENDING)], {}),
+    ('sudoku_games', [('updated_at', ASCENDING)], {'expireAfterSeconds': GAME_TTL_SECONDS}),
+    ('sudoku_puzzles', [('size', ASCENDING), ('difficulty', ASCENDING), ('rand', ASCENDING)], {}),
+    ('upload_sessions', [('status', ASCENDING), ('updated_at', ASCENDING)], {}),
+]
+
+_SAMPLE_ID = '000000000000000000000000'
+_SAMPLE_EMAIL = 'index-check@example.com'
+# The range condition keyset_page adds for ?cursor= (see pagination.py)
+_SAMPLE_AFTER = {'$or': [
+    {'timestamp': {'$lt': datetime(1970, 1, 1)}},
+    {'timestamp': datetime(1970, 1, 1), '_id': {'$lt': ObjectId(_SAMPLE_ID)}},
+    {'timestamp': None}
+]}
+
+# (collection, filter, sort) for each query shape issued by app.py
+QUERY_SHAPES = [
+    ('guardians', {'email': _SAMPLE_EMAIL}, None),
+    ('patients', {'email': _SAMPLE_EMAIL}, None),
+    ('unity_users', {'email': _SAMPLE_EMAIL}, None),
+    ('patients', {'guardian_id': _SAMPLE_ID}, None),
+    ('patients', {'guardian_id': _SAMPLE_ID, 'is_emergency': True}, None),
+    ('patient_vitals_latest', {'patient_id': _SAMPLE_ID}, [('timestamp', DESCENDING)]),
+    ('vitals_buckets', {}, [('patient_id', ASCENDING), ('last_t', DESCENDING)]),
+    ('vitals_buckets', {'patient_id': _SAMPLE_ID, 'type': 'Heart Rate', 'hour': {'$gte': datetime(1970, 1, 1), '$lt': datetime(1970, 1, 2)}}, [('hour', ASCENDING)]),
+    ('vitals_buckets', {'updated_at': {'$gte': datetime(1970, 1, 1), '$lt': datetime(1970, 1, 2)}}, [('updated_at', ASCENDING), ('_id', ASCENDING)]),
+    ('vitals_buckets', {'$or': [
+        {'updated_at': {'$gt': datetime(1970, 1, 1), '$lt': datetime(1970, 1, 2)}},
+        {'updated_at': datetime(1970, 1, 1), '_id': {'$gt': ObjectId(_SAMPLE_ID)}}
+    ]}, [('updated_at', ASCENDING), ('_id', ASCENDING)]),
+    ('vitals_buckets', {'readings.src': {'$in': [ObjectId(_SAMPLE_ID)], '$exists': True}}, None),
+    ('vitals_rollups', {'patient_id': _SAMPLE_ID, 'type': 'Heart Rate', 'period': 'day', 'start': {'$gte': datetime(1970, 1, 1), '$lt': datetime(1970, 1, 2)}}, [('start', ASCENDING)]),
+    ('tasks', {'patient_id': _SAMPLE_ID, 'date': '1970-01-01'}, None),
+    ('medications', {'patient_id': _SAMPLE_ID}, None),
+    ('appointments', {'patient_id': _SAMPLE_ID, 'status': 'scheduled'}, [('date', ASCENDING)]),
+    ('appointments', {'patient_id': _SAMPLE_ID}, [('date', ASCENDING)]),
+    ('notifications', {'user_id': _SAMPLE_ID}, [('timestamp', DESCENDING), ('_id', DESCENDING)]),
+    ('notifications', {'$and': [{'user_id': _SAMPLE_ID}, _SAMPLE_AFTER]}, [('timestamp', DESCENDING), ('_id', DESCENDING)]),
+    ('reports', {'patient_id': _SAMPLE_ID}, [('upload_date', DESCENDING), ('_id', DESCENDING)]),
+    ('reports', {'derivatives.status': 'pending'}, None),
+    ('reports', {'blob': '0' * 64, 'derivatives.status': 'ready'}, None),
+    ('reports', {'patient_id': _SAMPLE_ID, '$text': {'$search': 'hba1c'}}, None),
+    ('sos_alerts', {'patient_id': _SAMPLE_ID, 'status': 'active'}, None),
+    ('sos_alerts', {'patient_id': _SAMPLE_ID}, [('timestamp', DESCENDING), ('_id', DESCENDING)]),
+    ('sos_alerts', {'timestamp': {'$gt': datetime(1970, 1, 1)}}, [('timestamp', ASCENDING)]),
+    ('sudoku_puzzles', {'size': 9, 'difficulty': 'easy', 'rand': {'$gte': 0.5}}, [('rand', ASCENDING)]),
+    ('upload_sessions', {'status': {'$ne': 'complete'}, 'updated_at': {'$lt': datetime(1970, 1, 1)}}, None),
+]
+
+# (collection, pipeline) for each aggregate; every $lookup sub-pipeline is explained against its own collection
+AGGREGATE_SHAPES = [
+    ('patients', dashboard_pipeline(_SAMPLE_ID, appointment_status='scheduled')),
+    # vitals rebuild-latest (see vitals_store.rebuild_latest)
+    ('vitals_buckets', [
+        {'$sort': {'patient_id': 1, 'last_t': -1}},
+        {'$group': {'_id': {'patient_id': '$patient_id', 'type': '$type'}, 'unit': {'$first': '$unit'}}}
+    ]),
+]
+
+# (collection, filter, sort) for each find_one_and_update lease claim polled by a background worker
+CLAIM_SHAPES = [
+    ('sms_outbox', {'$or': [
+        {'status': 'pending', 'next_attempt_at': {'$lte': datetime(1970, 1, 1)}},
+        {'status': 'sending', 'claimed_at': {'$lte': datetime(1970, 1, 1)}, 'attempts': {'$lt': 5}}
+    ]}, [('next_attempt_at', ASCENDING)]),
+    ('reports', {'$or': [
+        {'derivatives.status': 'pending'},
+        {'derivatives.status': 'processing', 'derivatives.claimed_at': {'$lte': datetime(1970, 1, 1)}}
+    ]}, None),
+]
+
+
+def ensure_indexes(db):
+    """Create every index in INDEX_MANIFEST. Returns a list of (collection, name, error) tuples."""
+    results = []
+    for collection, keys, options in INDEX_MANIFEST:
+        try:
+            name = db[collection].create_index(keys, **options)
+            results.append((collection, name, None))
+        except OperationFailure as e:
+            # e.g. duplicate emails already stored blocking a unique index
+            results.append((collection, _index_name(keys), str(e)))
+    return results
+
+
+def _index_name(keys):
+    return '_'.join(f"{field}_{direction}" for field, direction in keys)
+
+
+def _plan_stages(plan):
+    yield plan.get('stage')
+    for child in ('inputStage', 'queryPlan'):
+        if child in plan:
+            yield from _plan_stages(plan[child])
+    for child in plan.get('inputStages', []):
+        yield from _plan_stages(child)
+
+
+def _winning_plans(explain):
+    """Every winningPlan in an explain result: find, aggregate ($cursor stages) and sharded output all nest them differently."""
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == 'winningPlan':
+                yield value
+            else:
+                yield from _winning_plans(value)
+    elif isinstance(explain, list):
+        for value in explain:
+            yield from _winning_plans(value)
+
+
+def _collscans(explain):
+    stages = [stage for plan in _winning_plans(explain) for stage in _plan_stages(plan)]
+    return stages if 'COLLSCAN' in stages else None
+
+
+def _lookups(collection, pipeline):
+    """(collection, pipeline) for the pipeline itself and, recursively, every $lookup sub-pipeline in it."""
+    yield collection, pipeline
+    for stage in pipeline:
+        lookup = stage.get('$lookup')
+        if lookup and 'pipeline' in lookup:
+            yield from _lookups(lookup['from'], lookup['pipeline'])
+
+
+def check_query_shapes(db):
+    """Explain every query shape and return the ones whose winning plan contains a COLLSCAN.
+
+    Covers finds, aggregates (with their $lookup sub-pipelines) and find_one_and_update claims.
+    """
+    failures = []
+    for collection, query, sort in QUERY_SHAPES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        stages = _collscans(cursor.explain())
+        if stages:
+            failures.append((collection, query, sort, stages))
+    for collection, pipeline in AGGREGATE_SHAPES:
+        # An uncorrelated $lookup sub-pipeline runs as its own query, so it is explained on its own
+        for name, sub_pipeline in _lookups(collection, pipeline):
+            stages = _collscans(db.command('aggregate', name, pipeline=sub_pipeline, explain=True))
+            if stages:
+                failures.append((name, sub_pipeline, None, stages))
+    for collection, query, sort in CLAIM_SHAPES:
+        command = {'findAndModify': collection, 'query': query, 'update': {'$set': {'_index_check': True}}}
+        if sort:
+            command['sort'] = dict(sort)
+        stages = _collscans(db.command('explain', command, verbosity='queryPlanner'))
+        if stages:
+            failures.append((collection, query, sort, stages))
+    return failures
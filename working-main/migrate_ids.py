@@ -0,0 +1,81 @@
+from datetime import datetime
+from pymongo import UpdateOne
+
+from modals import ref_id
+
+# Every field that points at another document's _id
+REFERENCE_FIELDS = [
+    ('patients', 'guardian_id'),
+    ('notifications', 'user_id'),
+    ('notifications', 'patient_id'),
+    ('vitals', 'patient_id'),
+    ('tasks', 'patient_id'),
+    ('medications', 'patient_id'),
+    ('appointments', 'patient_id'),
+    ('reports', 'patient_id'),
+    ('sos_alerts', 'patient_id'),
+    ('sos_alerts', 'guardian_id'),
+]
+
+CHECKPOINTS = 'migrations'
+
+
+def _checkpoint_id(collection, field):
+    return f"ids:{collection}.{field}"
+
+
+def migrate_field(db, collection, field, batch_size=1000, resume=True):
+    """Rewrite ObjectId values of `collection.field` to their canonical string form.
+
+    Documents are streamed in _id order and updated with unordered bulk writes,
+    one batch at a time. The last processed _id is checkpointed after each batch,
+    so an interrupted run picks up where it stopped. A finished run clears the
+    checkpoint, so the next run rescans from the start; the $type filter keeps that
+    cheap, and it picks up ObjectIds written since.
+    """
+    checkpoint_id = _checkpoint_id(collection, field)
+    query = {field: {'$type': 'objectId'}}
+    if resume:
+        checkpoint = db[CHECKPOINTS].find_one({'_id': checkpoint_id})
+        if checkpoint and checkpoint.get('last_id') is not None:
+            query['_id'] = {'$gt': checkpoint['last_id']}
+
+    cursor = db[collection].find(query, {field: 1}).sort('_id', 1).batch_size(batch_size)
+    converted = 0
+    batch = []
+    last_id = None
+    for doc in cursor:
+        # Match on the old value too, so a concurrent write is never clobbered
+        batch.append(UpdateOne({'_id': doc['_id'], field: doc[field]}, {'$set': {field: ref_id(doc[field])}}))
+        last_id = doc['_id']
+        if len(batch) >= batch_size:
+            converted += _flush(db, collection, checkpoint_id, batch, last_id)
+            batch = []
+    if batch:
+        converted += _flush(db, collection, checkpoint_id, batch, last_id)
+
+    db[CHECKPOINTS].update_one(
+        {'_id': checkpoint_id},
+        {'$set': {'completed_at': datetime.utcnow()}, '$unset': {'last_id': ''}},
+        upsert=True
+    )
+    return converted
+
+
+def _flush(db, collection, checkpoint_id, batch, last_id):
+    result = db[collection].bulk_write(batch, ordered=False)
+    db[CHECKPOINTS].update_one(
+        {'_id': checkpoint_id},
+        {'$set': {'last_id': last_id, 'updated_at': datetime.utcnow()}},
+        upsert=True
+    )
+    return result.modified_count
+
+
+def migrate_all(db, batch_size=1000, resume=True, on_progress=None):
+    totals = {}
+    for collection, field in REFERENCE_FIELDS:
+        totals[(collection, field)] = migrate_field(db, collection, field, batch_size, resume)
+        if on_progress:
+            on_progress(collection, field, totals[(collection, field)])
+    return totals
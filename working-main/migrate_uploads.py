@@ -0,0 +1,70 @@
+import os
+
+from blob_store import blob_url, link_blob
+
+
+def _legacy_path(upload_folder, reference):
+    """Local file behind an old '/static/uploads/<name>' path or bare filename, if it still exists."""
+    name = os.path.basename(reference or '')
+    path = os.path.join(upload_folder, name)
+    return path if name and os.path.isfile(path) else None
+
+
+def migrate_uploads(db, store, upload_folder, remove_originals=False, on_progress=None):
+    """Move files from the flat upload folder into the blob store and repoint their documents.
+
+    Covers reports without a `blob` and patients whose medical_records is a bare filename.
+    Safe to re-run: migrated documents no longer match. Returns a summary dict.
+    """
+    summary = {'reports': 0, 'patients': 0, 'missing': 0, 'unique_blobs': 0, 'bytes_deduplicated': 0}
+    hashes = set()
+    ingested = {}
+
+    def ingest(path):
+        if path not in ingested:
+            sha256, size, created = store.put_path(path)
+            if sha256 in hashes or not created:
+                summary['bytes_deduplicated'] += size
+            hashes.add(sha256)
+            ingested[path] = (sha256, size)
+        return ingested[path]
+
+    for report in db.reports.find({'blob': {'$exists': False}}, {'filepath': 1, 'filename': 1}):
+        path = _legacy_path(upload_folder, report.get('filepath'))
+        if not path:
+            summary['missing'] += 1
+            continue
+        sha256, size = ingest(path)
+        filename = report.get('filename') or os.path.basename(path)
+        result = db.reports.update_one(
+            {'_id': report['_id'], 'blob': {'$exists': False}},
+            {'$set': {'blob': sha256, 'filepath': blob_url(sha256, filename), 'file_size': size}}
+        )
+        if result.modified_count:
+            link_blob(db, sha256, size)
+            summary['reports'] += 1
+            if on_progress:
+                on_progress('reports', summary['reports'])
+
+    query = {'medical_records': {'$type': 'string', '$not': {'$regex': '^/blobs/'}}}
+    for patient in db.patients.find(query, {'medical_records': 1}):
+        path = _legacy_path(upload_folder, patient['medical_records'])
+        if not path:
+            summary['missing'] += 1
+            continue
+        sha256, size = ingest(path)
+        result = db.patients.update_one(
+            {'_id': patient['_id'], 'medical_records': patient['medical_records']},
+            {'$set': {'medical_records': blob_url(sha256, os.path.basename(path))}}
+        )
+        if result.modified_count:
+            link_blob(db, sha256, size)
+            summary['patients'] += 1
+            if on_progress:
+                on_progress('patients', summary['patients'])
+
+    if remove_originals:
+        for path in ingested:
+            os.remove(path)
+    summary['unique_blobs'] = len(hashes)
+    return summary
@@ -3,6 +3,9 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from bson.objectid import ObjectId
 from datetime import datetime
 
+from blob_store import blob_url, link_blob
+from vitals_store import record_vital
+
 class User(UserMixin):
     def __init__(self, user_data, role):
         self.id = str(user_data.get('_id'))
@@ -10,7 +13,7 @@ class User(UserMixin):
         self.email = user_data.get('email')
         self.role = role
         self.password_hash = user_data.get('password')
-        self.guardian_id = user_data.get('guardian_id')
+        self.guardian_id = ref_id(user_data.get('guardian_id'))
         
     def get_id(self):
         # We prefix the ID with role to distinguish between collections
@@ -43,6 +46,22 @@ class User(UserMixin):
             return None
         return None
 
+# --- ID CODEC ---
+# Every reference field (patient_id, guardian_id, user_id) is stored as the hex
+# string of the referenced ObjectId, so a query only ever needs one index key.
+
+def ref_id(value):
+    """Canonical stored form of a reference to another document."""
+    if value is None:
+        return None
+    return str(value)
+
+def to_object_id(value):
+    """ObjectId for an `_id` lookup, accepting either a reference string or an ObjectId."""
+    if isinstance(value, ObjectId):
+        return value
+    return ObjectId(value)
+
 # Helper functions for database operations
 def create_guardian(mongo, email, password):
     return mongo.db.guardians.insert_one({
@@ -57,7 +76,7 @@ def create_patient(mongo, name, email, password, phone, guardian_id):
         'email': email,
         'password': generate_password_hash(password),
         'phone': phone,
-        'guardian_id': guardian_id, # Store as string or ObjectId depending on preference
+        'guardian_id': ref_id(guardian_id),
         'medical_records': None,
         'is_emergency': False,
         'created_at': datetime.utcnow()
@@ -65,7 +84,7 @@ def create_patient(mongo, name, email, password, phone, guardian_id):
 
 def create_notification(mongo, user_id, message):
     return mongo.db.notifications.insert_one({
-        'user_id': user_id, # Link to guardian_id
+        'user_id': ref_id(user_id), # Link to guardian_id
         'message': message,
         'timestamp': datetime.utcnow(),
         'is_read': False
@@ -83,18 +102,13 @@ def create_unity_user(mongo, email, password, role, name, extra_data=None):
 
 # --- NEW MODELS ---
 
-def create_vital(mongo, patient_id, vital_type, value, unit):
-    return mongo.db.vitals.insert_one({
-        'patient_id': patient_id, # ObjectId or string
-        'type': vital_type, # e.g., 'Heart Rate', 'Blood Pressure'
-        'value': value,
-        'unit': unit,
-        'timestamp': datetime.utcnow()
-    })
+def create_vital(mongo, patient_id, vital_type, value, unit, timestamp=None):
+    # vital_type e.g. 'Heart Rate', 'Blood Pressure'; readings go into hourly per-type buckets (see vitals_store.py)
+    return record_vital(mongo.db, ref_id(patient_id), vital_type, value, unit, timestamp)
 
 def create_medication(mongo, patient_id, name, dosage, time_of_day, stock):
     return mongo.db.medications.insert_one({
-        'patient_id': patient_id,
+        'patient_id': ref_id(patient_id),
         'name': name,
         'dosage': dosage,
         'time_of_day': time_of_day, # e.g., 'Morning', 'Afternoon'
@@ -104,7 +118,7 @@ def create_medication(mongo, patient_id, name, dosage, time_of_day, stock):
 
 def create_appointment(mongo, patient_id, doctor_name, specialty, date_str, time_str):
     return mongo.db.appointments.insert_one({
-        'patient_id': patient_id,
+        'patient_id': ref_id(patient_id),
         'doctor_name': doctor_name,
         'specialty': specialty,
         'date': date_str, # Keep as string for simplicity in demo or parse to datetime
@@ -115,10 +129,27 @@ def create_appointment(mongo, patient_id, doctor_name, specialty, date_str, time
 
 def create_task(mongo, patient_id, title, description):
     return mongo.db.tasks.insert_one({
-        'patient_id': patient_id,
+        'patient_id': ref_id(patient_id),
         'title': title,
         'description': description,
         'is_completed': False,
         'date': datetime.utcnow().strftime('%Y-%m-%d'), # Daily task for today
         'created_at': datetime.utcnow()
-    })
\ No newline at end of file
+    })
+
+def create_report(mongo, patient_id, filename, sha256, size):
+    """Insert a reports document pointing at a stored blob; returns the document (with _id)."""
+    # One blob can back many reports; `refs` counts them so unreferenced files can be found later
+    link_blob(mongo.db, sha256, size)
+    report = {
+        'patient_id': ref_id(patient_id),
+        'filename': filename,
+        'blob': sha256,
+        'filepath': blob_url(sha256, filename),
+        'upload_date': datetime.utcnow(),
+        'file_size': size,
+        # Thumbnails, preview and text are filled in by report_derivatives.py
+        'derivatives': {'status': 'pending'}
+    }
+    mongo.db.reports.insert_one(report)
+    return report
@@ -0,0 +1,68 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def encode_cursor(value, doc_id):
+    """Opaque cursor for the position just after (value, _id); value is a datetime or None."""
+    millis = (value - _EPOCH) // timedelta(milliseconds=1) if value is not None else None
+    raw = json.dumps([millis, str(doc_id)], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(datetime or None, ObjectId) from encode_cursor. Raises ValueError for anything else."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        millis, doc_id = json.loads(raw)
+        value = _EPOCH + timedelta(milliseconds=int(millis)) if millis is not None else None
+        return value, ObjectId(doc_id)
+    except (ValueError, TypeError, InvalidId) as e:
+        raise ValueError(f"invalid cursor: {e}") from None
+
+
+def page_limit(value, default=DEFAULT_LIMIT):
+    """Clamp a ?limit= argument into 1..MAX_LIMIT."""
+    if value is None:
+        return default
+    return max(1, min(int(value), MAX_LIMIT))
+
+
+def keyset_page(collection, query, field, cursor=None, limit=DEFAULT_LIMIT, projection=None):
+    """One newest-first page ordered by (field, _id), resuming after `cursor`.
+
+    Instead of skipping, the cursor becomes a range condition, so with an index on
+    (query fields..., field -1, _id -1) every page costs the same however deep it is
+    and only limit + 1 documents are read. Legacy documents without the field sort
+    last (MongoDB orders null/missing below dates) and are paged by _id alone.
+    Returns (documents, next_cursor); next_cursor is None on the last page.
+    """
+    if cursor:
+        value, doc_id = decode_cursor(cursor)
+        if value is None:
+            after = {field: None, '_id': {'$lt': doc_id}}
+        else:
+            after = {'$or': [
+                {field: {'$lt': value}},
+                {field: value, '_id': {'$lt': doc_id}},
+                {field: None}
+            ]}
+        query = {'$and': [query, after]}
+    docs = list(
+        collection.find(query, projection).sort([(field, -1), ('_id', -1)]).limit(limit + 1)
+    )
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        value = last.get(field)
+        next_cursor = encode_cursor(value if isinstance(value, datetime) else None, last['_id'])
+    return docs, next_cursor
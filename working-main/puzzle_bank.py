@@ -0,0 +1,110 @@
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from bson.binary import Binary
+
+from sudoku_engine import generate
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+# Solver steps per empty cell: ~1.0 means every cell is forced in turn, higher means guessing
+_GRADE_LIMITS = [(1.1, 'easy'), (3.0, 'medium')]
+
+# Share of cells given as clues when a puzzle of one difficulty is generated on request
+_GIVEN_SHARE = {'easy': 0.5, 'medium': 0.38, 'hard': 0.28}
+
+
+def grade(puzzle, effort):
+    empties = puzzle.count(0) or 1
+    ratio = effort / empties
+    for limit, difficulty in _GRADE_LIMITS:
+        if ratio <= limit:
+            return difficulty
+    return 'hard'
+
+
+def make_puzzle(size, seed, givens=None):
+    """Generate and grade one puzzle. Module-level so worker processes can run it."""
+    rng = random.Random(seed)
+    cells = size * size
+    if givens is None:
+        # Spread the clue count so the bank covers every difficulty
+        givens = rng.randint(int(cells * _GIVEN_SHARE['hard']), int(cells * _GIVEN_SHARE['easy']))
+    puzzle, solution, effort = generate(size, givens, rng)
+    return {
+        'size': size,
+        'difficulty': grade(puzzle, effort),
+        'effort': effort,
+        'givens': sum(1 for num in puzzle if num),
+        'grid': Binary(bytes(puzzle)),
+        'solution': Binary(bytes(solution)),
+        'rand': rng.random(),
+        'created_at': datetime.utcnow()
+    }
+
+
+def fill_bank(collection, size, count, workers=None, batch_size=100, on_progress=None):
+    """Generate `count` puzzles across a process pool and insert them in batches.
+
+    Returns a {difficulty: inserted} tally.
+    """
+    tally = dict.fromkeys(DIFFICULTIES, 0)
+    seeds = [random.getrandbits(64) for _ in range(count)]
+    batch = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for doc in pool.map(make_puzzle, [size] * count, seeds, chunksize=8):
+            batch.append(doc)
+            tally[doc['difficulty']] += 1
+            if len(batch) >= batch_size:
+                collection.insert_many(batch, ordered=False)
+                batch = []
+                if on_progress:
+                    on_progress(sum(tally.values()))
+    if batch:
+        collection.insert_many(batch, ordered=False)
+    return tally
+
+
+class PuzzleBank:
+    """Pre-generated puzzles in the `sudoku_puzzles` collection.
+
+    Each puzzle carries a random `rand` key; a draw is one index seek on
+    (size, difficulty, rand) from a fresh random point, so serving costs the same
+    however large the bank grows.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.drawn = 0
+        self.generated = 0
+
+    def draw(self, size, difficulty='easy'):
+        """Flat puzzle grid (bytes) for a random banked puzzle.
+
+        Falls back to easier tiers (small boards never grade above easy), then to
+        generating one on the spot if nothing of that size is banked.
+        """
+        if difficulty not in DIFFICULTIES:
+            difficulty = 'easy'
+        for tier in reversed(DIFFICULTIES[:DIFFICULTIES.index(difficulty) + 1]):
+            grid = self._seek({'size': size, 'difficulty': tier})
+            if grid is not None:
+                self.drawn += 1
+                return grid
+        print(f"⚠️ Puzzle bank has no {size}x{size} puzzles; run `flask --app app sudoku fill-bank --size {size}`")
+        self.generated += 1
+        givens = int(size * size * _GIVEN_SHARE[difficulty])
+        return bytes(make_puzzle(size, random.getrandbits(64), givens)['grid'])
+
+    def _seek(self, query):
+        point = random.random()
+        projection = {'grid': 1}
+        doc = (
+            self.collection.find_one(dict(query, rand={'$gte': point}), projection, sort=[('rand', 1)])
+            or self.collection.find_one(dict(query, rand={'$lt': point}), projection, sort=[('rand', 1)])
+        )
+        return bytes(doc['grid']) if doc else None
+
+    def stats(self):
+        return {'drawn': self.drawn, 'generated_on_request': self.generated}
@@ -0,0 +1,270 @@
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from blob_store import link_blob
+
+# Optional renderers: PDFs need PyMuPDF, images need Pillow. Without them reports are
+# still stored and listed, just without previews. pytesseract (plus the tesseract binary)
+# adds OCR, so photos and scanned PDFs get searchable text too.
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+THUMBNAIL_PX = 320
+PREVIEW_PX = 1200
+# Extracted text kept per report (enough for search, bounded for huge scans)
+MAX_TEXT_CHARS = 200_000
+# Scanned pages (no text layer) OCRed per PDF, at OCR_DPI
+MAX_OCR_PAGES = 20
+OCR_DPI = 200
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+
+
+def _extension(filename):
+    return filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+
+
+def _ocr(image):
+    """Text read off a PIL image, or '' when OCR is not available."""
+    if pytesseract is None:
+        return ''
+    try:
+        return pytesseract.image_to_string(image)
+    except pytesseract.TesseractNotFoundError:
+        # The Python package is installed but the tesseract binary is not
+        return ''
+
+
+def _ocr_page(page):
+    if Image is None:
+        return ''
+    pixmap = page.get_pixmap(dpi=OCR_DPI, alpha=False)
+    return _ocr(Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples))
+
+
+def _render_pdf(path):
+    # Blobs have no extension, so name the type
+    with pymupdf.open(path, filetype='pdf') as doc:
+        text = []
+        length = 0
+        scanned = 0
+        for page in doc:
+            if length >= MAX_TEXT_CHARS:
+                break
+            page_text = page.get_text()
+            if not page_text.strip() and scanned < MAX_OCR_PAGES:
+                scanned += 1
+                page_text = _ocr_page(page)
+            text.append(page_text)
+            length += len(page_text)
+        first = doc[0]
+        longest = max(first.rect.width, first.rect.height) or 1
+        images = {}
+        for name, px, quality in (('thumbnail', THUMBNAIL_PX, 70), ('preview', PREVIEW_PX, 80)):
+            zoom = px / longest
+            pixmap = first.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+            images[name] = pixmap.tobytes('jpeg', jpg_quality=quality)
+        return {
+            'page_count': doc.page_count,
+            'text': '\n'.join(text)[:MAX_TEXT_CHARS],
+            **images
+        }
+
+
+def _render_image(path):
+    with Image.open(path) as source:
+        source = source.convert('RGB')
+        images = {}
+        for name, px, quality in (('thumbnail', THUMBNAIL_PX, 70), ('preview', PREVIEW_PX, 80)):
+            copy = source.copy()
+            copy.thumbnail((px, px))
+            out = io.BytesIO()
+            copy.save(out, 'JPEG', quality=quality, optimize=True)
+            images[name] = out.getvalue()
+        return {'page_count': 1, 'text': _ocr(source)[:MAX_TEXT_CHARS], **images}
+
+
+def build_derivatives(path, filename):
+    """Thumbnail/preview JPEG bytes, page count and text for one file.
+
+    Runs in a worker process. Returns None when no renderer handles the file type.
+    """
+    extension = _extension(filename)
+    if extension == 'pdf' and pymupdf is not None:
+        return _render_pdf(path)
+    if extension in IMAGE_EXTENSIONS and Image is not None:
+        return _render_image(path)
+    return None
+
+
+class ReportDerivativePipeline:
+    """Fills in `derivatives` on reports documents in the background.
+
+    New reports are created with derivatives.status 'pending'. A dispatcher thread
+    claims them atomically (so several app workers can share the queue), renders
+    them in a process pool and stores the thumbnail and preview JPEGs in the blob
+    store. Page count and extracted text are written onto the report. Reports
+    sharing a blob reuse the first one's results.
+    """
+
+    def __init__(self, db, store, workers=2, max_attempts=3, poll_interval=30.0, lease=300.0):
+        self.db = db
+        self.store = store
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease)
+        self.counters = {'ready': 0, 'reused': 0, 'unsupported': 0, 'failed': 0}
+        self._pool = None
+        self._slots = threading.Semaphore(workers)
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Run the claim loop; called once per worker at boot, so reports queued before a restart are built."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._pool = self._pool or self._new_pool()
+                self._thread = threading.Thread(target=self._run, name='report-derivatives', daemon=True)
+                self._thread.start()
+
+    def _new_pool(self):
+        # spawn, not fork: the app process already runs threads
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def _submit(self, *args):
+        try:
+            return self._pool.submit(build_derivatives, *args)
+        except BrokenProcessPool:
+            # A renderer died hard (e.g. on a malformed file); carry on with a fresh pool
+            with self._lock:
+                self._pool = self._new_pool()
+            return self._pool.submit(build_derivatives, *args)
+
+    def notify(self):
+        """Call after inserting a pending report."""
+        self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, workers=self.workers, running=bool(self._thread and self._thread.is_alive()))
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                while self._slots.acquire(blocking=False):
+                    report = self._claim()
+                    if report is None:
+                        self._slots.release()
+                        break
+                    try:
+                        self._process(report)
+                    except Exception as e:
+                        # Left in 'processing'; the lease hands it to a later pass
+                        print(f"[ReportDerivatives] could not start report {report['_id']}: {e}")
+                        self._slots.release()
+            except PyMongoError as e:
+                print(f"[ReportDerivatives] claim failed: {e}")
+            self._wake.wait(self.poll_interval)
+
+    def _claim(self):
+        now = datetime.utcnow()
+        return self.db.reports.find_one_and_update(
+            {'$or': [
+                {'derivatives.status': 'pending'},
+                # A worker died mid-render: take the report over once its lease runs out
+                {'derivatives.status': 'processing', 'derivatives.claimed_at': {'$lte': now - self.lease}}
+            ]},
+            {'$set': {'derivatives.status': 'processing', 'derivatives.claimed_at': now},
+             '$inc': {'derivatives.attempts': 1}},
+            projection={'blob': 1, 'filename': 1, 'derivatives': 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _process(self, report):
+        sha256 = report.get('blob')
+        done = self.db.reports.find_one(
+            {'blob': sha256, 'derivatives.status': 'ready'}, {'derivatives': 1}
+        ) if sha256 else None
+        if done:
+            # The shared thumbnail/preview gain a referencing document
+            for name in ('thumbnail', 'preview'):
+                image = done['derivatives'].get(name)
+                if image and self.store.exists(image):
+                    link_blob(self.db, image, os.path.getsize(self.store.path(image)))
+            self._finish(report, dict(done['derivatives'], reused_from=done['_id']), 'reused')
+            return
+        if not sha256 or not self.store.exists(sha256):
+            self._finish(report, {'status': 'unsupported'}, 'unsupported')
+            return
+        future = self._submit(self.store.path(sha256), report.get('filename', ''))
+        future.add_done_callback(lambda f: self._store(report, f))
+
+    def _store(self, report, future):
+        try:
+            result = future.result()
+            if result is None:
+                self._finish(report, {'status': 'unsupported'}, 'unsupported')
+                return
+            derivatives = {
+                'status': 'ready',
+                'page_count': result['page_count'],
+                'text': result['text'],
+                'generated_at': datetime.utcnow()
+            }
+            for name in ('thumbnail', 'preview'):
+                sha256, size, _ = self.store.put_stream(io.BytesIO(result[name]))
+                link_blob(self.db, sha256, size)
+                derivatives[name] = sha256
+            self._finish(report, derivatives, 'ready')
+        except Exception as e:
+            attempts = report['derivatives'].get('attempts', 1)
+            status = 'failed' if attempts >= self.max_attempts else 'pending'
+            print(f"⚠️ Derivatives for report {report['_id']} failed (attempt {attempts}): {e}")
+            self._finish(report, {'status': status, 'attempts': attempts, 'error': str(e)}, 'failed')
+
+    def _finish(self, report, derivatives, outcome):
+        with self._lock:
+            self.counters[outcome] += 1
+        try:
+            self.db.reports.update_one({'_id': report['_id']}, {'$set': {'derivatives': derivatives}})
+        except PyMongoError as e:
+            print(f"[ReportDerivatives] failed to record derivatives for {report['_id']}: {e}")
+        finally:
+            self._slots.release()
+            self._wake.set()
+
+
+def queue_missing(db, retry=False):
+    """Mark reports that never had derivatives built as pending. Returns how many.
+
+    With retry, reports that were 'unsupported' (e.g. stored before PyMuPDF/Pillow were
+    installed) or 'failed' are queued again too, with a fresh attempt count.
+    """
+    query = {'derivatives': {'$exists': False}}
+    if retry:
+        query = {'$or': [query, {'derivatives.status': {'$in': ['unsupported', 'failed']}}]}
+    result = db.reports.update_many(query, {'$set': {'derivatives': {'status': 'pending'}}})
+    return result.modified_count
@@ -0,0 +1,58 @@
+import re
+
+SNIPPET_CHARS = 160
+MAX_RESULTS = 50
+
+_WORD = re.compile(r'\w+')
+_NEGATED = re.compile(r'(^|\s)-\S+')
+
+
+def query_terms(query):
+    """Words of a search query, lowercased, minus $text quotes and negated (-word) terms."""
+    return [term.lower() for term in _WORD.findall(_NEGATED.sub(' ', query)) if len(term) > 1]
+
+
+def snippet(text, terms, width=SNIPPET_CHARS):
+    """~width characters of text around the first matching term (the start of the text if none match)."""
+    if not text:
+        return ''
+    lowered = text.lower()
+    positions = [pos for pos in (lowered.find(term) for term in terms) if pos >= 0]
+    start = max(min(positions) - width // 3, 0) if positions else 0
+    excerpt = ' '.join(text[start:start + width].split())
+    prefix = '…' if start > 0 else ''
+    suffix = '…' if start + width < len(text) else ''
+    return f"{prefix}{excerpt}{suffix}"
+
+
+def search_reports(db, patient_ids, query, limit=20):
+    """Reports of the given patients matching query, best first, each with a score and snippet.
+
+    The text index is prefixed by patient_id (see indexes.py), so each patient is one
+    index lookup; results are merged by score.
+    """
+    limit = min(limit, MAX_RESULTS)
+    terms = query_terms(query)
+    if not terms:
+        return []
+    projection = {
+        'filename': 1, 'filepath': 1, 'patient_id': 1, 'upload_date': 1,
+        'derivatives.text': 1, 'derivatives.status': 1, 'derivatives.page_count': 1,
+        'derivatives.thumbnail': 1, 'derivatives.preview': 1,
+        'score': {'$meta': 'textScore'}
+    }
+    hits = []
+    for patient_id in patient_ids:
+        cursor = db.reports.find(
+            {'patient_id': patient_id, '$text': {'$search': query}}, projection
+        ).sort([('score', {'$meta': 'textScore'})]).limit(limit)
+        hits.extend(cursor)
+    hits.sort(key=lambda hit: hit['score'], reverse=True)
+
+    results = []
+    for hit in hits[:limit]:
+        derivatives = hit.get('derivatives') or {}
+        hit['snippet'] = snippet(derivatives.pop('text', None) or '', terms)
+        hit['score'] = round(hit['score'], 3)
+        results.append(hit)
+    return results
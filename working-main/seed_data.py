@@ -3,6 +3,8 @@ from werkzeug.security import generate_password_hash
 from datetime import datetime
 from bson.objectid import ObjectId
 
+from vitals_store import record_vital
+
 # Setup connection
 MONGO_URI = "mongodb://localhost:27017/seniorcare"
 client = pymongo.MongoClient(MONGO_URI)
@@ -42,7 +44,7 @@ def seed_database():
             'email': patient_email,
             'password': generate_password_hash("password123"),
             'phone': "555-0199",
-            'guardian_id': guardian_id,
+            'guardian_id': str(guardian_id),
             'medical_records': None,
             'is_emergency': False,
             'created_at': datetime.utcnow()
@@ -52,11 +54,12 @@ def seed_database():
     # 3. Add Demo Vitals
     print("Adding demo vitals...")
     vitals_data = [
-        {'patient_id': str(patient_id), 'type': 'Heart Rate', 'value': 72, 'unit': 'bpm', 'timestamp': datetime.utcnow()},
-        {'patient_id': str(patient_id), 'type': 'Blood Pressure', 'value': '120/80', 'unit': 'mmHg', 'timestamp': datetime.utcnow()},
-        {'patient_id': str(patient_id), 'type': 'Blood Sugar', 'value': 110, 'unit': 'mg/dL', 'timestamp': datetime.utcnow()},
+        ('Heart Rate', 72, 'bpm'),
+        ('Blood Pressure', '120/80', 'mmHg'),
+        ('Blood Sugar', 110, 'mg/dL'),
     ]
-    db.vitals.insert_many(vitals_data)
+    for vital_type, value, unit in vitals_data:
+        record_vital(db, str(patient_id), vital_type, value, unit)
 
     # 4. Add Demo Tasks
     print("Adding demo tasks...")
@@ -108,13 +111,13 @@ def seed_database():
     # 4. Add Dummy Notifications
     print("Adding sample notifications...")
     db.notifications.insert_one({
-        'user_id': guardian_id,
+        'user_id': str(guardian_id),
         'message': "💊 Grandpa missed his afternoon medication.",
         'timestamp': datetime.utcnow(),
         'is_read': False
     })
     db.notifications.insert_one({
-        'user_id': guardian_id,
+        'user_id': str(guardian_id),
         'message': "✅ Grandpa completed his morning walk.",
         'timestamp': datetime.utcnow(),
         'is_read': False
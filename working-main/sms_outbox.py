@@ -0,0 +1,209 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+
+class TwilioTransport:
+    """Sends through one Twilio client whose HTTP session (and connection pool) is reused."""
+
+    name = 'twilio'
+
+    def __init__(self, account_sid, auth_token, from_number=None, messaging_service_sid=None, timeout=10):
+        from twilio.rest import Client
+        from twilio.http.http_client import TwilioHttpClient
+
+        self.client = Client(account_sid, auth_token, http_client=TwilioHttpClient(pool_connections=True, timeout=timeout))
+        self.from_number = from_number
+        self.messaging_service_sid = messaging_service_sid
+
+    def send(self, to, body):
+        kwargs = {'to': to, 'body': body}
+        if self.messaging_service_sid:
+            kwargs['messaging_service_sid'] = self.messaging_service_sid
+        else:
+            kwargs['from_'] = self.from_number
+        return self.client.messages.create(**kwargs).sid
+
+
+class FakeSmsTransport:
+    """Records messages instead of sending them. `fail_next` makes the next N sends raise."""
+
+    name = 'fake'
+
+    def __init__(self, fail_next=0):
+        self.sent = []
+        self.fail_next = fail_next
+        self._lock = threading.Lock()
+
+    def send(self, to, body):
+        with self._lock:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                raise RuntimeError('fake transport failure')
+            self.sent.append({'to': to, 'body': body})
+            return f"FAKE{len(self.sent):06d}"
+
+
+def transport_from_env():
+    """SMS_TRANSPORT=fake selects the fake transport; otherwise Twilio when credentials are set."""
+    if os.getenv('SMS_TRANSPORT', '').lower() == 'fake':
+        return FakeSmsTransport()
+
+    account_sid = os.getenv('TWILIO_ACCOUNT_SID')
+    auth_token = os.getenv('TWILIO_AUTH_TOKEN')
+    phone_number = os.getenv('TWILIO_PHONE_NUMBER')
+    messaging_service_sid = os.getenv('TWILIO_MESSAGING_SERVICE_SID')
+    if account_sid and auth_token and (phone_number or messaging_service_sid):
+        try:
+            return TwilioTransport(account_sid, auth_token, phone_number, messaging_service_sid)
+        except Exception as e:
+            print(f"❌ Failed to initialize Twilio client: {e}")
+    return None
+
+
+class SmsDispatcher:
+    """Persistent SMS outbox with a background sender.
+
+    `enqueue` writes one `sms_outbox` document per recipient and returns immediately.
+    A dispatcher thread claims due messages atomically (so several workers can share
+    the outbox), sends them concurrently and retries failures with exponential backoff.
+    Delivery status is mirrored onto the originating `sos_alerts` document under `sms`.
+    """
+
+    def __init__(self, db, transport, concurrency=4, max_attempts=5, base_delay=2.0,
+                 poll_interval=5.0, lease=60.0):
+        self.db = db
+        self.transport = transport
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease)
+        self.counters = {'queued': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='sms')
+        self._wake = threading.Event()
+        self._slots = threading.Semaphore(concurrency)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, alert_id, contacts, body):
+        now = datetime.utcnow()
+        messages = [{
+            'alert_id': alert_id,
+            'to': contact,
+            'body': body,
+            'status': 'pending',
+            'attempts': 0,
+            'next_attempt_at': now,
+            'created_at': now
+        } for contact in dict.fromkeys(contacts)]
+        if not messages:
+            return []
+
+        result = self.db.sms_outbox.insert_many(messages)
+        self.db.sos_alerts.update_one(
+            {'_id': ObjectId(alert_id)},
+            {'$set': {f"sms.{msg_id}": {'to': msg['to'], 'status': 'pending', 'attempts': 0}
+                      for msg_id, msg in zip(result.inserted_ids, messages)}}
+        )
+        with self._lock:
+            self.counters['queued'] += len(messages)
+        self._wake.set()
+        return result.inserted_ids
+
+    def start(self):
+        """Run the dispatcher thread; called once per worker at boot, so retries and expired leases left by a restart are picked up."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='sms-dispatcher', daemon=True)
+                self._thread.start()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, transport=getattr(self.transport, 'name', None),
+                        running=bool(self._thread and self._thread.is_alive()))
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                self._expire()
+                while self._slots.acquire(blocking=False):
+                    message = self._claim()
+                    if message is None:
+                        self._slots.release()
+                        break
+                    self._executor.submit(self._deliver, message)
+            except PyMongoError as e:
+                print(f"[SmsDispatcher] claim failed: {e}")
+            self._wake.wait(self.poll_interval)
+
+    def _claim(self):
+        now = datetime.utcnow()
+        return self.db.sms_outbox.find_one_and_update(
+            {'$or': [
+                {'status': 'pending', 'next_attempt_at': {'$lte': now}},
+                # A worker died mid-send: take the message over once its lease runs out
+                {'status': 'sending', 'claimed_at': {'$lte': now - self.lease},
+                 'attempts': {'$lt': self.max_attempts}}
+            ]},
+            {'$set': {'status': 'sending', 'claimed_at': now}, '$inc': {'attempts': 1}},
+            sort=[('next_attempt_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _expire(self):
+        """Fail messages whose last allowed attempt lost its lease, rather than claiming them again."""
+        error = f"no outcome after {self.max_attempts} attempts (sender stopped mid-send)"
+        while True:
+            message = self.db.sms_outbox.find_one_and_update(
+                {'status': 'sending', 'claimed_at': {'$lte': datetime.utcnow() - self.lease},
+                 'attempts': {'$gte': self.max_attempts}},
+                {'$set': {'status': 'failed', 'error': error}}
+            )
+            if message is None:
+                return
+            self._record(message, 'failed', {'error': error})
+            print(f"❌ SMS to {message['to']} abandoned: {error}")
+
+    def _deliver(self, message):
+        try:
+            sid = self.transport.send(message['to'], message['body'])
+            self._record(message, 'sent', {'sid': sid, 'sent_at': datetime.utcnow()})
+            print(f"✓ SMS sent to {message['to']}! SID: {sid}")
+        except Exception as e:
+            attempts = message['attempts']
+            if attempts >= self.max_attempts:
+                self._record(message, 'failed', {'error': str(e)})
+                print(f"❌ Failed to send SMS to {message['to']} after {attempts} attempts: {e}")
+            else:
+                delay = self.base_delay * (2 ** (attempts - 1))
+                self._record(message, 'pending', {
+                    'error': str(e),
+                    'next_attempt_at': datetime.utcnow() + timedelta(seconds=delay)
+                })
+                print(f"⚠️ SMS to {message['to']} failed (attempt {attempts}), retrying in {delay:.0f}s: {e}")
+        finally:
+            self._slots.release()
+            self._wake.set()
+
+    def _record(self, message, status, fields):
+        with self._lock:
+            self.counters[{'sent': 'sent', 'failed': 'failed', 'pending': 'retried'}[status]] += 1
+        try:
+            self.db.sms_outbox.update_one({'_id': message['_id']}, {'$set': dict(fields, status=status)})
+            alert_fields = {
+                f"sms.{message['_id']}.status": status,
+                f"sms.{message['_id']}.attempts": message['attempts'],
+            }
+            for key in ('sid', 'error'):
+                if key in fields:
+                    alert_fields[f"sms.{message['_id']}.{key}"] = fields[key]
+            self.db.sos_alerts.update_one({'_id': ObjectId(message['alert_id'])}, {'$set': alert_fields})
+        except PyMongoError as e:
+            print(f"[SmsDispatcher] failed to record status for {message['_id']}: {e}")
@@ -0,0 +1,57 @@
+// Resumable report upload: open a session, PATCH the file in chunks, then finalize.
+// A dropped connection only costs the chunk in flight: the client asks the server
+// for its recorded offset and carries on from there.
+// Resolves with the same {status, report} / {error} JSON as POST /api/reports/upload.
+async function uploadReportResumable(file, patientId, onProgress) {
+    const retryDelays = [1000, 2000, 4000, 8000, 15000, 30000];
+    const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+    const asJson = res => res.json().then(data => ({ status: res.status, data }));
+
+    const created = await fetch('/api/reports/uploads', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename: file.name, size: file.size, patient_id: patientId })
+    }).then(asJson);
+    if (created.status !== 201) return created.data;
+
+    const { upload_id: uploadId, chunk_size: chunkSize } = created.data;
+    const url = '/api/reports/uploads/' + uploadId;
+    let offset = 0;
+    let failures = 0;
+
+    while (offset < file.size) {
+        try {
+            const res = await fetch(url, {
+                method: 'PATCH',
+                headers: { 'Upload-Offset': String(offset), 'Content-Type': 'application/offset+octet-stream' },
+                body: file.slice(offset, offset + chunkSize)
+            }).then(asJson);
+            if (res.status === 200 || res.status === 409) {
+                offset = res.data.offset;
+                failures = 0;
+                if (onProgress) onProgress(offset / file.size);
+                continue;
+            }
+            if (res.status < 500) return res.data;
+            throw new Error(res.data.error || 'Server error');
+        } catch (err) {
+            if (failures >= retryDelays.length) throw err;
+            await sleep(retryDelays[failures++]);
+            try {
+                const current = await fetch(url).then(asJson);
+                if (current.status === 200) offset = current.data.offset;
+            } catch (ignored) {
+                // Still offline; the next PATCH attempt will retry
+            }
+        }
+    }
+
+    for (let attempt = 0; ; attempt++) {
+        try {
+            return (await fetch(url + '/finalize', { method: 'POST' }).then(asJson)).data;
+        } catch (err) {
+            if (attempt >= retryDelays.length) throw err;
+            await sleep(retryDelays[attempt]);
+        }
+    }
+}
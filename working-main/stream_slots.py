@@ -0,0 +1,32 @@
+import threading
+
+
+class StreamSlots:
+    """Caps the long-lived streaming responses (SSE) a worker serves at once.
+
+    Each open stream holds one of the worker's threads until it ends, so without
+    a cap a few dozen guardian tabs would leave none for ordinary requests,
+    /feature/sos/trigger included. Streams over the cap are refused, not queued.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.refused = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.active >= self.limit:
+                self.refused += 1
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+
+    def stats(self):
+        with self._lock:
+            return {'limit': self.limit, 'active': self.active, 'refused': self.refused}
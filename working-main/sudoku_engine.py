@@ -0,0 +1,265 @@
+from math import isqrt
+import random
+
+
+def box_shape(size):
+    """(box_rows, box_cols) for a board: 2x2 for 4, 3x3 for 9, 4x4 for 16, 2x3 for 6, ..."""
+    rows = isqrt(size)
+    while size % rows:
+        rows -= 1
+    return rows, size // rows
+
+
+class ConstraintMasks:
+    """Row, column and box occupancy as bitmasks (bit n set = digit n used), so a move check is O(1)."""
+
+    __slots__ = ('size', 'box_rows', 'box_cols', 'rows', 'cols', 'boxes')
+
+    def __init__(self, size, rows=None, cols=None, boxes=None):
+        self.size = size
+        self.box_rows, self.box_cols = box_shape(size)
+        self.rows = list(rows) if rows is not None else [0] * size
+        self.cols = list(cols) if cols is not None else [0] * size
+        self.boxes = list(boxes) if boxes is not None else [0] * size
+
+    @classmethod
+    def from_grid(cls, size, grid):
+        """Build masks from a flat grid (size*size values, 0 = empty)."""
+        masks = cls(size)
+        for index, num in enumerate(grid):
+            if num:
+                masks.place(index // size, index % size, num)
+        return masks
+
+    def box(self, row, col):
+        return (row // self.box_rows) * (self.size // self.box_cols) + col // self.box_cols
+
+    def used(self, row, col):
+        return self.rows[row] | self.cols[col] | self.boxes[self.box(row, col)]
+
+    def can_place(self, row, col, num):
+        return not (self.used(row, col) >> num) & 1
+
+    def place(self, row, col, num):
+        bit = 1 << num
+        self.rows[row] |= bit
+        self.cols[col] |= bit
+        self.boxes[self.box(row, col)] |= bit
+
+    def remove(self, row, col, num):
+        mask = ~(1 << num)
+        self.rows[row] &= mask
+        self.cols[col] &= mask
+        self.boxes[self.box(row, col)] &= mask
+
+    def to_doc(self):
+        return {'rows': self.rows, 'cols': self.cols, 'boxes': self.boxes}
+
+    @classmethod
+    def from_doc(cls, size, doc):
+        return cls(size, doc['rows'], doc['cols'], doc['boxes'])
+
+
+def _digits(mask):
+    """Digits whose bits are set in mask, lowest first."""
+    digits = []
+    while mask:
+        low = mask & -mask
+        digits.append(low.bit_length() - 1)
+        mask ^= low
+    return digits
+
+
+def solve(size, grid, limit=2, rng=None):
+    """Bitmask backtracking with most-constrained-cell ordering.
+
+    grid is a flat sequence (0 = empty). Stops after `limit` solutions.
+    Returns (solutions_found, first_solution_or_None, nodes) where nodes counts
+    branching steps and serves as the effort score for grading puzzles.
+    rng shuffles the digit order, which is how fresh full boards are produced.
+    """
+    masks = ConstraintMasks(size)
+    cells = list(grid)
+    for index, num in enumerate(cells):
+        if num:
+            row, col = divmod(index, size)
+            if not masks.can_place(row, col, num):
+                return 0, None, 0
+            masks.place(row, col, num)
+
+    rows, cols, boxes = masks.rows, masks.cols, masks.boxes
+    full = (1 << (size + 1)) - 2
+    peers = [(i // size, i % size, masks.box(i // size, i % size)) for i in range(size * size)]
+    empties = [i for i, num in enumerate(cells) if not num]
+    state = {'found': 0, 'solution': None, 'nodes': 0}
+
+    def search(remaining):
+        if not remaining:
+            state['found'] += 1
+            if state['solution'] is None:
+                state['solution'] = list(cells)
+            return state['found'] >= limit
+
+        best, best_pos, best_mask, best_count = -1, -1, 0, size + 1
+        for pos, index in enumerate(remaining):
+            row, col, box = peers[index]
+            mask = full & ~(rows[row] | cols[col] | boxes[box])
+            count = bin(mask).count('1')
+            if count < best_count:
+                best, best_pos, best_mask, best_count = index, pos, mask, count
+                if count <= 1:
+                    break
+        if best_count == 0:
+            return False
+
+        state['nodes'] += 1
+        rest = remaining[:best_pos] + remaining[best_pos + 1:]
+        row, col, box = peers[best]
+        digits = _digits(best_mask)
+        if rng is not None:
+            rng.shuffle(digits)
+        for num in digits:
+            bit = 1 << num
+            rows[row] |= bit
+            cols[col] |= bit
+            boxes[box] |= bit
+            cells[best] = num
+            done = search(rest)
+            rows[row] &= ~bit
+            cols[col] &= ~bit
+            boxes[box] &= ~bit
+            cells[best] = 0
+            if done:
+                return True
+        return False
+
+    search(empties)
+    return state['found'], state['solution'], state['nodes']
+
+
+def generate(size, givens, rng=None):
+    """A puzzle with exactly one solution and, where uniqueness allows, `givens` filled cells.
+
+    Builds a random full board, then blanks cells in random order, putting back any
+    cell whose removal would admit a second solution.
+    Returns (puzzle, solution, effort) as flat lists plus the solver effort.
+    """
+    rng = rng or random.Random()
+    _, solution, _ = solve(size, [0] * (size * size), limit=1, rng=rng)
+    puzzle = list(solution)
+    order = list(range(size * size))
+    rng.shuffle(order)
+    filled = len(puzzle)
+    for index in order:
+        if filled <= givens:
+            break
+        puzzle[index] = 0
+        if solve(size, puzzle, limit=2)[0] != 1:
+            puzzle[index] = solution[index]
+        else:
+            filled -= 1
+    _, _, effort = solve(size, puzzle, limit=2)
+    return puzzle, solution, effort
+
+
+def _units(size, box_rows, box_cols):
+    """Cell indexes of every row, column and box, tagged with the unit kind."""
+    units = [('row', [r * size + c for c in range(size)]) for r in range(size)]
+    units += [('column', [r * size + c for r in range(size)]) for c in range(size)]
+    for top in range(0, size, box_rows):
+        for left in range(0, size, box_cols):
+            units.append(('box', [
+                (top + r) * size + left + c for r in range(box_rows) for c in range(box_cols)
+            ]))
+    return units
+
+
+_UNITS = {}
+
+
+def units_for(size):
+    if size not in _UNITS:
+        _UNITS[size] = _units(size, *box_shape(size))
+    return _UNITS[size]
+
+
+def analyse(size, grid, masks):
+    """Read the live board once and report what a player can do next.
+
+    grid is the flat board and masks its ConstraintMasks. Returns a dict with
+    `hint` (row, col, num and the technique - a naked single, where a cell has one
+    candidate, or a hidden single, where a digit fits only one cell of a row, column
+    or box), `conflicts` (filled cells sharing a digit with another cell in a unit),
+    `stuck` (empty cells with no candidate left) and `solved`.
+    """
+    full = (1 << (size + 1)) - 2
+    candidates = [0] * (size * size)
+    empties = 0
+    naked = None
+    stuck = []
+    for index, num in enumerate(grid):
+        if num:
+            continue
+        empties += 1
+        row, col = divmod(index, size)
+        mask = full & ~masks.used(row, col)
+        candidates[index] = mask
+        if not mask:
+            stuck.append([row, col])
+        elif naked is None and not mask & (mask - 1):
+            naked = {'row': row, 'col': col, 'num': mask.bit_length() - 1, 'technique': 'naked single'}
+
+    conflicted = set()
+    hidden = None
+    for kind, cells in units_for(size):
+        # Digits seen once / more than once across the unit's filled values and candidates
+        once = twice = filled_once = filled_twice = 0
+        for index in cells:
+            num = grid[index]
+            if num:
+                bit = 1 << num
+                filled_twice |= filled_once & bit
+                filled_once |= bit
+            else:
+                mask = candidates[index]
+                twice |= once & mask
+                once |= mask
+        if filled_twice:
+            conflicted.update(i for i in cells if grid[i] and (filled_twice >> grid[i]) & 1)
+        single = once & ~twice
+        if hidden is None and naked is None and single:
+            bit = single & -single
+            index = next(i for i in cells if candidates[i] & bit)
+            row, col = divmod(index, size)
+            hidden = {'row': row, 'col': col, 'num': bit.bit_length() - 1, 'technique': f'hidden single ({kind})'}
+
+    conflicts = [list(divmod(index, size)) for index in sorted(conflicted)]
+    return {
+        'hint': naked or hidden,
+        'conflicts': conflicts,
+        'stuck': stuck,
+        'solved': empties == 0 and not conflicts
+    }
+
+
+def can_place(grid, row, col, num, size):
+    """Reference scan over row, column and box of a list-of-rows grid (square boxes only).
+
+    Kept for bench_sudoku.py; the routes use ConstraintMasks.
+    """
+    # Row check
+    if num in grid[row]:
+        return False
+    # Column check
+    for i in range(size):
+        if grid[i][col] == num:
+            return False
+    # Box check
+    box_size = int(size ** 0.5)
+    start_row = (row // box_size) * box_size
+    start_col = (col // box_size) * box_size
+    for i in range(box_size):
+        for j in range(box_size):
+            if grid[start_row + i][start_col + j] == num:
+                return False
+    return True
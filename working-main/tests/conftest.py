@@ -0,0 +1,20 @@
+import os
+import sys
+
+import mongomock
+import pytest
+
+# The app modules live at the top of the project, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blob_store import BlobStore  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().db
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path / 'blobs'))
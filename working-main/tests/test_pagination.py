@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson.objectid import ObjectId
+
+from pagination import MAX_LIMIT, decode_cursor, encode_cursor, keyset_page, page_limit
+
+
+def test_cursor_round_trip():
+    doc_id = ObjectId()
+    value = datetime(2024, 5, 1, 12, 30, 15, 123000)
+    assert decode_cursor(encode_cursor(value, doc_id)) == (value, doc_id)
+    assert decode_cursor(encode_cursor(None, doc_id)) == (None, doc_id)
+
+
+@pytest.mark.parametrize('cursor', ['', 'garbage', encode_cursor(None, ObjectId())[:-4]])
+def test_bad_cursor_is_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_page_limit_clamps():
+    assert page_limit(None) == 20
+    assert page_limit('0') == 1
+    assert page_limit('5') == 5
+    assert page_limit('100000') == MAX_LIMIT
+
+
+def test_pages_cover_every_document_once(db):
+    start = datetime(2024, 1, 1)
+    # Two documents share each timestamp, so _id has to break the ties
+    db.alerts.insert_many([{'patient_id': 'p1', 'timestamp': start + timedelta(minutes=i // 2)} for i in range(9)])
+    # Legacy documents without a timestamp come last
+    db.alerts.insert_many([{'patient_id': 'p1'}, {'patient_id': 'p1', 'timestamp': None}])
+    db.alerts.insert_one({'patient_id': 'p2', 'timestamp': start})
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        docs, cursor = keyset_page(db.alerts, {'patient_id': 'p1'}, 'timestamp', cursor, limit=4)
+        seen.extend(docs)
+        pages += 1
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert len({doc['_id'] for doc in seen}) == len(seen) == 11
+    stamps = [doc['timestamp'] for doc in seen if doc.get('timestamp')]
+    assert stamps == sorted(stamps, reverse=True)
+    assert all(doc.get('timestamp') is None for doc in seen[9:])
@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson.objectid import ObjectId
+
+from sms_outbox import FakeSmsTransport, SmsDispatcher
+
+
+@pytest.fixture
+def transport():
+    return FakeSmsTransport()
+
+
+@pytest.fixture
+def dispatcher(db, transport):
+    return SmsDispatcher(db, transport, max_attempts=3, base_delay=2.0, lease=60.0)
+
+
+@pytest.fixture
+def alert_id(db):
+    return str(db.sos_alerts.insert_one({'timestamp': datetime.utcnow()}).inserted_id)
+
+
+def drain(dispatcher):
+    """One dispatcher pass, delivering each claimed message on the calling thread."""
+    dispatcher._expire()
+    delivered = 0
+    while dispatcher._slots.acquire(blocking=False):
+        message = dispatcher._claim()
+        if message is None:
+            dispatcher._slots.release()
+            break
+        dispatcher._deliver(message)
+        delivered += 1
+    return delivered
+
+
+def now_ms():
+    """utcnow at the millisecond precision MongoDB stores."""
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def make_due(db):
+    db.sms_outbox.update_many({'status': 'pending'}, {'$set': {'next_attempt_at': datetime.utcnow()}})
+
+
+def test_enqueue_dedupes_recipients_and_mirrors_onto_alert(db, dispatcher, alert_id):
+    ids = dispatcher.enqueue(alert_id, ['+100', '+200', '+100'], 'help')
+
+    assert len(ids) == 2
+    assert db.sms_outbox.count_documents({'status': 'pending', 'attempts': 0}) == 2
+    sms = db.sos_alerts.find_one({'_id': ObjectId(alert_id)})['sms']
+    assert {entry['to'] for entry in sms.values()} == {'+100', '+200'}
+    assert dispatcher.enqueue(alert_id, [], 'help') == []
+
+
+def test_delivers_and_records_sid(db, dispatcher, transport, alert_id):
+    [msg_id] = dispatcher.enqueue(alert_id, ['+100'], 'help')
+
+    assert drain(dispatcher) == 1
+    assert transport.sent == [{'to': '+100', 'body': 'help'}]
+    message = db.sms_outbox.find_one({'_id': msg_id})
+    assert message['status'] == 'sent'
+    assert message['sid'] == 'FAKE000001'
+    mirrored = db.sos_alerts.find_one({'_id': ObjectId(alert_id)})['sms'][str(msg_id)]
+    assert mirrored['status'] == 'sent' and mirrored['attempts'] == 1
+    assert drain(dispatcher) == 0
+
+
+def test_failure_backs_off_exponentially(db, dispatcher, transport, alert_id):
+    transport.fail_next = 2
+    [msg_id] = dispatcher.enqueue(alert_id, ['+100'], 'help')
+
+    before = now_ms()
+    drain(dispatcher)
+    message = db.sms_outbox.find_one({'_id': msg_id})
+    assert message['status'] == 'pending' and message['attempts'] == 1
+    assert before + timedelta(seconds=2) <= message['next_attempt_at'] <= datetime.utcnow() + timedelta(seconds=2)
+    # Not due yet
+    assert drain(dispatcher) == 0
+
+    make_due(db)
+    before = now_ms()
+    drain(dispatcher)
+    message = db.sms_outbox.find_one({'_id': msg_id})
+    assert message['attempts'] == 2
+    assert message['next_attempt_at'] >= before + timedelta(seconds=4)
+
+    make_due(db)
+    drain(dispatcher)
+    assert db.sms_outbox.find_one({'_id': msg_id})['status'] == 'sent'
+    assert dispatcher.stats()['retried'] == 2
+
+
+def test_gives_up_after_max_attempts(db, dispatcher, transport, alert_id):
+    transport.fail_next = 10
+    [msg_id] = dispatcher.enqueue(alert_id, ['+100'], 'help')
+
+    for _ in range(5):
+        make_due(db)
+        drain(dispatcher)
+
+    message = db.sms_outbox.find_one({'_id': msg_id})
+    assert message['status'] == 'failed'
+    assert message['attempts'] == 3
+    assert transport.fail_next == 7
+    assert dispatcher.stats()['failed'] == 1
+
+
+def test_expired_lease_is_reclaimed(db, dispatcher, transport, alert_id):
+    [msg_id] = dispatcher.enqueue(alert_id, ['+100'], 'help')
+    # A worker claimed it and died before recording an outcome
+    assert dispatcher._claim()['_id'] == msg_id
+    assert drain(dispatcher) == 0
+
+    db.sms_outbox.update_one({'_id': msg_id}, {'$set': {'claimed_at': datetime.utcnow() - timedelta(seconds=61)}})
+    assert drain(dispatcher) == 1
+    message = db.sms_outbox.find_one({'_id': msg_id})
+    assert message['status'] == 'sent' and message['attempts'] == 2
+
+
+def test_lease_reclaim_never_exceeds_max_attempts(db, dispatcher, transport, alert_id):
+    [msg_id] = dispatcher.enqueue(alert_id, ['+100'], 'help')
+    # The last allowed attempt lost its lease
+    db.sms_outbox.update_one({'_id': msg_id}, {'$set': {
+        'status': 'sending', 'attempts': 3, 'claimed_at': datetime.utcnow() - timedelta(seconds=61)
+    }})
+
+    assert drain(dispatcher) == 0
+    assert transport.sent == []
+    message = db.sms_outbox.find_one({'_id': msg_id})
+    assert message['status'] == 'failed' and message['attempts'] == 3
+    assert db.sos_alerts.find_one({'_id': ObjectId(alert_id)})['sms'][str(msg_id)]['status'] == 'failed'
+
+
+def test_claims_oldest_due_first(db, dispatcher, transport, alert_id):
+    dispatcher.enqueue(alert_id, ['+100'], 'first')
+    dispatcher.enqueue(alert_id, ['+200'], 'second')
+    db.sms_outbox.update_one({'to': '+200'}, {'$set': {'next_attempt_at': datetime.utcnow() - timedelta(minutes=1)}})
+
+    assert dispatcher._claim()['to'] == '+200'
+    assert dispatcher._claim()['to'] == '+100'
+    assert dispatcher._claim() is None
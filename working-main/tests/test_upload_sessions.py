@@ -0,0 +1,115 @@
+import hashlib
+import io
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from bson.objectid import ObjectId
+
+from upload_sessions import (
+    OffsetMismatch, _temp_path, create_session, finalize_session, get_session, sweep_sessions, write_chunk
+)
+
+DATA = b'0123456789' * 10
+
+
+class DroppedStream:
+    """Yields `data` and then fails like a client disconnecting mid-chunk."""
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def read(self, size):
+        chunk = self.data.read(size)
+        if not chunk:
+            raise OSError('connection reset')
+        return chunk
+
+
+@pytest.fixture
+def session(db, store):
+    return create_session(db, store, 'patient:1', 'p1', 'scan.pdf', len(DATA))
+
+
+def reload(db, session):
+    return db.upload_sessions.find_one({'_id': session['_id']})
+
+
+def fake_report(db):
+    def create(sha256, size):
+        report = {'_id': ObjectId(), 'blob': sha256, 'file_size': size}
+        db.reports.insert_one(report)
+        return report
+    return create
+
+
+def test_get_session_checks_owner_and_id(db, session):
+    assert get_session(db, str(session['_id']), 'patient:1')['_id'] == session['_id']
+    assert get_session(db, str(session['_id']), 'patient:2') is None
+    assert get_session(db, 'not-an-id', 'patient:1') is None
+
+
+def test_chunks_resume_at_recorded_offset(db, store, session):
+    assert write_chunk(db, store, session, 0, io.BytesIO(DATA[:40])) == 40
+    with pytest.raises(OffsetMismatch) as e:
+        write_chunk(db, store, reload(db, session), 0, io.BytesIO(DATA[:40]))
+    assert e.value.offset == 40
+    assert write_chunk(db, store, reload(db, session), 40, io.BytesIO(DATA[40:])) == len(DATA)
+    with open(_temp_path(store, session['_id']), 'rb') as f:
+        assert f.read() == DATA
+
+
+def test_dropped_connection_keeps_received_bytes(db, store, session):
+    with pytest.raises(OSError):
+        write_chunk(db, store, session, 0, DroppedStream(DATA[:25]))
+    assert reload(db, session)['offset'] == 25
+
+
+def test_chunk_past_declared_size_is_refused(db, store, session):
+    with pytest.raises(ValueError):
+        write_chunk(db, store, session, 0, io.BytesIO(DATA + b'x'))
+
+
+def test_finalize_stores_blob_and_creates_one_report(db, store, session):
+    write_chunk(db, store, session, 0, io.BytesIO(DATA))
+    report = finalize_session(db, store, reload(db, session), fake_report(db))
+
+    sha256 = hashlib.sha256(DATA).hexdigest()
+    assert report['blob'] == sha256 and store.exists(sha256)
+    done = reload(db, session)
+    assert done['status'] == 'complete' and done['report_id'] == report['_id']
+    with pytest.raises(OffsetMismatch):
+        finalize_session(db, store, done, fake_report(db))
+    assert db.reports.count_documents({}) == 1
+
+
+def test_finalize_refuses_incomplete_upload(db, store, session):
+    write_chunk(db, store, session, 0, io.BytesIO(DATA[:10]))
+    with pytest.raises(OffsetMismatch) as e:
+        finalize_session(db, store, reload(db, session), fake_report(db))
+    assert e.value.offset == 10
+
+
+def test_failed_finalize_reopens_for_retry(db, store, session):
+    write_chunk(db, store, session, 0, io.BytesIO(DATA))
+
+    def broken(sha256, size):
+        raise RuntimeError('database down')
+
+    with pytest.raises(RuntimeError):
+        finalize_session(db, store, reload(db, session), broken)
+    assert reload(db, session)['status'] == 'open'
+    assert os.path.exists(_temp_path(store, session['_id']))
+
+    report = finalize_session(db, store, reload(db, session), fake_report(db))
+    assert report['blob'] == hashlib.sha256(DATA).hexdigest()
+
+
+def test_sweep_drops_idle_sessions_and_temp_files(db, store, session):
+    fresh = create_session(db, store, 'patient:1', 'p1', 'other.pdf', 10)
+    db.upload_sessions.update_one({'_id': session['_id']}, {'$set': {'updated_at': datetime.utcnow() - timedelta(days=2)}})
+
+    assert sweep_sessions(db, store) == 1
+    assert reload(db, session) is None
+    assert not os.path.exists(_temp_path(store, session['_id']))
+    assert reload(db, fresh) is not None
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from vitals_ingest import IngestBusy, VitalsIngestor, parse_readings, validate_readings
+
+NOW = datetime(2024, 6, 1, 12, 0)
+
+
+def reading(**fields):
+    return dict({'patient_id': 'p1', 'type': 'Heart Rate', 'value': 72, 'timestamp': '2024-06-01T11:00:00Z'}, **fields)
+
+
+def validate(readings, allowed=('p1',)):
+    return validate_readings(readings, set(allowed), now=NOW)
+
+
+def test_parse_ndjson_array_and_wrapped():
+    assert parse_readings(b'{"value": 1}\n\n{"value": 2}\n', 'application/x-ndjson') == [{'value': 1}, {'value': 2}]
+    assert parse_readings(b'[{"value": 1}]', 'application/json') == [{'value': 1}]
+    assert parse_readings(b'{"readings": [{"value": 1}]}', 'application/json') == [{'value': 1}]
+    with pytest.raises(ValueError, match='line 2'):
+        parse_readings(b'{}\n{oops', 'application/x-ndjson')
+    with pytest.raises(ValueError):
+        parse_readings(b'{"value": 1}', 'application/json')
+
+
+def test_valid_reading_becomes_row():
+    rows, sources, rejected = validate([reading()])
+    assert rejected == [] and sources == [0]
+    assert rows == [('p1', 'Heart Rate', datetime(2024, 6, 1, 11, 0), 72, 'bpm')]
+
+
+def test_units_are_converted_to_canonical():
+    rows, _, rejected = validate([
+        reading(type='Temperature', value=37, unit='°C'),
+        reading(type='Blood Pressure', value='120/80'),
+        reading(type='Weight', value=154, unit='lb'),
+    ])
+    assert rejected == []
+    assert [(row[3], row[4]) for row in rows] == [
+        (98.6, '°F'), ({'systolic': 120, 'diastolic': 80}, 'mmHg'), (69.85, 'kg')
+    ]
+
+
+def test_unknown_types_keep_values_as_sent():
+    rows, _, rejected = validate([reading(type='Mood', value=3), reading(type='Mood', value=2.5)])
+    assert rejected == []
+    assert [row[3] for row in rows] == [3, 2.5]
+    assert isinstance(rows[0][3], int)
+
+
+@pytest.mark.parametrize('bad, reason', [
+    ('not an object', 'not a JSON object'),
+    (reading(patient_id='p2'), 'patient_id not allowed'),
+    (reading(type=''), 'type must be'),
+    (reading(type='Heart\x1fRate'), 'type must be'),
+    (reading(timestamp='yesterday'), 'timestamp must be'),
+    (reading(timestamp='2024-06-01T11:00:00+99:00'), 'timestamp must be'),
+    (reading(timestamp='2020-01-01T00:00:00Z'), 'over a year old'),
+    (reading(unit='kPa'), 'unit not accepted'),
+    (reading(value='fast'), 'value must be'),
+    (reading(value=True), 'value must be'),
+    (reading(type='Mood', value=2 ** 70), 'value must be'),
+    (reading(value=400), 'outside the plausible range'),
+    (reading(type='Blood Pressure', value='80/120'), 'outside the plausible range'),
+])
+def test_bad_readings_are_rejected_individually(bad, reason):
+    rows, sources, rejected = validate([reading(), bad, reading()])
+    assert sources == [0, 2]
+    assert len(rejected) == 1
+    index, error = rejected[0]
+    assert index == 1 and reason in error
+
+
+def test_ingest_writes_buckets_and_latest(db):
+    now = datetime.utcnow().replace(microsecond=0)
+    readings = [
+        {'type': 'Heart Rate', 'value': 70 + i, 'timestamp': (now - timedelta(minutes=i)).isoformat()}
+        for i in range(5)
+    ] + [{'type': 'Heart Rate', 'value': 'n/a'}]
+
+    result = VitalsIngestor(db).ingest(readings, {'p1'}, default_patient='p1')
+
+    assert result['received'] == 6 and result['written'] == 5
+    assert result['rejected'] == [{'index': 5, 'error': 'value must be a number, or systolic/diastolic for blood pressure'}]
+    assert sum(len(bucket['readings']) for bucket in db.vitals_buckets.find()) == 5
+    latest = db.patient_vitals_latest.find_one({'patient_id': 'p1', 'type': 'Heart Rate'})
+    assert latest['value'] == 70
+
+
+def test_ingest_refuses_when_every_slot_is_busy(db):
+    ingestor = VitalsIngestor(db, max_concurrent=1)
+    ingestor._slots.acquire()
+    try:
+        with pytest.raises(IngestBusy):
+            ingestor.ingest([reading()], {'p1'})
+    finally:
+        ingestor._slots.release()
+    assert ingestor.stats()['busy'] == 1
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import vitals_store
+from vitals_store import CHECKPOINTS, VitalsRollup, write_readings
+
+
+@pytest.fixture
+def buckets(db):
+    start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(days=2)
+    rows = [('p1', 'Heart Rate', start + timedelta(hours=i), 60 + i % 30, 'bpm') for i in range(45)]
+    write_readings(db, rows)
+    return len(rows)
+
+
+def test_pass_rolls_up_every_bucket_in_batches(db, buckets, monkeypatch):
+    rollup = VitalsRollup(db, batch_size=10)
+    real = vitals_store._rollup_keys
+    batches = []
+
+    def counting(db_, keys, now):
+        batches.append(len(keys))
+        return real(db_, keys, now)
+
+    monkeypatch.setattr(vitals_store, '_rollup_keys', counting)
+    hours, _ = rollup.run_once()
+
+    assert hours == buckets
+    assert max(batches) <= 10
+    assert db.vitals_rollups.count_documents({'period': 'hour'}) == buckets
+    job = db[CHECKPOINTS].find_one({'_id': 'rollup:vitals'})
+    assert 'cursor' not in job and job['last_run'] == job['lease_until']
+
+
+def test_interrupted_pass_resumes_from_checkpoint(db, buckets, monkeypatch):
+    rollup = VitalsRollup(db, batch_size=10)
+    real = vitals_store._rollup_keys
+    calls = []
+
+    def dies_on_third_batch(db_, keys, now):
+        calls.append(keys)
+        if len(calls) == 3:
+            raise RuntimeError('worker killed')
+        return real(db_, keys, now)
+
+    monkeypatch.setattr(vitals_store, '_rollup_keys', dies_on_third_batch)
+    with pytest.raises(RuntimeError):
+        rollup.run_once()
+    job = db[CHECKPOINTS].find_one({'_id': 'rollup:vitals'})
+    assert job['cursor'] and 'last_run' not in job
+    # The lease was renewed after each batch, so no other worker has started over meanwhile
+    assert rollup.run_once() is None
+
+    db[CHECKPOINTS].update_one({'_id': 'rollup:vitals'}, {'$set': {'lease_until': datetime.utcnow()}})
+    hours, _ = rollup.run_once()
+    assert hours == buckets - 20
+    assert db.vitals_rollups.count_documents({'period': 'hour'}) == buckets
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import shutil
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from werkzeug.exceptions import ClientDisconnected
+
+from blob_store import CHUNK_SIZE
+
+# Clients send at most this much per PATCH; smaller chunks lose less on a dropped connection
+UPLOAD_CHUNK_SIZE = 2 * 1024 * 1024
+
+
+class OffsetMismatch(Exception):
+    """A chunk was sent for a different offset than the server has recorded."""
+
+    def __init__(self, offset):
+        super().__init__(f"expected offset {offset}")
+        self.offset = offset
+
+
+def _temp_path(store, upload_id):
+    return os.path.join(store.tmp_dir, f"upload-{upload_id}")
+
+
+def create_session(db, store, owner, patient_id, filename, size):
+    """Open a resumable upload of `size` bytes and its empty temp file. Returns the session document."""
+    now = datetime.utcnow()
+    session = {
+        '_id': ObjectId(),
+        'owner': owner,
+        'patient_id': patient_id,
+        'filename': filename,
+        'size': size,
+        'offset': 0,
+        'status': 'open',
+        'created_at': now,
+        'updated_at': now
+    }
+    open(_temp_path(store, session['_id']), 'wb').close()
+    db.upload_sessions.insert_one(session)
+    return session
+
+
+def get_session(db, upload_id, owner):
+    """The caller's session for upload_id, or None."""
+    try:
+        return db.upload_sessions.find_one({'_id': ObjectId(upload_id), 'owner': owner})
+    except (InvalidId, TypeError):
+        return None
+
+
+def write_chunk(db, store, session, offset, stream):
+    """Append one chunk at `offset` and record the new offset.
+
+    Bytes that arrive before a dropped connection are kept and counted, so the
+    client resumes from where the transfer actually stopped. Raises OffsetMismatch
+    when offset is not the recorded one and ValueError when the chunk runs past
+    the declared size. Returns the new offset.
+    """
+    if session['status'] != 'open' or offset != session['offset']:
+        raise OffsetMismatch(session['offset'])
+    remaining = session['size'] - offset
+    written = 0
+    error = None
+    with open(_temp_path(store, session['_id']), 'r+b') as f:
+        f.seek(offset)
+        try:
+            while True:
+                chunk = stream.read(min(CHUNK_SIZE, remaining - written + 1))
+                if not chunk:
+                    break
+                if written + len(chunk) > remaining:
+                    error = ValueError('chunk runs past the declared upload size')
+                    break
+                f.write(chunk)
+                written += len(chunk)
+        except (OSError, ClientDisconnected) as e:
+            # e.g. the client disconnected mid-chunk
+            error = e
+
+    # Conditional on the old offset so a concurrent PATCH for the same range cannot move it twice
+    updated = db.upload_sessions.find_one_and_update(
+        {'_id': session['_id'], 'offset': offset, 'status': 'open'},
+        {'$set': {'offset': offset + written, 'updated_at': datetime.utcnow()}}
+    )
+    if updated is None:
+        current = db.upload_sessions.find_one({'_id': session['_id']}, {'offset': 1})
+        raise OffsetMismatch(current['offset'] if current else offset)
+    if error is not None:
+        raise error
+    return offset + written
+
+
+def finalize_session(db, store, session, create_report):
+    """Hash the assembled file, move it into the blob store and hand it to create_report(sha256, size).
+
+    create_report returns the new reports document; its _id is kept on the session
+    so a retried finalize can be answered without a second report. Raises
+    OffsetMismatch when bytes are still missing or another finalize is running.
+    If storing or create_report fails, the session is reopened with its temp file
+    in place, so the finalize can be retried, and the error is re-raised.
+    """
+    if session['offset'] != session['size']:
+        raise OffsetMismatch(session['offset'])
+    claimed = db.upload_sessions.find_one_and_update(
+        {'_id': session['_id'], 'status': 'open'},
+        {'$set': {'status': 'finalizing', 'updated_at': datetime.utcnow()}}
+    )
+    if claimed is None:
+        raise OffsetMismatch(session['offset'])
+
+    tmp_path = _temp_path(store, session['_id'])
+    sha256 = None
+    try:
+        digest = hashlib.sha256()
+        with open(tmp_path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+        store.adopt(tmp_path, sha256)
+        report = create_report(sha256, session['size'])
+    except BaseException:
+        _reopen(db, store, session, tmp_path, sha256)
+        raise
+    db.upload_sessions.update_one(
+        {'_id': session['_id']},
+        {'$set': {'status': 'complete', 'report_id': report['_id'], 'updated_at': datetime.utcnow()}}
+    )
+    return report
+
+
+def _reopen(db, store, session, tmp_path, sha256):
+    # adopt() may already have moved the bytes into the store; link them back for the retry
+    if sha256 and not os.path.exists(tmp_path) and store.exists(sha256):
+        try:
+            os.link(store.path(sha256), tmp_path)
+        except OSError:
+            shutil.copyfile(store.path(sha256), tmp_path)
+    db.upload_sessions.update_one(
+        {'_id': session['_id'], 'status': 'finalizing'},
+        {'$set': {'status': 'open', 'updated_at': datetime.utcnow()}}
+    )
+
+
+def sweep_sessions(db, store, max_age=timedelta(days=1)):
+    """Drop sessions idle for longer than max_age along with their temp files. Returns how many."""
+    stale = list(db.upload_sessions.find(
+        {'status': {'$ne': 'complete'}, 'updated_at': {'$lt': datetime.utcnow() - max_age}},
+        {'_id': 1}
+    ))
+    for session in stale:
+        try:
+            os.remove(_temp_path(store, session['_id']))
+        except FileNotFoundError:
+            pass
+    if stale:
+        db.upload_sessions.delete_many({'_id': {'$in': [s['_id'] for s in stale]}})
+    # Finished sessions only matter for a client re-asking about an upload it just completed
+    db.upload_sessions.delete_many(
+        {'status': 'complete', 'updated_at': {'$lt': datetime.utcnow() - max_age}}
+    )
+    return len(stale)
@@ -0,0 +1,243 @@
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from vitals_schema import VITAL_TYPES, is_number, parse_pair, unit_conversion
+from vitals_store import write_readings
+
+MAX_BATCH_READINGS = 50_000
+# Rejections listed in a response; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+MAX_TYPE_LENGTH = 64
+# Devices with a slightly fast clock are fine; a day of backlog from a clinic is too
+CLOCK_SKEW = timedelta(minutes=5)
+MAX_AGE = timedelta(days=366)
+
+_EPOCH = datetime(1970, 1, 1)
+_INVALID = np.iinfo(np.int64).min
+
+# np.select picks the first matching reason, so checks are listed in order of precedence
+_REASONS = [
+    'not a JSON object',
+    'patient_id not allowed',
+    'type must be a non-empty printable string',
+    'timestamp must be ISO 8601 or epoch milliseconds',
+    'timestamp is in the future or over a year old',
+    'unit not accepted for its type',
+    'value must be a number, or systolic/diastolic for blood pressure',
+    'value outside the plausible range for its type',
+]
+# Joins type and unit into one lookup key; a control character no type or unit name contains
+_SEPARATOR = '\x1f'
+
+
+class IngestBusy(Exception):
+    """Every ingest slot is taken; the client should retry shortly."""
+
+
+def parse_readings(body, mimetype):
+    """Readings from an NDJSON body (one object per line), a JSON array or {"readings": [...]}.
+
+    Raises ValueError for anything else.
+    """
+    text = body.decode('utf-8')
+    if mimetype in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        readings = []
+        for number, line in enumerate(text.splitlines(), 1):
+            if line.strip():
+                try:
+                    readings.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"invalid NDJSON on line {number}: {e.msg}") from None
+        return readings
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid JSON: {e.msg}") from None
+    if isinstance(payload, dict):
+        payload = payload.get('readings')
+    if not isinstance(payload, list):
+        raise ValueError('expected a JSON array of readings or {"readings": [...]}')
+    return payload
+
+
+def _epoch_ms(value, now_ms):
+    if value is None:
+        return now_ms
+    if is_number(value):
+        try:
+            millis = int(value)
+        except (ValueError, OverflowError):
+            return _INVALID
+        return millis if abs(millis) < 2 ** 62 else _INVALID
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        except (ValueError, OverflowError):
+            # OverflowError: an offset that moves the time past year 1 or 9999
+            return _INVALID
+        return (parsed - _EPOCH) // timedelta(milliseconds=1)
+    return _INVALID
+
+
+def _conversion_table(keys):
+    """Per distinct (type, unit): scale, offset, accepted, low, high, integer, paired, stored unit."""
+    table = []
+    for key in keys:
+        # Types never contain the separator (see above); units might, and are then just not accepted
+        vital_type, unit = key.split(_SEPARATOR, 1)
+        spec = VITAL_TYPES.get(vital_type, {})
+        conversion = unit_conversion(vital_type, unit)
+        scale, offset, stored_unit = conversion or (1, 0, None)
+        low, high = spec.get('range', (-np.inf, np.inf))
+        table.append((scale, offset, conversion is not None, low, high,
+                      spec.get('integer', False), 'fields' in spec, stored_unit))
+    return table
+
+
+def validate_readings(readings, allowed_patients, default_patient=None, now=None):
+    """Check and normalise a batch column by column.
+
+    Fields are pulled into arrays in one pass. Every rule, and the unit
+    conversion, then runs as NumPy operations over the whole batch, with one
+    table lookup per distinct (type, unit). Returns (rows, sources, rejected):
+    - rows are (patient_id, type, timestamp, value, unit) tuples in the
+      stored form, ready for write_readings
+    - sources[i] is row i's index in the payload
+    - rejected is a list of (index, reason)
+    """
+    now = now or datetime.utcnow()
+    now_ms = (now - _EPOCH) // timedelta(milliseconds=1)
+    n = len(readings)
+    is_object = np.zeros(n, dtype=bool)
+    patients = np.empty(n, dtype=object)
+    types = np.empty(n, dtype=object)
+    units = np.empty(n, dtype=object)
+    stamps = np.empty(n, dtype=np.int64)
+    # Plain values go in `first`; paired ones (blood pressure) fill both
+    first = np.full(n, np.nan)
+    second = np.full(n, np.nan)
+    for i, reading in enumerate(readings):
+        if not isinstance(reading, dict):
+            patients[i], types[i], units[i], stamps[i] = '', '', '', _INVALID
+            continue
+        is_object[i] = True
+        patients[i] = str(reading.get('patient_id') or default_patient or '')
+        vital_type = reading.get('type')
+        # Control characters (the lookup key separator among them) make the type invalid
+        types[i] = vital_type if isinstance(vital_type, str) and vital_type.isprintable() else ''
+        unit = reading.get('unit')
+        units[i] = unit.strip() if isinstance(unit, str) else ''
+        stamps[i] = _epoch_ms(reading.get('timestamp'), now_ms)
+        value = reading.get('value')
+        fields = VITAL_TYPES.get(types[i], {}).get('fields')
+        if fields:
+            parts = parse_pair(value, fields)
+            if parts:
+                first[i], second[i] = parts
+        elif is_number(value):
+            first[i] = value
+
+    type_names = types.astype(str)
+    type_lengths = np.char.str_len(type_names)
+    keys, key_of = np.unique(np.char.add(np.char.add(type_names, _SEPARATOR), units.astype(str)), return_inverse=True)
+    key_of = key_of.ravel()
+    table = _conversion_table(keys)
+    scale, offset, unit_ok, low, high, integer, paired = (
+        np.array([row[column] for row in table], dtype=dtype)[key_of]
+        for column, dtype in enumerate((float, float, bool, float, float, bool, bool))
+    )
+    # Converted values are kept to two decimals (37 °C is 98.6 °F, not 98.60000000000001)
+    converted = (scale != 1) | (offset != 0)
+    first = np.where(converted, np.round(first * scale + offset, 2), first)
+    second = np.where(converted, np.round(second * scale + offset, 2), second)
+    value_ok = np.isfinite(first) & (~paired | np.isfinite(second))
+    in_range = (first >= low) & (first <= high) & (
+        ~paired | ((second >= low) & (second <= high) & (first > second))
+    )
+    first = np.where(integer, np.round(first), first)
+    second = np.where(integer, np.round(second), second)
+    oldest = now_ms - MAX_AGE // timedelta(milliseconds=1)
+    newest = now_ms + CLOCK_SKEW // timedelta(milliseconds=1)
+
+    failures = [
+        ~is_object,
+        ~np.isin(patients.astype(str), list(allowed_patients)),
+        (type_lengths == 0) | (type_lengths > MAX_TYPE_LENGTH),
+        stamps == _INVALID,
+        (stamps < oldest) | (stamps > newest),
+        ~unit_ok,
+        ~value_ok,
+        ~in_range,
+    ]
+    reason = np.select(failures, list(range(len(_REASONS))), default=-1)
+
+    rows, sources = [], []
+    for i in np.flatnonzero(reason < 0):
+        number = int if integer[i] else float
+        if paired[i]:
+            fields = VITAL_TYPES[types[i]]['fields']
+            value = dict(zip(fields, (number(first[i]), number(second[i]))))
+        elif converted[i] or integer[i]:
+            value = number(first[i])
+        else:
+            # Stored as sent (an int stays an int), as record_vital does
+            value = readings[i]['value']
+        rows.append((
+            patients[i], types[i], _EPOCH + timedelta(milliseconds=int(stamps[i])),
+            value, table[key_of[i]][-1]
+        ))
+        sources.append(int(i))
+    rejected = [(int(i), _REASONS[reason[i]]) for i in np.flatnonzero(reason >= 0)]
+    return rows, sources, rejected
+
+
+class VitalsIngestor:
+    """Validates and stores batches of readings from devices.
+
+    At most `max_concurrent` batches are written at once per worker; further
+    requests get IngestBusy straight away instead of queueing behind them.
+    """
+
+    def __init__(self, db, max_concurrent=2, batch_size=500):
+        self.db = db
+        self.batch_size = batch_size
+        self.counters = {'batches': 0, 'written': 0, 'rejected': 0, 'failed': 0, 'busy': 0}
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def ingest(self, readings, allowed_patients, default_patient=None):
+        """Store the valid readings and report the rest by payload index."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.counters['busy'] += 1
+            raise IngestBusy()
+        try:
+            rows, sources, rejected = validate_readings(readings, allowed_patients, default_patient)
+            failed = write_readings(self.db, rows, self.batch_size) if rows else {}
+        finally:
+            self._slots.release()
+
+        failed = sorted((sources[i], error) for i, error in failed.items())
+        written = len(rows) - len(failed)
+        with self._lock:
+            self.counters['batches'] += 1
+            self.counters['written'] += written
+            self.counters['rejected'] += len(rejected)
+            self.counters['failed'] += len(failed)
+        return {
+            'received': len(readings),
+            'written': written,
+            'rejected_count': len(rejected),
+            'rejected': [{'index': i, 'error': error} for i, error in rejected[:MAX_REPORTED_ERRORS]],
+            'failed_count': len(failed),
+            'failed': [{'index': i, 'error': error} for i, error in failed[:MAX_REPORTED_ERRORS]]
+        }
@@ -0,0 +1,115 @@
+import math
+import re
+
+# Canonical unit, plausible range and accepted units per known vital type.
+# A value in another accepted unit is stored as value * scale + offset.
+# Paired types store {field: int} (e.g. {'systolic': 120, 'diastolic': 80}).
+VITAL_TYPES = {
+    'Heart Rate': {'unit': 'bpm', 'range': (20, 250), 'integer': True},
+    'Blood Pressure': {
+        'unit': 'mmHg', 'range': (20, 300), 'integer': True,
+        'fields': ('systolic', 'diastolic'),
+        'units': {'kpa': (7.50062, 0)}
+    },
+    'Blood Sugar': {'unit': 'mg/dL', 'range': (10, 1000), 'units': {'mmol/l': (18.0, 0)}},
+    'SpO2': {'unit': '%', 'range': (50, 100)},
+    'Oxygen Level': {'unit': '%', 'range': (50, 100)},
+    'Temperature': {
+        'unit': '°F', 'range': (77, 113),
+        'units': {'°c': (1.8, 32), 'c': (1.8, 32), 'f': (1, 0)}
+    },
+    'Steps': {'unit': 'steps', 'range': (0, 200_000), 'integer': True},
+    'Weight': {'unit': 'kg', 'range': (2, 400), 'units': {'lb': (0.45359237, 0), 'lbs': (0.45359237, 0)}},
+}
+
+_PAIR = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*/\s*(\d+(?:\.\d+)?)\s*$')
+
+
+# MongoDB stores ints as at most 8 bytes; a larger one fails the whole write
+_INT_LIMIT = 2 ** 63
+
+
+def is_number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    if isinstance(value, int) and abs(value) >= _INT_LIMIT:
+        return False
+    try:
+        return math.isfinite(value)
+    except OverflowError:
+        # An int too large for a float, e.g. 1e400 written out in full
+        return False
+
+
+def unit_conversion(vital_type, unit):
+    """(scale, offset, canonical unit) for a reading's unit, or None if the type does not accept it.
+
+    Unknown types keep whatever unit they were sent with.
+    """
+    spec = VITAL_TYPES.get(vital_type)
+    unit = unit.strip() if isinstance(unit, str) else ''
+    if spec is None:
+        return 1, 0, unit or None
+    key = unit.lower()
+    if not key or key == spec['unit'].lower():
+        return 1, 0, spec['unit']
+    if key in spec.get('units', {}):
+        scale, offset = spec['units'][key]
+        return scale, offset, spec['unit']
+    return None
+
+
+def parse_pair(value, fields):
+    """Numbers of a paired reading sent as "120/80", [120, 80] or {"systolic": 120, "diastolic": 80}."""
+    if isinstance(value, str):
+        match = _PAIR.match(value)
+        parts = [float(part) for part in match.groups()] if match else None
+    elif isinstance(value, (list, tuple)):
+        parts = list(value)
+    elif isinstance(value, dict):
+        parts = [value.get(field) for field in fields]
+    else:
+        parts = None
+    if not parts or len(parts) != len(fields) or not all(is_number(part) for part in parts):
+        return None
+    return parts
+
+
+def normalize_vital(vital_type, value, unit):
+    """(value, unit) in the stored form for vital_type. Raises ValueError if the reading is not valid."""
+    conversion = unit_conversion(vital_type, unit)
+    if conversion is None:
+        raise ValueError(f"unit {unit!r} is not accepted for {vital_type}")
+    scale, offset, unit = conversion
+    spec = VITAL_TYPES.get(vital_type, {})
+    fields = spec.get('fields')
+    if fields:
+        parts = parse_pair(value, fields)
+        if parts is None:
+            raise ValueError(f"{vital_type} must be sent as {'/'.join(fields)}, e.g. 120/80")
+    elif is_number(value):
+        parts = [value]
+    else:
+        raise ValueError(f"{vital_type} value must be a number")
+
+    low, high = spec.get('range', (-math.inf, math.inf))
+    if (scale, offset) != (1, 0):
+        parts = [round(part * scale + offset, 2) for part in parts]
+    if not all(low <= part <= high for part in parts):
+        raise ValueError(f"{vital_type} value outside the plausible range {low}–{high} {unit}")
+    if spec.get('integer'):
+        parts = [int(round(part)) for part in parts]
+    if fields:
+        if parts[0] <= parts[1]:
+            raise ValueError(f"{fields[0]} must be higher than {fields[1]}")
+        return dict(zip(fields, parts)), unit
+    return parts[0], unit
+
+
+def format_value(value):
+    """Display form of a stored value ("120/80" for paired readings)."""
+    if isinstance(value, dict):
+        return '/'.join(f"{part:g}" if isinstance(part, float) else str(part) for part in value.values())
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value)
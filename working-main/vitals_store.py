@@ -0,0 +1,537 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+
+from vitals_schema import VITAL_TYPES, is_number, normalize_vital
+
+BUCKET_SPAN = timedelta(hours=1)
+# A reading a minute fills 60 slots an hour; faster devices spill into extra buckets
+MAX_BUCKET_READINGS = 200
+ROLLUP_PERIODS = ('hour', 'day')
+# Touched buckets rolled up per batch; the rollup job checkpoints after each one
+ROLLUP_BATCH = 2000
+
+# Job checkpoints live beside the migration ones (see migrate_ids.py)
+CHECKPOINTS = 'migrations'
+_ROLLUP_JOB = 'rollup:vitals'
+
+
+def bucket_hour(timestamp):
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def _channels(readings):
+    """Numbers per stats path: 'stats' for plain values, 'stats.<field>' for paired ones like blood pressure."""
+    channels = defaultdict(list)
+    for reading in readings:
+        value = reading['v']
+        if isinstance(value, dict):
+            for field, part in value.items():
+                if is_number(part):
+                    channels[f"stats.{field}"].append(part)
+        elif is_number(value):
+            channels['stats'].append(value)
+    return channels
+
+
+def _bucket_update(readings, unit, now):
+    """$push/$inc/$min/$max for appending readings (dicts with t and v) to a bucket."""
+    update = {
+        '$push': {'readings': {'$each': readings, '$sort': {'t': 1}}},
+        '$inc': {'count': len(readings)},
+        '$min': {'first_t': min(r['t'] for r in readings)},
+        '$max': {'last_t': max(r['t'] for r in readings)},
+        '$set': {'unit': unit, 'updated_at': now}
+    }
+    for path, numbers in _channels(readings).items():
+        update['$inc'][f"{path}.n"] = len(numbers)
+        update['$inc'][f"{path}.sum"] = sum(numbers)
+        update['$min'][f"{path}.min"] = min(numbers)
+        update['$max'][f"{path}.max"] = max(numbers)
+    return update
+
+
+def _bucket_stats(readings):
+    """The `stats` a bucket holding exactly these readings would have."""
+    stats = {}
+    for path, numbers in _channels(readings).items():
+        summary = {'n': len(numbers), 'sum': sum(numbers), 'min': min(numbers), 'max': max(numbers)}
+        if path == 'stats':
+            stats.update(summary)
+        else:
+            stats[path.split('.', 1)[1]] = summary
+    return stats
+
+
+def _bucket_filter(patient_id, vital_type, hour, room=1):
+    return {
+        'patient_id': patient_id,
+        'type': vital_type,
+        'hour': hour,
+        # Full buckets stop matching, so the upsert opens a new one for the same hour
+        'count': {'$lte': MAX_BUCKET_READINGS - room}
+    }
+
+
+def record_vital(db, patient_id, vital_type, value, unit, timestamp=None):
+    """Append one reading to its (patient, type, hour) bucket and refresh the patient's latest value.
+
+    The value is checked and converted to its stored form first (see vitals_schema.py);
+    raises ValueError if it is not valid.
+    """
+    value, unit = normalize_vital(vital_type, value, unit)
+    timestamp = timestamp or datetime.utcnow()
+    result = db.vitals_buckets.update_one(
+        _bucket_filter(patient_id, vital_type, bucket_hour(timestamp)),
+        _bucket_update([{'t': timestamp, 'v': value}], unit, datetime.utcnow()),
+        upsert=True
+    )
+    update_latest(db, patient_id, vital_type, value, unit, timestamp)
+    return result
+
+
+def _latest_update(patient_id, vital_type, value, unit, timestamp):
+    # Only matches when the stored reading is not newer. Otherwise the upsert
+    # collides with the unique (patient_id, type) index and changes nothing.
+    return (
+        {'patient_id': patient_id, 'type': vital_type, 'timestamp': {'$lte': timestamp}},
+        {'$set': {'value': value, 'unit': unit, 'timestamp': timestamp}}
+    )
+
+
+def update_latest(db, patient_id, vital_type, value, unit, timestamp):
+    """Make this reading the patient's latest of its type in `patient_vitals_latest`, unless a newer one is there."""
+    try:
+        db.patient_vitals_latest.update_one(*_latest_update(patient_id, vital_type, value, unit, timestamp), upsert=True)
+    except DuplicateKeyError:
+        pass
+
+
+def rebuild_latest(db, batch_size=1000):
+    """Recompute `patient_vitals_latest` from the buckets with unordered bulk upserts. Returns how many were written."""
+    pipeline = [
+        # (patient_id, last_t) index order, so the first bucket per type holds its newest reading
+        {'$sort': {'patient_id': 1, 'last_t': -1}},
+        {'$group': {
+            '_id': {'patient_id': '$patient_id', 'type': '$type'},
+            'unit': {'$first': '$unit'},
+            'reading': {'$first': {'$arrayElemAt': ['$readings', -1]}}
+        }}
+    ]
+    written = 0
+    batch = []
+    for doc in db.vitals_buckets.aggregate(pipeline, allowDiskUse=True):
+        key = doc['_id']
+        reading = doc['reading']
+        batch.append(UpdateOne(*_latest_update(key['patient_id'], key['type'], reading['v'], doc['unit'], reading['t']), upsert=True))
+        if len(batch) >= batch_size:
+            written += _flush_latest(db, batch)
+            batch = []
+    if batch:
+        written += _flush_latest(db, batch)
+    return written
+
+
+def _flush_latest(db, batch):
+    try:
+        result = db.patient_vitals_latest.bulk_write(batch, ordered=False)
+        return result.upserted_count + result.modified_count
+    except BulkWriteError as e:
+        # Duplicate keys mean a newer live reading is already stored; anything else is real
+        if any(error['code'] != 11000 for error in e.details['writeErrors']):
+            raise
+        return e.details['nUpserted'] + e.details['nModified']
+
+
+def bucket_ops(rows, now=None, sources=None):
+    """Bucket upserts for (patient_id, type, timestamp, value, unit) rows, grouped per bucket.
+
+    sources, if given, holds each row's source document _id, stored on its reading as `src`.
+    Returns (ops, members) where members[i] lists the row indices written by ops[i].
+    """
+    now = now or datetime.utcnow()
+    groups = defaultdict(list)
+    for i, (patient_id, vital_type, timestamp, _, _) in enumerate(rows):
+        groups[(patient_id, vital_type, bucket_hour(timestamp))].append(i)
+
+    ops, members = [], []
+    for (patient_id, vital_type, hour), indices in groups.items():
+        for start in range(0, len(indices), MAX_BUCKET_READINGS):
+            chunk = indices[start:start + MAX_BUCKET_READINGS]
+            readings = [{'t': rows[i][2], 'v': rows[i][3]} for i in chunk]
+            if sources is not None:
+                for reading, i in zip(readings, chunk):
+                    reading['src'] = sources[i]
+            ops.append(UpdateOne(
+                _bucket_filter(patient_id, vital_type, hour, room=len(chunk)),
+                _bucket_update(readings, rows[chunk[-1]][4], now),
+                upsert=True
+            ))
+            members.append(chunk)
+    return ops, members
+
+
+def write_readings(db, rows, batch_size=500):
+    """Write many (patient_id, type, timestamp, value, unit) rows and refresh the latest values.
+
+    Bucket upserts go out as unordered bulk writes of at most batch_size operations,
+    each acknowledged before the next is sent. Returns {row index: error} for rows
+    that were not written.
+    """
+    ops, members = bucket_ops(rows)
+    failed = {}
+    for start in range(0, len(ops), batch_size):
+        try:
+            db.vitals_buckets.bulk_write(ops[start:start + batch_size], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details['writeErrors']:
+                for i in members[start + error['index']]:
+                    failed[i] = error.get('errmsg', 'write failed')
+        except PyMongoError as e:
+            # Not a per-document failure: the rest would fail the same way
+            for chunk in members[start:]:
+                for i in chunk:
+                    failed[i] = str(e)
+            break
+
+    newest = {}
+    for i, (patient_id, vital_type, timestamp, _, _) in enumerate(rows):
+        key = (patient_id, vital_type)
+        if i not in failed and (key not in newest or timestamp > rows[newest[key]][2]):
+            newest[key] = i
+    latest = [
+        UpdateOne(*_latest_update(rows[i][0], rows[i][1], rows[i][3], rows[i][4], rows[i][2]), upsert=True)
+        for i in newest.values()
+    ]
+    try:
+        for start in range(0, len(latest), batch_size):
+            _flush_latest(db, latest[start:start + batch_size])
+    except PyMongoError as e:
+        # The readings are stored; `flask vitals rebuild-latest` recovers the summary
+        print(f"⚠️ Latest vitals not updated: {e}")
+    return failed
+
+
+def _merge_numbers(parts):
+    n = sum(part.get('n', 0) for part in parts)
+    total = sum(part.get('sum', 0) for part in parts)
+    lows = [part['min'] for part in parts if part.get('min') is not None]
+    highs = [part['max'] for part in parts if part.get('max') is not None]
+    return {
+        'n': n,
+        'sum': total,
+        'min': min(lows) if lows else None,
+        'max': max(highs) if highs else None,
+        'mean': total / n if n else None
+    }
+
+
+def _merge_stats(docs):
+    """Reading count plus n/sum/min/max/mean, per field for paired types, over buckets or rollups."""
+    plain, fields = [], defaultdict(list)
+    for doc in docs:
+        # Buckets keep their numbers under `stats`; rollups are flat
+        stats = doc.get('stats', doc)
+        if 'n' in stats:
+            plain.append(stats)
+        for field, part in stats.items():
+            if isinstance(part, dict) and 'n' in part:
+                fields[field].append(part)
+    merged = {'count': sum(doc.get('count', 0) for doc in docs)}
+    if plain:
+        merged.update(_merge_numbers(plain))
+    for field, parts in fields.items():
+        merged[field] = _merge_numbers(parts)
+    return merged
+
+
+def _rollup_op(patient_id, vital_type, period, start, docs, now):
+    return UpdateOne(
+        {'patient_id': patient_id, 'type': vital_type, 'period': period, 'start': start},
+        {'$set': dict(_merge_stats(docs), unit=docs[-1].get('unit'), updated_at=now)},
+        upsert=True
+    )
+
+
+def rollup_vitals(db, since, now=None, after_id=None, batch_size=ROLLUP_BATCH, on_batch=None):
+    """Recompute hourly and daily rollups touched by buckets written since `since` (and before `now`).
+
+    Touched buckets are read in (updated_at, _id) order, batch_size at a time, so a
+    backlog of any size is handled in bounded memory. after_id resumes after that
+    bucket among those updated exactly at `since`; on_batch(updated_at, _id) is called
+    once each batch is written. Rollups are rebuilt from their source rather than
+    incremented, so re-running over the same window is harmless. Returns (hours, days) rewritten.
+    """
+    now = now or datetime.utcnow()
+    hours = days = 0
+    while True:
+        if after_id is None:
+            query = {'updated_at': {'$gte': since, '$lt': now}}
+        else:
+            query = {'$or': [
+                {'updated_at': {'$gt': since, '$lt': now}},
+                {'updated_at': since, '_id': {'$gt': after_id}}
+            ]}
+        batch = list(db.vitals_buckets.find(
+            query, {'patient_id': 1, 'type': 1, 'hour': 1, 'updated_at': 1}
+        ).sort([('updated_at', 1), ('_id', 1)]).limit(batch_size))
+        if not batch:
+            break
+        written = _rollup_keys(db, {(b['patient_id'], b['type'], b['hour']) for b in batch}, now)
+        hours += written[0]
+        days += written[1]
+        since, after_id = batch[-1]['updated_at'], batch[-1]['_id']
+        if on_batch:
+            on_batch(since, after_id)
+        if len(batch) < batch_size:
+            break
+    return hours, days
+
+
+def _rollup_keys(db, keys, now):
+    # Sibling buckets of the same hour were not necessarily touched, so read them all
+    buckets = defaultdict(list)
+    for bucket in db.vitals_buckets.find(
+        {'patient_id': {'$in': list({k[0] for k in keys})}, 'hour': {'$in': list({k[2] for k in keys})}},
+        {'readings': 0}
+    ).sort('last_t', 1):
+        key = (bucket['patient_id'], bucket['type'], bucket['hour'])
+        if key in keys:
+            buckets[key].append(bucket)
+    hourly = [_rollup_op(*key[:2], 'hour', key[2], docs, now) for key, docs in buckets.items()]
+    if hourly:
+        db.vitals_rollups.bulk_write(hourly, ordered=False)
+
+    days = {(pid, vital_type, bucket_hour(hour).replace(hour=0)) for pid, vital_type, hour in buckets}
+    daily = []
+    for pid, vital_type, day in days:
+        hours = list(db.vitals_rollups.find(
+            {'patient_id': pid, 'type': vital_type, 'period': 'hour',
+             'start': {'$gte': day, '$lt': day + timedelta(days=1)}}
+        ).sort('start', 1))
+        if hours:
+            daily.append(_rollup_op(pid, vital_type, 'day', day, hours, now))
+    if daily:
+        db.vitals_rollups.bulk_write(daily, ordered=False)
+    return len(hourly), len(daily)
+
+
+def rollup_series(db, patient_id, vital_type, period, start, end):
+    """Rollup documents of one period in [start, end), oldest first."""
+    return list(db.vitals_rollups.find(
+        {'patient_id': patient_id, 'type': vital_type, 'period': period,
+         'start': {'$gte': start, '$lt': end}},
+        {'_id': 0, 'patient_id': 0, 'type': 0, 'period': 0, 'updated_at': 0}
+    ).sort('start', 1))
+
+
+class VitalsRollup:
+    """Keeps `vitals_rollups` current from a background thread.
+
+    Each pass takes a lease on the job's checkpoint document, so with several app
+    workers only one of them does the work, then rolls up every bucket written
+    since the previous pass. Long passes (the first one after a migration) save
+    their position and renew the lease after every batch; a pass cut short is
+    resumed from there by whichever worker runs next.
+    """
+
+    def __init__(self, db, interval=300.0, overlap=60.0, batch_size=ROLLUP_BATCH):
+        self.db = db
+        self.interval = interval
+        self.batch_size = batch_size
+        # Writes landing while a pass runs are caught by the next one
+        self.overlap = timedelta(seconds=overlap)
+        self.counters = {'passes': 0, 'hours': 0, 'days': 0, 'failed': 0}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Run passes every `interval`; called once per worker at boot, whatever path the readings arrive by."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='vitals-rollup', daemon=True)
+                self._thread.start()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, running=bool(self._thread and self._thread.is_alive()))
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except PyMongoError as e:
+                with self._lock:
+                    self.counters['failed'] += 1
+                print(f"[VitalsRollup] pass failed: {e}")
+            time.sleep(self.interval)
+
+    def _acquire(self, now):
+        try:
+            return self.db[CHECKPOINTS].find_one_and_update(
+                {'_id': _ROLLUP_JOB, '$or': [{'lease_until': {'$exists': False}}, {'lease_until': {'$lte': now}}]},
+                {'$set': {'lease_until': now + timedelta(seconds=self.interval)}},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            ) or {}
+        except DuplicateKeyError:
+            # Another worker holds the lease
+            return None
+
+    def run_once(self, now=None):
+        """One rollup pass. Returns (hours, days) rewritten, or None if another worker holds the lease."""
+        now = now or datetime.utcnow()
+        job = self._acquire(now)
+        if job is None:
+            return None
+        if job.get('cursor'):
+            since, after_id = job['cursor']
+        else:
+            since, after_id = job.get('last_run', datetime(1970, 1, 1)) - self.overlap, None
+
+        def checkpoint(updated_at, bucket_id):
+            self.db[CHECKPOINTS].update_one(
+                {'_id': _ROLLUP_JOB},
+                {'$set': {'cursor': [updated_at, bucket_id],
+                          'lease_until': datetime.utcnow() + timedelta(seconds=self.interval)}}
+            )
+
+        hours, days = rollup_vitals(self.db, since, now, after_id, self.batch_size, checkpoint)
+        self.db[CHECKPOINTS].update_one(
+            {'_id': _ROLLUP_JOB},
+            {'$set': {'last_run': now, 'lease_until': now}, '$unset': {'cursor': ''}}
+        )
+        with self._lock:
+            self.counters['passes'] += 1
+            self.counters['hours'] += hours
+            self.counters['days'] += days
+        return hours, days
+
+
+def migrate_vitals(db, batch_size=1000, resume=True):
+    """Copy one-document-per-reading `vitals` into `vitals_buckets`.
+
+    Readings are streamed in _id order and grouped per bucket, so a batch becomes
+    a few upserts rather than one write per reading. Each copied reading keeps its
+    source _id as `src`, and readings already in a bucket are skipped, so a run
+    resumed after an interrupted batch, or restarted, never appends one twice.
+    The last _id is checkpointed after each batch.
+    """
+    checkpoint_id = 'buckets:vitals'
+    query = {}
+    if resume:
+        checkpoint = db[CHECKPOINTS].find_one({'_id': checkpoint_id})
+        if checkpoint and checkpoint.get('last_id') is not None:
+            query['_id'] = {'$gt': checkpoint['last_id']}
+
+    copied = 0
+    batch = []
+    for doc in db.vitals.find(query).sort('_id', 1).batch_size(batch_size):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            copied += _copy_batch(db, checkpoint_id, batch)
+            batch = []
+    if batch:
+        copied += _copy_batch(db, checkpoint_id, batch)
+
+    db[CHECKPOINTS].update_one({'_id': checkpoint_id}, {'$set': {'completed_at': datetime.utcnow()}}, upsert=True)
+    return copied
+
+
+def _copy_batch(db, checkpoint_id, batch):
+    # Bucket writes are atomic per bucket, so a source is either fully copied or not at all
+    ids = [doc['_id'] for doc in batch]
+    copied = {
+        reading.get('src')
+        for bucket in db.vitals_buckets.find({'readings.src': {'$in': ids, '$exists': True}}, {'readings.src': 1})
+        for reading in bucket['readings']
+    }
+    rows, sources = [], []
+    for doc in batch:
+        if doc['_id'] in copied:
+            continue
+        timestamp = doc.get('timestamp') or doc['_id'].generation_time.replace(tzinfo=None)
+        patient_id = doc.get('patient_id')
+        value, unit = _normalized_or_raw(doc.get('type'), doc.get('value'), doc.get('unit'))
+        rows.append((str(patient_id) if patient_id is not None else None, doc.get('type'), timestamp, value, unit))
+        sources.append(doc['_id'])
+    if rows:
+        ops, _ = bucket_ops(rows, sources=sources)
+        db.vitals_buckets.bulk_write(ops, ordered=False)
+    db[CHECKPOINTS].update_one(
+        {'_id': checkpoint_id},
+        {'$set': {'last_id': batch[-1]['_id'], 'updated_at': datetime.utcnow()}},
+        upsert=True
+    )
+    return len(rows)
+
+
+def _normalized_or_raw(vital_type, value, unit):
+    # Old data that does not parse is kept as it was rather than dropped
+    try:
+        return normalize_vital(vital_type, value, unit)
+    except ValueError:
+        return value, unit
+
+
+def _untyped_filter(value_path):
+    """Documents whose value predates the typed schema: strings, or a known type in another unit."""
+    return {'$or': [{value_path: {'$type': 'string'}}] + [
+        {'type': vital_type, 'unit': {'$ne': spec['unit']}} for vital_type, spec in VITAL_TYPES.items()
+    ]}
+
+
+def migrate_values(db, batch_size=500):
+    """Convert stored readings to the typed schema, e.g. '120/80' to {'systolic': 120, 'diastolic': 80}.
+
+    Buckets and latest values are rewritten with unordered bulk writes. Each write
+    matches the count or timestamp that was read, so a document that received a new
+    reading meanwhile is left for the next run. Values that do not parse stay as they
+    are. Safe to re-run. Returns counts of rewritten buckets, latest values and
+    unparsed readings.
+    """
+    now = datetime.utcnow()
+    summary = {'buckets': 0, 'latest': 0, 'unparsed': 0}
+
+    ops = []
+    for bucket in db.vitals_buckets.find(_untyped_filter('readings.v')).batch_size(batch_size):
+        readings = []
+        unit = bucket.get('unit')
+        for reading in bucket['readings']:
+            value, new_unit = _normalized_or_raw(bucket['type'], reading['v'], bucket.get('unit'))
+            if isinstance(value, str):
+                summary['unparsed'] += 1
+            else:
+                unit = new_unit
+            readings.append(dict(reading, v=value))
+        ops.append(UpdateOne(
+            {'_id': bucket['_id'], 'count': bucket['count']},
+            # updated_at makes the next rollup pass recompute this hour
+            {'$set': {'readings': readings, 'unit': unit, 'stats': _bucket_stats(readings), 'updated_at': now}}
+        ))
+        if len(ops) >= batch_size:
+            summary['buckets'] += db.vitals_buckets.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        summary['buckets'] += db.vitals_buckets.bulk_write(ops, ordered=False).modified_count
+
+    ops = []
+    for latest in db.patient_vitals_latest.find(_untyped_filter('value')).batch_size(batch_size):
+        value, unit = _normalized_or_raw(latest['type'], latest['value'], latest.get('unit'))
+        if isinstance(value, str):
+            summary['unparsed'] += 1
+            continue
+        ops.append(UpdateOne(
+            {'_id': latest['_id'], 'timestamp': latest['timestamp']},
+            {'$set': {'value': value, 'unit': unit}}
+        ))
+        if len(ops) >= batch_size:
+            summary['latest'] += db.patient_vitals_latest.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        summary['latest'] += db.patient_vitals_latest.bulk_write(ops, ordered=False).modified_count
+    return summary
@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from vitals_schema import VITAL_TYPES
+
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+
+
+def parse_time(value):
+    """Naive UTC datetime from an ISO 8601 string; offsets (and Z) are converted. Raises ValueError."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def lttb(x, y, threshold):
+    """Indices of at most `threshold` points picked by Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept. The points between them are split into
+    threshold - 2 equal buckets. From each bucket LTTB keeps the point that makes
+    the largest triangle with the previously kept point and the average of the
+    next bucket. Peaks and dips survive, which a plain stride would skip over.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n) if threshold >= n else np.array([0, n - 1])[:threshold]
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        px, py = x[previous], y[previous]
+        areas = np.abs((px - avg_x) * (y[start:end] - py) - (px - x[start:end]) * (avg_y - py))
+        previous = start + int(areas.argmax())
+        kept[i + 1] = previous
+    return kept
+
+
+def trend(db, patient_id, vital_type, start, end, points=DEFAULT_POINTS):
+    """Readings of one type in [start, end), downsampled to at most `points`, as columns.
+
+    One cursor over the hourly buckets, projected to their readings, fills NumPy
+    arrays; masking, ordering and LTTB run on those. Returns {'t': [epoch ms...],
+    'v': [...]} for plain types, or one column per field (e.g. 'systolic',
+    'diastolic') for paired ones, which are downsampled on the first field.
+    """
+    spec = VITAL_TYPES.get(vital_type, {})
+    fields = spec.get('fields')
+    cursor = db.vitals_buckets.find(
+        {'patient_id': patient_id, 'type': vital_type,
+         'hour': {'$gte': start.replace(minute=0, second=0, microsecond=0), '$lt': end}},
+        {'_id': 0, 'readings': 1, 'unit': 1}
+    ).sort('hour', 1)
+
+    stamps, values, unit = [], [], spec.get('unit')
+    for bucket in cursor:
+        unit = bucket.get('unit') or unit
+        for reading in bucket['readings']:
+            stamps.append(reading['t'])
+            values.append(reading['v'])
+
+    t = np.array(stamps, dtype='datetime64[ms]').astype(np.int64)
+    columns = fields or ('v',)
+    if fields:
+        data = np.array([
+            [value.get(field, np.nan) for field in fields] if isinstance(value, dict) else [np.nan] * len(fields)
+            for value in values
+        ], dtype=float).reshape(-1, len(fields))
+    else:
+        data = np.array([
+            value if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+            for value in values
+        ], dtype=float).reshape(-1, 1)
+
+    start_ms = np.datetime64(start, 'ms').astype(np.int64)
+    end_ms = np.datetime64(end, 'ms').astype(np.int64)
+    # Bucket spill-overs can interleave, and values that never parsed are skipped
+    keep = (t >= start_ms) & (t < end_ms) & np.isfinite(data).all(axis=1)
+    t, data = t[keep], data[keep]
+    order = np.argsort(t, kind='stable')
+    t, data = t[order], data[order]
+
+    picked = lttb(t.astype(float), data[:, 0], points)
+    result = {'unit': unit, 'count': int(len(t)), 't': t[picked].tolist()}
+    for i, column in enumerate(columns):
+        series = data[picked, i]
+        result[column] = series.astype(np.int64).tolist() if spec.get('integer') else series.tolist()
+    return result
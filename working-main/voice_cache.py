@@ -0,0 +1,75 @@
+import re
+import threading
+import time
+import unicodedata
+
+from cache import LRUTTLCache, SingleFlight
+
+# Replies for these actions change data or the session, so they are always answered fresh
+SIDE_EFFECT_ACTIONS = {'ADD_REMINDER', 'TRIGGER_SOS', 'LOGOUT'}
+
+_PUNCTUATION = re.compile(r'[\s.,!?;:।॥"\'“”‘’]+')
+
+
+def normalize_utterance(text):
+    """'  Go Home! ' and 'go home' share a cache entry; NFC folds Devanagari nukta variants."""
+    text = unicodedata.normalize('NFC', text).lower()
+    return _PUNCTUATION.sub(' ', text).strip()
+
+
+class VoiceResponseCache:
+    """LRU+TTL cache of {reply, action} answers keyed by (normalised text, role, language).
+
+    Identical requests arriving while one is already asking the model wait for that answer
+    instead of issuing their own call.
+    """
+
+    def __init__(self, maxsize=2048, ttl=3600.0):
+        self._cache = LRUTTLCache(maxsize=maxsize, ttl=ttl)
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self.coalesced = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def key(text, role, lang_name):
+        return (normalize_utterance(text), role, lang_name)
+
+    def get(self, key):
+        """Cached {reply, action} for key, or None."""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        result, cost = entry
+        with self._lock:
+            self.saved_seconds += cost
+        return dict(result)
+
+    def put(self, key, result, cost):
+        """Store an answer that took `cost` seconds to produce, unless its action has side effects."""
+        if result.get('action') in SIDE_EFFECT_ACTIONS:
+            return
+        self._cache.set(key, ({'reply': result.get('reply'), 'action': result.get('action')}, cost))
+
+    def get_or_compute(self, key, compute):
+        """Return a cached answer or compute one. `compute()` returns (result, cacheable)."""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        def run():
+            started = time.monotonic()
+            result, cacheable = compute()
+            if cacheable:
+                self.put(key, result, time.monotonic() - started)
+            return result
+
+        result, shared = self._flight.do(key, run)
+        if shared:
+            with self._lock:
+                self.coalesced += 1
+        return dict(result)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._cache.stats(), coalesced=self.coalesced, saved_seconds=round(self.saved_seconds, 3))
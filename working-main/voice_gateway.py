@@ -0,0 +1,289 @@
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+
+class LLMUnavailable(Exception):
+    """Raised when the model call is skipped or fails; callers answer with the keyword fallback."""
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and stays open for `reset_timeout` seconds.
+
+    After that a single trial call is let through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self.trips = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    self.trips += 1
+                self._opened_at = self._clock()
+
+    def release_trial(self):
+        """Give back a half-open trial that ended with no outcome (e.g. the caller stopped reading)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class LatencyStats:
+    """Outcome counters plus a rolling window of call latencies (seconds)."""
+
+    def __init__(self, window=500):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.counts = {'ok': 0, 'slow': 0, 'error': 0, 'timeout': 0, 'rejected': 0, 'circuit_open': 0, 'abandoned': 0}
+
+    def record(self, outcome, latency=None):
+        with self._lock:
+            self.counts[outcome] += 1
+            if latency is not None:
+                self._samples.append(latency)
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            counts = dict(self.counts)
+
+        def pct(p):
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1)
+
+        return dict(counts, p50_ms=pct(0.50), p95_ms=pct(0.95), p99_ms=pct(0.99), samples=len(samples))
+
+
+class LLMGateway:
+    """Runs model calls on a small bounded pool with a hard deadline and a circuit breaker.
+
+    The request thread only ever waits `timeout` seconds. When every pool slot is busy
+    (e.g. calls stuck on a slow upstream) new calls are rejected instead of queued,
+    so a degraded model cannot tie up the web workers.
+    """
+
+    def __init__(self, model, max_concurrency=4, timeout=8.0, slow_threshold=5.0, breaker=None):
+        self.model = model
+        self.timeout = timeout
+        self.slow_threshold = slow_threshold
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = LatencyStats()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='llm')
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    @property
+    def available(self):
+        return self.model is not None
+
+    def generate(self, prompt):
+        if self.model is None:
+            raise LLMUnavailable('no model configured')
+        if not self.breaker.allow():
+            self.stats.record('circuit_open')
+            raise LLMUnavailable('circuit open')
+        if not self._slots.acquire(blocking=False):
+            self.stats.record('rejected')
+            # A saturated pool means the upstream is backing up; count it against the breaker
+            self.breaker.record_failure()
+            raise LLMUnavailable('all model slots busy')
+
+        started = time.monotonic()
+        future = self._executor.submit(self._call, prompt)
+        try:
+            text = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            self.stats.record('timeout', time.monotonic() - started)
+            self.breaker.record_failure()
+            raise LLMUnavailable(f'model did not answer within {self.timeout}s')
+        except Exception as e:
+            self.stats.record('error', time.monotonic() - started)
+            self.breaker.record_failure()
+            raise LLMUnavailable(str(e)) from e
+
+        latency = time.monotonic() - started
+        if latency > self.slow_threshold:
+            # Slow answers are still used, but count towards tripping the breaker
+            self.stats.record('slow', latency)
+            self.breaker.record_failure()
+        else:
+            self.stats.record('ok', latency)
+            self.breaker.record_success()
+        return text
+
+    def stream(self, prompt):
+        """Yield reply text chunks as the model produces them.
+
+        Same admission rules as generate(); the deadline covers the whole stream.
+        Raises LLMUnavailable if the model fails or stalls, possibly after some chunks.
+        """
+        if self.model is None:
+            raise LLMUnavailable('no model configured')
+        if not self.breaker.allow():
+            self.stats.record('circuit_open')
+            raise LLMUnavailable('circuit open')
+        if not self._slots.acquire(blocking=False):
+            self.stats.record('rejected')
+            self.breaker.record_failure()
+            raise LLMUnavailable('all model slots busy')
+
+        started = time.monotonic()
+        chunks = queue.Queue()
+        self._executor.submit(self._stream_call, prompt, chunks)
+        deadline = started + self.timeout
+        kind, recorded = None, False
+        try:
+            while True:
+                try:
+                    kind, payload = chunks.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    recorded = True
+                    self.stats.record('timeout', time.monotonic() - started)
+                    self.breaker.record_failure()
+                    raise LLMUnavailable(f'model stream did not finish within {self.timeout}s')
+                if kind == 'chunk':
+                    yield payload
+                elif kind == 'error':
+                    recorded = True
+                    self.stats.record('error', time.monotonic() - started)
+                    self.breaker.record_failure()
+                    raise LLMUnavailable(str(payload)) from payload
+                else:
+                    break
+        finally:
+            if not recorded and kind != 'done':
+                # Closed early (client went away, or the caller raised): no verdict on the model,
+                # but a half-open trial must not stay claimed or the circuit never closes again
+                self.stats.record('abandoned', time.monotonic() - started)
+                self.breaker.release_trial()
+
+        latency = time.monotonic() - started
+        if latency > self.slow_threshold:
+            self.stats.record('slow', latency)
+            self.breaker.record_failure()
+        else:
+            self.stats.record('ok', latency)
+            self.breaker.record_success()
+
+    def _stream_call(self, prompt, chunks):
+        try:
+            response = self.model.generate_content(prompt, stream=True, request_options={'timeout': self.timeout})
+            for chunk in response:
+                text = chunk.text
+                if text:
+                    chunks.put(('chunk', text))
+            chunks.put(('done', None))
+        except Exception as e:
+            chunks.put(('error', e))
+        finally:
+            self._slots.release()
+
+    def _call(self, prompt):
+        try:
+            return self.model.generate_content(prompt, request_options={'timeout': self.timeout}).text
+        finally:
+            # The slot is held until the upstream call really finishes, even after the caller gave up
+            self._slots.release()
+
+    def snapshot(self):
+        return dict(self.stats.snapshot(), circuit=self.breaker.state, trips=self.breaker.trips)
+
+
+_ACTION_LINE = re.compile(r'^\s*ACTION\s*[:=]\s*([A-Za-z_]+)', re.IGNORECASE)
+_SENTENCE_END = re.compile(r'(?<=[.!?।])\s+')
+
+
+class ReplyStreamParser:
+    """Turns streamed "ACTION: <name>\\n<reply>" text into ('action', name) and ('sentence', text) events."""
+
+    def __init__(self):
+        self.action = None
+        self.reply = ''
+        self._action_seen = False
+        self._buffer = ''
+
+    def feed(self, text):
+        self._buffer += text
+        events = []
+        if not self._action_seen:
+            if '\n' not in self._buffer:
+                return events
+            first, self._buffer = self._buffer.split('\n', 1)
+            events.append(self._take_action(first))
+        # Everything up to the last sentence boundary is complete and can be spoken
+        parts = _SENTENCE_END.split(self._buffer)
+        self._buffer = parts.pop()
+        events.extend(self._sentence(p) for p in parts if p.strip())
+        return events
+
+    def finish(self):
+        events = []
+        if not self._action_seen:
+            # The model skipped the action line; treat it all as the reply
+            match = _ACTION_LINE.match(self._buffer)
+            if match:
+                events.append(self._take_action(self._buffer))
+                self._buffer = ''
+            else:
+                self._action_seen = True
+                events.append(('action', None))
+        if self._buffer.strip():
+            events.append(self._sentence(self._buffer))
+        self._buffer = ''
+        return events
+
+    def _take_action(self, line):
+        self._action_seen = True
+        match = _ACTION_LINE.match(line)
+        if match and match.group(1).lower() not in ('null', 'none'):
+            self.action = match.group(1).upper()
+        elif not match and line.strip():
+            # No action line at all: the first line is already part of the reply
+            self._buffer = line + '\n' + self._buffer
+        return ('action', self.action)
+
+    def _sentence(self, text):
+        text = text.strip()
+        self.reply = f"{self.reply} {text}".strip()
+        return ('sentence', text)
@@ -0,0 +1,175 @@
+"""Keyword intent matcher used when Gemini is not available (and to spot ADD_REMINDER up front).
+
+Everything is compiled once at import: one combined regex per role and one reply table per
+language. Matching keeps the original priority order: SOS first, then the shared navigation
+intents, then the role-specific ones, with ADD_REMINDER checked last.
+"""
+import re
+
+REPLIES_BY_ACTION = {
+    'TRIGGER_SOS': {
+        'English': 'Sending SOS to your guardian now!',
+        'Hindi': 'आपके अभिभावक को आपातकालीन संदेश भेजा जा रहा है!',
+        'Marathi': 'तुमच्या पालकांना आणीबाणीचा संदेश पाठवला जात आहे!'
+    },
+    'LOGOUT': {
+        'English': 'Logging you out.',
+        'Hindi': 'आपको लॉग आउट किया जा रहा है।',
+        'Marathi': 'तुम्हाला लॉग आउट केले जात आहे.'
+    },
+    'NAVIGATE_NOTIFICATIONS': {
+        'English': 'Opening Notifications.',
+        'Hindi': 'सूचनाएं खोली जा रही हैं।',
+        'Marathi': 'सूचना उघडत आहे.'
+    },
+    'NAVIGATE_CONNECTIONS': {
+        'English': 'Going to Connections.',
+        'Hindi': 'कनेक्शन पर जाया जा रहा है।',
+        'Marathi': 'कनेक्शनवर जात आहे.'
+    },
+    'PRINT_REPORT': {
+        'English': 'Printing the medical report now.',
+        'Hindi': 'मेडिकल रिपोर्ट प्रिंट की जा रही है।',
+        'Marathi': 'वैद्यकीय अहवाल मुद्रित करत आहे.'
+    },
+    'OPEN_SETTINGS': {
+        'English': 'Opening settings.',
+        'Hindi': 'सेटिंग्स खोली जा रही हैं।',
+        'Marathi': 'सेटिंग्ज उघडत आहे.'
+    },
+    'NAVIGATE_DAILY_UPDATES': {
+        'English': 'Opening Daily Updates.',
+        'Hindi': 'दैनिक अपडेट खोले जा रहे हैं।',
+        'Marathi': 'दैनिक अद्यतने उघडत आहे.'
+    },
+    'NAVIGATE_PATIENT_PROFILE': {
+        'English': 'Opening Patient Profile.',
+        'Hindi': 'रोगी प्रोफ़ाइल खोली जा रही है।',
+        'Marathi': 'रुग्ण प्रोफाइल उघडत आहे.'
+    },
+    'NAVIGATE_PREFERENCES': {
+        'English': 'Opening Preferences.',
+        'Hindi': 'प्राथमिकताएं खोली जा रही हैं।',
+        'Marathi': 'प्राधान्ये उघडत आहे.'
+    },
+    'NAVIGATE_GUARDIAN_HOME': {
+        'English': 'Taking you to the Guardian Dashboard.',
+        'Hindi': 'आपको अभिभावक डैशबोर्ड पर ले जाया जा रहा है।',
+        'Marathi': 'तुम्हाला पालक डॅशबोर्डवर नेत आहे.'
+    },
+    'NAVIGATE_MEDICINE': {
+        'English': 'Opening your medicines.',
+        'Hindi': 'आपकी दवाइयां खोली जा रही हैं।',
+        'Marathi': 'तुमची औषधे उघडत आहे.'
+    },
+    'NAVIGATE_PROFILE': {
+        'English': 'Opening your profile.',
+        'Hindi': 'आपकी प्रोफ़ाइल खोली जा रही है।',
+        'Marathi': 'तुमचे प्रोफाइल उघडत आहे.'
+    },
+    'NAVIGATE_HOME': {
+        'English': 'Taking you home.',
+        'Hindi': 'आपको घर ले जाया जा रहा है।',
+        'Marathi': 'तुम्हाला घरी नेत आहे.'
+    },
+    'DEFAULT': {
+        'English': "I'm here! Try: go home, medicines, my profile, or notifications.",
+        'Hindi': "मैं यहाँ हूँ! प्रयास करें: घर जाएं, दवाइयां, मेरी प्रोफ़ाइल, या सूचनाएं।",
+        'Marathi': "मी इथे आहे! प्रयत्न करा: घरी जा, औषधे, माझे प्रोफाइल, किंवा सूचना."
+    },
+    'ADD_REMINDER': {
+        'English': "I've added the reminder to your daily tasks!",
+        'Hindi': "मैंने आपके दैनिक कार्यों में रिमाइंडर जोड़ दिया है!",
+        'Marathi': "मी तुमच्या दैनंदिन कामांमध्ये रिमाइंडर जोडले आहे!"
+    }
+}
+
+# Per-language reply tables with English filled in for anything not translated
+REPLIES = {
+    lang: {action: msgs.get(lang, msgs['English']) for action, msgs in REPLIES_BY_ACTION.items()}
+    for lang in {lang for msgs in REPLIES_BY_ACTION.values() for lang in msgs}
+}
+
+# SOS words are matched as whole words so greetings do not set off an alarm
+_SOS_WORDS = ('sos|emergency|help|danger|alarm|bachao|madad|sahayta|बचाओ|मदद|वाचवा|संकट|एसओएस|એસઓએસ|બચાવો|મદદ|સંકટ|'
+              'বাঁচাও|সাহায্য|உதவி|காப்பாற்றுங்கள்|సహాయం|కాపాడండి|ಸಹಾಯ|ಕಾಪಾಡಿ|സഹായിക്കൂ|രക്ഷിക്കൂ')
+_SOS_RE = re.compile(rf'\b({_SOS_WORDS})\b|এস ও এস|एस ओ एस')
+
+# The Marathi welcome greeting mentions SOS and help; it must not trigger an alert when echoed back
+_MARATHI_GREETING = "मी तुम्हाला ॲप नेव्हिगेट करण्यात, औषधे पाहण्यात आणि आपत्कालीन sos मध्ये मदत करू शकतो"
+
+# (action, confidence, substrings) in priority order
+_COMMON_INTENTS = [
+    ('LOGOUT', .9, ['logout', 'log out', 'sign out', 'bahar', 'niklo', 'लॉग आउट', 'लॉगआउट', 'बाहेर']),
+    ('NAVIGATE_NOTIFICATIONS', .9, ['notif', 'alert', 'reminder', 'suchna', 'suchnaye', 'सूचना', 'अलर्ट']),
+    ('NAVIGATE_CONNECTIONS', .9, ['connect', 'volunteer', 'unity', 'ngo', 'community', 'jodo', 'sampark', 'क्नेक्ट', 'स्वयंसेवक', 'जोड़ो', 'जोडा']),
+]
+
+_GUARDIAN_INTENTS = _COMMON_INTENTS + [
+    ('PRINT_REPORT', .9, ['print', 'report', 'medical', 'chhapo', 'report dekhao', 'प्रिंट', 'रिपोर्ट', 'छापा']),
+    ('OPEN_SETTINGS', .9, ['setting', 'dark', 'mode', 'preference', 'vyavastha', 'सेटिंग', 'व्यवस्था']),
+    ('NAVIGATE_DAILY_UPDATES', .9, ['vital', 'update', 'daily', 'blood', 'heart', 'pressure', 'sugar', 'dhadkan', 'khoon', 'विटल्स', 'रक्तचाप', 'अद्यतन', 'अद्यतने']),
+    ('NAVIGATE_PATIENT_PROFILE', .9, ['patient profile', 'identity', 'record', 'allergy', 'mareez', 'rogi', 'रोगी', 'मरीज', 'रुग्ण']),
+    ('NAVIGATE_PREFERENCES', .9, ['preference', 'prefer', 'pasand', 'पसंद', 'प्राधान्य']),
+]
+
+_PATIENT_INTENTS = _COMMON_INTENTS + [
+    ('NAVIGATE_MEDICINE', .9, ['medicine', 'medic', 'dawa', 'dawai', 'pill', 'tablet', 'pharmacy', 'dava', 'refill', 'ilaj', 'दवा', 'दवाई', 'औषध', 'गोळ्या']),
+    ('NAVIGATE_PROFILE', .9, ['profile', 'account', 'personal', 'mera', 'details', 'khata', 'प्रोफ़ाइल', 'खाता', 'प्रोफाइल', 'माहिती']),
+    ('NAVIGATE_HOME', .9, ['home', 'dashboard', 'ghar', 'my day', 'aaj', 'today', 'main', 'घर', 'डैशबोर्ड', 'डॅशबोर्ड']),
+    ('ADD_REMINDER', .85, ['remind me', 'remind', 'reminder', 'alert', 'set an alert', 'याद दिलाना', 'रिमाइंडर', 'आठवण', 'अलर्ट']),
+]
+
+
+class _RoleMatcher:
+    """One regex for all of a role's keywords.
+
+    Each intent is a named group; the whole alternation sits inside a lookahead so matches
+    can overlap and every start position is tried. The group that fires tells us the intent,
+    and the lowest-priority index across the text wins, exactly like the old if/elif chain.
+    """
+
+    def __init__(self, intents, default_action, default_confidence):
+        self.intents = intents
+        self.default = (default_action, default_confidence)
+        groups = []
+        for index, (_, _, words) in enumerate(intents):
+            # Longest first so a shorter keyword never shadows a longer one at the same position
+            alternation = '|'.join(re.escape(w) for w in sorted(set(words), key=len, reverse=True))
+            groups.append(f'(?P<i{index}>{alternation})')
+        self.pattern = re.compile('(?=' + '|'.join(groups) + ')')
+
+    def match(self, t):
+        best = None
+        for m in self.pattern.finditer(t):
+            index = int(m.lastgroup[1:])
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        if best is None:
+            return self.default
+        action, confidence, _ = self.intents[best]
+        return action, confidence
+
+
+_MATCHERS = {
+    'guardian': _RoleMatcher(_GUARDIAN_INTENTS, 'NAVIGATE_GUARDIAN_HOME', .7),
+    # Patients, Unity users and anyone else share the patient branch, as before
+    'patient': _RoleMatcher(_PATIENT_INTENTS, None, .2),
+}
+
+
+def match_intent(text, role, lang_name='English'):
+    """Return {'reply', 'action', 'confidence'} for an utterance (plus 'text' for ADD_REMINDER)."""
+    t = text.lower()
+    replies = REPLIES.get(lang_name, REPLIES['English'])
+
+    if _SOS_RE.search(t) and _MARATHI_GREETING not in t:
+        return {'reply': replies['TRIGGER_SOS'], 'action': 'TRIGGER_SOS', 'confidence': .95}
+
+    action, confidence = _MATCHERS.get(role, _MATCHERS['patient']).match(t)
+    result = {'reply': replies[action or 'DEFAULT'], 'action': action, 'confidence': confidence}
+    if action == 'ADD_REMINDER':
+        result['text'] = text
+    return result